@@ -0,0 +1,151 @@
+"""Dependency-aware pipeline behind /ai-advisor/report.
+
+Independent advisors run in parallel. Advisors with dependencies start as
+soon as those finish and get a compact summary of their results instead of
+re-deriving the same context, and the financial model reuses the funding
+plan from smart_guidance rather than generating it again.
+"""
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# advisor type -> advisor types whose results it builds on
+PIPELINE = {
+    "smart_guidance": (),
+    "competitor_analysis": (),
+    "marketing_strategy": (),
+    "financial_model": ("smart_guidance",),
+    "investor_matching": ("smart_guidance", "competitor_analysis"),
+}
+
+_MONEY = re.compile(r"\$\s*([\d.,]+)\s*([kKmMbB])?")
+_SCALE = {"k": 1e3, "m": 1e6, "b": 1e9}
+
+
+def _get(value, *path, default=""):
+    for key in path:
+        if not isinstance(value, dict):
+            return default
+        value = value.get(key)
+    return default if value in (None, "", [], {}) else value
+
+
+def summarize(results, dependencies):
+    """Compact plain-text context from the finished results a stage depends on."""
+    lines = []
+    guidance = results.get("smart_guidance") if "smart_guidance" in dependencies else None
+    if guidance:
+        lines.append("Funding plan (decided):")
+        lines.append(f"- Raise: {_get(guidance, 'recommended_ask', 'amount', default='unspecified')}")
+        lines.append(f"- Dilution: {_get(guidance, 'equity_guidance', 'range', default='unspecified')}")
+        lines.append(f"- Valuation: {_get(guidance, 'valuation_estimate', 'range', default='unspecified')}")
+        lines.append(f"- Runway: {_get(guidance, 'runway_recommendation', 'months', default='unspecified')} months")
+        breakdown = [
+            f"{item.get('category')} {item.get('percentage')}%"
+            for item in _get(guidance, "use_of_funds_breakdown", default=[])
+            if isinstance(item, dict)
+        ]
+        if breakdown:
+            lines.append(f"- Use of funds: {', '.join(breakdown)}")
+    competitors = results.get("competitor_analysis") if "competitor_analysis" in dependencies else None
+    if competitors:
+        niche = _get(competitors, "market_positioning", "your_niche")
+        differentiators = _get(competitors, "market_positioning", "key_differentiators", default=[])
+        names = [c.get("name") for c in _get(competitors, "direct_competitors", default=[]) if isinstance(c, dict)]
+        lines.append("Positioning:")
+        if niche:
+            lines.append(f"- Niche: {niche}")
+        if differentiators:
+            lines.append(f"- Differentiators: {', '.join(map(str, differentiators))}")
+        if names:
+            lines.append(f"- Direct competitors: {', '.join(map(str, names[:5]))}")
+    return "\n".join(lines)
+
+
+def _parse_money(text):
+    """Largest dollar amount in ``text`` ("$1.5M - $2M" -> 2000000.0), or None."""
+    amounts = []
+    for number, suffix in _MONEY.findall(str(text)):
+        try:
+            amounts.append(float(number.replace(",", "")) * _SCALE.get((suffix or "").lower(), 1))
+        except ValueError:
+            continue
+    return max(amounts) if amounts else None
+
+
+def _format_money(amount):
+    for suffix, scale in (("M", 1e6), ("K", 1e3)):
+        if amount >= scale:
+            return f"${amount / scale:.1f}".rstrip("0").rstrip(".") + suffix
+    return f"${amount:.0f}"
+
+
+def assemble(advisor_type, result, results):
+    """Fill sections a later stage was told not to regenerate (in a copy of ``result``)."""
+    guidance = results.get("smart_guidance")
+    if advisor_type != "financial_model" or not guidance or not isinstance(result, dict):
+        return result
+    result = dict(result)
+    result.setdefault("funding_summary", {
+        "recommended_raise": _get(guidance, "recommended_ask", "amount", default="TBD"),
+        "pre_money_valuation": _get(guidance, "valuation_estimate", "range", default="TBD"),
+        "dilution": _get(guidance, "equity_guidance", "range", default="TBD"),
+        "runway_months": _get(guidance, "runway_recommendation", "months", default=18),
+    })
+    raise_amount = _parse_money(_get(guidance, "recommended_ask", "amount"))
+    use_of_funds = []
+    for item in _get(guidance, "use_of_funds_breakdown", default=[]):
+        if not isinstance(item, dict):
+            continue
+        percentage = item.get("percentage", 0)
+        amount = ""
+        if raise_amount and isinstance(percentage, (int, float)):
+            amount = _format_money(raise_amount * percentage / 100)
+        use_of_funds.append({"category": item.get("category", ""), "amount": amount, "percentage": percentage})
+    result.setdefault("use_of_funds", use_of_funds)
+    return result
+
+
+def run_pipeline(run_stage, advisor_types=None, max_workers=5):
+    """Run the pipeline, yielding ``(advisor_type, result, error)`` as stages finish.
+
+    ``run_stage(advisor_type, context_summary)`` returns ``(result, ok)``,
+    where ``ok`` is False for a placeholder result the completion couldn't
+    be parsed into. ``context_summary`` is None for stages without
+    dependencies and for stages whose dependencies failed or only produced
+    a placeholder, which then run standalone.
+    """
+    selected = list(PIPELINE if advisor_types is None else advisor_types)
+    results, failed = {}, set()
+    pending = {t: [d for d in PIPELINE[t] if d in selected] for t in selected}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(selected)))) as pool:
+        running = {}
+
+        def submit_ready():
+            for advisor_type, deps in list(pending.items()):
+                if all(d in results or d in failed for d in deps):
+                    del pending[advisor_type]
+                    summary = None
+                    if deps and not any(d in failed for d in deps):
+                        summary = summarize(results, deps)
+                    running[pool.submit(run_stage, advisor_type, summary)] = (advisor_type, summary)
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                advisor_type, summary = running.pop(future)
+                try:
+                    result, ok = future.result()
+                except Exception as e:
+                    failed.add(advisor_type)
+                    yield advisor_type, None, e
+                    continue
+                if not ok:
+                    failed.add(advisor_type)
+                else:
+                    if summary is not None:
+                        result = assemble(advisor_type, result, results)
+                    results[advisor_type] = result
+                yield advisor_type, result, None
+            submit_ready()
@@ -1,12 +1,45 @@
+import copy
+import json
 import os
-from flask import Flask, request, jsonify
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify
 from flask_cors import CORS
-import requests
 
-app = Flask(__name__)
-CORS(app)
+import advisor_report
+import compression
+import fingerprints
+import http_client
+import jobs
+import json_extract
+import json_provider
+import llm_cache
+import metrics
+import model_router
+import prefetch
+import prompt_budget
+import similarity_cache
+import singleflight
+import tenants
+import upstream_scheduler
+from prompts import ADVISOR_TEMPLATES, FEEDBACK_TEMPLATES, PITCH_TEMPLATES, REPORT_TEMPLATES
+from upstream_scheduler import UpstreamError
+
+MAX_REQUEST_BYTES = int(os.environ.get("MAX_REQUEST_BYTES", 1024 * 1024))
+
+
+class TimedJSONProvider(json_provider.FastJSONProvider):
+    """JSON provider (orjson when installed) that records serialization time."""
 
-GRADIENT_API_URL = "https://api.gradient.ai/v1/chat/completions"
+    def encode(self, obj, pretty=False):
+        with metrics.timer("serialize"):
+            return super().encode(obj, pretty)
+
+
+bp = Blueprint("api", __name__)
+
+GRADIENT_API_URL = os.environ.get("GRADIENT_API_URL", "https://api.gradient.ai/v1/chat/completions")
 MODEL = "openai-gpt-oss-120b"
 
 FUNDINGNEMO_SYSTEM = """You are FundingNEMO, an expert startup fundraising advisor.
@@ -16,532 +49,1185 @@ You avoid hype, buzzwords, and unrealistic claims.
 You provide outputs that are immediately usable by founders.
 When appropriate, return structured JSON exactly as requested."""
 
+PITCH_ASSET_TYPES = PITCH_TEMPLATES.names()
+
+BATCH_MAX_WORKERS = int(os.environ.get("BATCH_MAX_WORKERS", 6))
 
-def call_gradient_ai(messages, max_tokens=900):
-    """Call Gradient AI API with the given messages."""
-    api_key = os.environ.get("MODEL_ACCESS_KEY")
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "false").lower() == "true"
+
+JSON_REPAIR_REASK = os.environ.get("JSON_REPAIR_REASK", "true").lower() == "true"
+
+# Endpoints that can also be run as background jobs via POST /jobs.
+JOB_ENDPOINTS = ("generate-pitch", "generate-pitch/batch", "ai-advisor", "ai-advisor/report", "pitch-feedback")
+
+ADVISOR_FALLBACKS = {
+    "smart_guidance": {"recommended_ask": {"amount": "Please try again", "reasoning": "Unable to generate"}},
+    "competitor_analysis": {"direct_competitors": [], "indirect_competitors": []},
+    "investor_matching": {"tier1_investors": [], "tier2_investors": [], "accelerators": []},
+    "financial_model": {"funding_summary": {"recommended_raise": "TBD"}},
+    "marketing_strategy": {"target_segments": [], "acquisition_channels": []}
+}
+
+response_cache = llm_cache.make_cache()
+output_budget = prompt_budget.OutputBudget()
+similar_results = similarity_cache.SimilarityCache()
+response_bodies = json_provider.BodyCache()
+fingerprint_store = fingerprints.FingerprintStore()
+tenant_usage = tenants.TenantUsage()
+scheduler = upstream_scheduler.UpstreamScheduler()
+router = model_router.ModelRouter(model_router.load_providers(GRADIENT_API_URL, MODEL))
+# Cross-worker coalescing needs a result store every worker can read.
+flights = singleflight.SingleFlight(
+    leases=singleflight.SqliteLeases()
+    if singleflight.SHARED and response_cache.backend == "sqlite" else None
+)
+
+
+def job_runner(flask_app):
+    """``run`` for the job queue: a job goes through ``flask_app``'s synchronous endpoint, returning (status, body)."""
+    
+    def run_job(endpoint, payload):
+        with flask_app.test_request_context(f"/{endpoint}", method="POST", json={**payload, "stream": False}):
+            response = flask_app.full_dispatch_request()
+        return response.status_code, response.get_json()
+    
+    return run_job
+
+
+# Bound to the app that starts this process's job threads (see start_jobs).
+job_queue = jobs.JobQueue()
+
+
+def start_jobs(flask_app):
+    """Start this process's job threads, running jobs through ``flask_app``."""
+    if not job_queue.started():
+        job_queue.start(flask_app.extensions["fundingnemo_run_job"])
+
+PREFETCH_REGISTRIES = {"advisor": ADVISOR_TEMPLATES, "pitch": PITCH_TEMPLATES}
+
+
+def run_prefetch(task):
+    """Generate one prefetch task into the response cache exactly as the tab's own request would."""
+    template = PREFETCH_REGISTRIES[task.kind].get(task.name)
+    with metrics.labels(endpoint="prefetch", kind=task.name), tenants.scope(task.tenant):
+        messages = template_messages(template, task.project)
+        max_tokens = max_tokens_for(template)
+        key = completion_key(messages, max_tokens, template)
+        if response_cache.peek(key) is not None:
+            return prefetch.CACHED, key
+        estimated_tokens = sum(prompt_budget.estimate_tokens(m["content"]) for m in messages) + max_tokens
+        if not prefetcher.budget.take(estimated_tokens):
+            return prefetch.OVER_BUDGET, key
+        accept = advice_accepted(template) if task.kind == "advisor" else None
+        call_gradient_ai(messages, max_tokens=max_tokens, endpoint="prefetch", template=template, accept=accept)
+    # call_gradient_ai doesn't cache completions that were truncated or that ``accept`` rejected.
+    return (prefetch.GENERATED if response_cache.peek(key) is not None else prefetch.UNCACHED), key
+
+
+def prefetch_current(task):
+    """Whether ``task`` is for the latest submitted version of its project (host-wide)."""
+    status = fingerprint_store.status(task.project_id, {"prefetch": task.version})
+    return status["prefetch"] == fingerprints.FRESH
+
+
+def upstream_busy():
+    """Real traffic is queued or holds PREFETCH_MAX_SHARE of this worker's upstream slots."""
+    slots = scheduler.slots
+    return slots.waiting() > 0 or slots.in_use() >= slots.limit * prefetch.PREFETCH_MAX_SHARE
+
+
+prefetcher = prefetch.Prefetcher(run_prefetch, prefetch_current, upstream_busy)
+
+def _cache_events():
+    stats = response_cache.stats()
+    return [((event,), stats[event]) for event in ("hits", "misses", "sets", "evictions")]
+
+
+def _upstream_events():
+    stats = {**scheduler.stats(), **flights.stats(), **router.stats()}
+    events = ("calls", "retries", "rate_limited", "rejected", "coalesced", "coalesced_shared",
+              "failovers", "hedges", "hedge_wins", "hedges_skipped")
+    return [((event,), stats[event]) for event in events]
+
+
+def _prefetch_events():
+    stats = prefetcher.stats()
+    return [((event,), stats[event]) for event in prefetch.EVENTS]
+
+
+def _job_states():
+    return [((state,), count) for state, count in job_queue.counts().items()]
+
+
+def _provider_stats():
+    samples = []
+    for provider in router.providers:
+        stats = provider.stats()
+        samples.append(((provider.name, "latency_ewma_seconds"), (stats["latency_ewma_ms"] or 0) / 1000))
+        samples.append(((provider.name, "error_ewma"), stats["error_ewma"]))
+        samples.append(((provider.name, "circuit_open"), int(stats["circuit"] != model_router.CLOSED)))
+    return samples
+
+
+def _upstream_queue():
+    stats = scheduler.stats()
+    return [((state,), stats[state]) for state in ("in_flight", "queued")]
+
+
+metrics.REGISTRY.callback("fundingnemo_cache_events_total", "Response cache events in this worker.",
+                          _cache_events, ("event",), kind="counter")
+metrics.REGISTRY.callback("fundingnemo_upstream_events_total", "Upstream scheduler and coalescing events in this worker.",
+                          _upstream_events, ("event",), kind="counter")
+metrics.REGISTRY.callback("fundingnemo_upstream_queue", "Upstream calls in flight and waiting for a slot.",
+                          _upstream_queue, ("state",))
+metrics.REGISTRY.callback("fundingnemo_upstream_provider", "Per-provider latency EWMA, error EWMA and circuit state.",
+                          _provider_stats, ("provider", "stat"))
+metrics.REGISTRY.callback("fundingnemo_prefetch_events_total", "Prefetch tasks by outcome, and cache hits on prefetched results (used).",
+                          _prefetch_events, ("event",), kind="counter")
+metrics.REGISTRY.callback("fundingnemo_jobs", "Retained background jobs by state (host-wide).",
+                          _job_states, ("state",))
+
+
+def post_gradient_ai(provider, messages, max_tokens, stream=False):
+    """POST a chat/completions request to ``provider`` and raise on upstream error statuses."""
+    api_key = provider.api_key()
     
     if not api_key:
-        raise ValueError("MODEL_ACCESS_KEY environment variable is not set")
+        raise ValueError(f"{provider.key_env} environment variable is not set")
+    
+    body = {
+        "model": provider.model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+    }
+    if stream:
+        body["stream"] = True
     
-    response = requests.post(
-        GRADIENT_API_URL,
+    response = http_client.get_session().post(
+        provider.url,
         headers={
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
         },
-        json={
-            "model": MODEL,
-            "messages": messages,
-            "max_tokens": max_tokens,
-        },
-        timeout=60
+        json=body,
+        timeout=http_client.timeout(),
+        stream=stream
     )
     
+    if not response.ok:
+        response.close()
     if response.status_code == 429:
-        raise Exception("RATE_LIMIT")
+        retry_after = upstream_scheduler.parse_retry_after(response.headers.get("Retry-After"))
+        raise UpstreamError("RATE_LIMIT", 429, retry_after)
     if response.status_code in [401, 402]:
-        raise Exception("AUTH_ERROR")
+        raise UpstreamError("AUTH_ERROR", response.status_code)
     if not response.ok:
-        raise Exception(f"Gradient AI error: {response.status_code}")
+        raise UpstreamError(f"Gradient AI error: {response.status_code}", response.status_code)
+    
+    return response
+
+
+def schedule_gradient_ai(messages, max_tokens, endpoint=None, stream=False, template=None):
+    """Send the request through the upstream scheduler (rate limits, retries, priority)
+    and the provider router (failover, optional hedging).
+
+    The router tracks latency per template, buffered or streamed, and a
+    hedged second request is admitted by the scheduler like any other call.
+    """
+    priority = upstream_scheduler.ENDPOINT_PRIORITY.get(endpoint, upstream_scheduler.PRIORITY_DEFAULT)
+    estimated_tokens = sum(len(m["content"]) for m in messages) // 4 + max_tokens
+    send = lambda provider: post_gradient_ai(provider, messages, max_tokens, stream=stream)
+    kind = (template.name if template is not None else "") + (":stream" if stream else "")
+    return scheduler.run(
+        lambda: router.call(send, hedge=should_hedge(template), kind=kind,
+                            admit=lambda: scheduler.try_admit(estimated_tokens)),
+        priority=priority,
+        estimated_tokens=estimated_tokens,
+        tenant=tenants.current(),
+    )
+
+
+def should_hedge(template):
+    """Hedge interactive templates (UPSTREAM_HEDGE_TEMPLATES) when UPSTREAM_HEDGE is on."""
+    return model_router.HEDGE and template is not None and template.name in model_router.HEDGE_TEMPLATES
+
+
+def lookup_cache(key):
+    """Response cache lookup, counted per endpoint and type."""
+    cached = response_cache.get(key)
+    labels = metrics.current_labels()
+    metrics.CACHE_LOOKUPS.inc(endpoint=labels.get("endpoint", ""), kind=labels.get("kind", ""),
+                              result="miss" if cached is None else "hit")
+    if cached is not None:
+        prefetcher.mark_used(key)
+    return cached
+
+
+def lookup_similar(template, project, bypass_cache=False, **extra):
+    """Near-duplicate cache lookup (SIMILARITY_CACHE): ``(key, hit)``.
+
+    ``key`` is None when the cache is off; ``hit`` is ``(value, similarity)``
+    or None. Pass ``key`` to ``store_similar`` after a fresh generation.
+    """
+    if not similarity_cache.SIMILARITY_CACHE:
+        return None, None
+    key = similarity_cache.request_key(template, project, **extra)
+    if bypass_cache:
+        return key, None
+    hit = similar_results.get(*key)
+    if hit is not None:
+        labels = metrics.current_labels()
+        metrics.CACHE_LOOKUPS.inc(endpoint=labels.get("endpoint", ""), kind=labels.get("kind", ""), result="similar")
+    return key, hit
+
+
+def store_similar(key, value):
+    if key is not None:
+        similar_results.set(*key, value)
+
+
+def cached_body(kind, content):
+    """Response with the body serialized earlier for the same completion (RESPONSE_BODY_CACHE), or None."""
+    if not json_provider.BODY_CACHE:
+        return None
+    entry = response_bodies.get((kind, content))
+    if entry is None:
+        return None
+    g.encoded_body = entry
+    return current_app.json.bytes_response(entry.identity)
+
+
+def body_response(kind, content, obj, cache=True):
+    """``jsonify(obj)``, keeping the serialized body for the next request with the same completion."""
+    response = jsonify(obj)
+    if cache and json_provider.BODY_CACHE:
+        g.encoded_body = response_bodies.set((kind, content), response.get_data())
+    return response
+
+
+def record_usage(usage, content, messages):
+    """Count upstream tokens (from the usage block when present) and response size,
+    and charge the call to the current tenant (estimating tokens without a usage block)."""
+    labels = metrics.current_labels()
+    endpoint, kind = labels.get("endpoint", ""), labels.get("kind", "")
+    metrics.UPSTREAM_RESPONSE_BYTES.inc(len(content.encode("utf-8")), endpoint=endpoint, kind=kind)
+    for field, token_type in (("prompt_tokens", "prompt"), ("completion_tokens", "completion")):
+        if usage and usage.get(field):
+            metrics.UPSTREAM_TOKENS.inc(usage[field], endpoint=endpoint, kind=kind, type=token_type)
+    usage = usage or {}
+    tenant_usage.record(
+        tenants.current(),
+        upstream_calls=1,
+        prompt_tokens=usage.get("prompt_tokens") or sum(prompt_budget.estimate_tokens(m["content"]) for m in messages),
+        completion_tokens=usage.get("completion_tokens") or prompt_budget.estimate_tokens(content),
+    )
+
+
+def completion_key(messages, max_tokens, template=None):
+    """Response cache key. A template call is keyed by the template's static
+    max_tokens, not the budget learned in this worker, so every worker
+    computes the same key (truncated completions are never cached, so a
+    cached one is complete whatever budget produced it)."""
+    return llm_cache.cache_key(messages, MODEL, template.max_tokens if template is not None else max_tokens)
+
+
+def request_completion(messages, max_tokens, endpoint, template):
+    """One buffered upstream completion: ``(content, truncated)``."""
+    with metrics.timer("upstream"):
+        response = schedule_gradient_ai(messages, max_tokens, endpoint, template=template)
+        data = response.json()
+    choice = data.get("choices", [{}])[0]
+    content = choice.get("message", {}).get("content")
+    truncated = choice.get("finish_reason") == "length"
     
-    data = response.json()
-    content = data.get("choices", [{}])[0].get("message", {}).get("content")
+    if template is not None:
+        usage = data.get("usage") or {}
+        output_budget.observe(template, usage.get("completion_tokens") or prompt_budget.estimate_tokens(content or ""),
+                              limit=max_tokens, truncated=truncated)
+    if not content:
+        raise Exception("No content generated")
     
+    record_usage(data.get("usage"), content, messages)
+    return content, truncated
+
+
+def call_gradient_ai(messages, max_tokens=900, bypass_cache=False, endpoint=None, template=None, accept=None):
+    """Call Gradient AI API with the given messages.
+
+    Completions are cached by prompt and model (see completion_key). With
+    ``bypass_cache`` the cached value is ignored and refreshed. ``endpoint``
+    sets the scheduling priority. The completion length is recorded for
+    ``template``'s adaptive max_tokens; a completion cut off by a learned
+    budget is retried once with the next step up. Truncated completions,
+    and those ``accept(content)`` rejects (e.g. advice with no extractable
+    JSON), are returned but not cached, so a retry generates them again.
+    """
+    key = completion_key(messages, max_tokens, template)
+    if not bypass_cache:
+        cached = lookup_cache(key)
+        if cached is not None:
+            return cached
+    
+    def fetch():
+        content, truncated = request_completion(messages, max_tokens, endpoint, template)
+        if truncated and template is not None and prompt_budget.ADAPTIVE_MAX_TOKENS:
+            larger = prompt_budget.step_up(max_tokens, output_budget.ceiling)
+            if larger > max_tokens:
+                content, truncated = request_completion(messages, larger, endpoint, template)
+        if not truncated and (accept is None or accept(content)):
+            response_cache.set(key, content)
+        return content
+    
+    # Identical prompts already in flight share one upstream call. Across
+    # workers a waiter takes the cached value once the lease holder is done,
+    # which for bypass_cache could be the very value being refreshed, so a
+    # bypassing call generates its own.
+    return flights.do(key, fetch, lookup=None if bypass_cache else response_cache.peek)
+
+
+def stream_gradient_ai(messages, max_tokens=900, bypass_cache=False, endpoint=None, template=None, accept=None):
+    """Yield completion text as it arrives from Gradient AI.
+
+    A cached completion is yielded as a single chunk. Closing the generator
+    (e.g. on client disconnect) closes the upstream connection, which
+    cancels the generation. ``accept`` is as for call_gradient_ai; a
+    truncated completion has already been sent, so it is not retried, only
+    left out of the cache.
+    """
+    key = completion_key(messages, max_tokens, template)
+    if not bypass_cache:
+        cached = lookup_cache(key)
+        if cached is not None:
+            yield cached
+            return
+    
+    with metrics.timer("upstream_first_byte"):
+        response = schedule_gradient_ai(messages, max_tokens, endpoint, stream=True, template=template)
+    parts = []
+    finish_reason = None
+    try:
+        for line in response.iter_lines():
+            if not line.startswith(b"data:"):
+                continue
+            payload = line[5:].strip()
+            if payload == b"[DONE]":
+                break
+            chunk = json.loads(payload)
+            choice = (chunk.get("choices") or [{}])[0]
+            finish_reason = choice.get("finish_reason") or finish_reason
+            delta = choice.get("delta", {}).get("content")
+            if delta:
+                parts.append(delta)
+                yield delta
+    finally:
+        response.close()
+    
+    content = "".join(parts)
+    if template is not None:
+        output_budget.observe(template, prompt_budget.estimate_tokens(content), limit=max_tokens,
+                              truncated=finish_reason == "length")
     if not content:
         raise Exception("No content generated")
     
-    return content
+    record_usage(None, content, messages)
+    if finish_reason != "length" and (accept is None or accept(content)):
+        response_cache.set(key, content)
+
+
+def sse_event(event, payload):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def sse_response(chunks, finish):
+    """Relay text chunks as SSE ``delta`` events, then a ``done`` event.
+
+    ``finish`` turns the full completion into the ``done`` payload. The first
+    chunk is pulled before the response starts so upstream errors still get
+    a normal JSON error status.
+    """
+    try:
+        first = next(chunks)
+    except Exception as e:
+        chunks.close()
+        error_msg, status = error_response(e)
+        return jsonify({"error": error_msg}), status
+    
+    def events():
+        parts = [first]
+        try:
+            yield sse_event("delta", {"content": first})
+            for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event("delta", {"content": chunk})
+            yield sse_event("done", finish("".join(parts)))
+        except Exception as e:
+            error_msg, status = error_response(e)
+            yield sse_event("error", {"error": error_msg, "status": status})
+        finally:
+            chunks.close()
+    
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+def iter_once(content):
+    """A one-chunk generator, for relaying a cached completion through sse_response."""
+    yield content
+
+
+def template_messages(template, project, **extra):
+    """System + user messages for a rendered prompt template.
+
+    With PROMPT_COMPACTION, placeholder fields are left out and oversized
+    ones truncated (see prompt_budget.compact).
+    """
+    with metrics.timer("render"):
+        if prompt_budget.COMPACTION:
+            project, omit = prompt_budget.compact(template, project)
+            prompt = template.render(project, omit=omit, **extra)
+        else:
+            prompt = template.render(project, **extra)
+    return [
+        {"role": "system", "content": FUNDINGNEMO_SYSTEM},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def max_tokens_for(template, stream=False):
+    """Completion budget for ``template``: learned from recent outputs, else its static max_tokens.
+
+    A streamed reply can't be retried with a larger budget once it is cut
+    off, so ``stream`` calls always get the static max_tokens.
+    """
+    if prompt_budget.ADAPTIVE_MAX_TOKENS and not stream:
+        return output_budget.max_tokens(template, template.max_tokens)
+    return template.max_tokens
+
+
+def request_body():
+    """The JSON body and its ``project`` (default {}), returning (data, project, error response).
+
+    ``projectId``, if given, must be a non-empty string: it keys SQLite rows,
+    and a bad one must fail before any upstream call is paid for.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return None, None, (jsonify({"error": "Request body must be a JSON object"}), 400)
+    project = data.get("project", {})
+    if not isinstance(project, dict):
+        return None, None, (jsonify({"error": "project must be an object"}), 400)
+    project_id = data.get("projectId")
+    if project_id is not None and not (isinstance(project_id, str) and project_id):
+        return None, None, (jsonify({"error": "projectId must be a non-empty string"}), 400)
+    return data, project, None
+
+
+def string_list(data, field, default):
+    """``data[field]`` as a list of strings (``default`` if absent or empty), returning (values, error response)."""
+    values = data.get(field) or list(default)
+    if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+        return None, (jsonify({"error": f"{field} must be a list of strings"}), 400)
+    return values, None
+
+
+def known_type(registry, name):
+    """Whether ``name`` is a template in ``registry`` (False for non-string names such as lists)."""
+    return isinstance(name, str) and name in registry
+
+
+def resolve_template(registry, name, data, project, kind):
+    """Look up the requested template, returning (template, error response)."""
+    if not known_type(registry, name):
+        return None, (jsonify({"error": f"Unknown {kind} type: {name}"}), 400)
+    try:
+        template = registry.get(name, data.get("templateVersion"))
+    except (KeyError, TypeError, ValueError):
+        return None, (jsonify({"error": f"Unknown template version for {name}: {data.get('templateVersion')}"}), 400)
+    if data.get("validate"):
+        missing = template.missing_fields(project)
+        if missing:
+            return None, (jsonify({"error": f"Missing project fields: {', '.join(missing)}", "missing": missing}), 400)
+    return template, None
+
+
+def report_fingerprints(project):
+    """Fingerprint per report stage; a stage changes with its own fields or any stage it builds on."""
+    values = {}
+    
+    def stage(advisor_type):
+        if advisor_type not in values:
+            templates = [ADVISOR_TEMPLATES.get(advisor_type)]
+            if advisor_type in REPORT_TEMPLATES:
+                templates.append(REPORT_TEMPLATES.get(advisor_type))
+            depends_on = [stage(d) for d in advisor_report.PIPELINE[advisor_type]]
+            values[advisor_type] = fingerprints.fingerprint(templates, project, depends_on)
+        return values[advisor_type]
+    
+    for advisor_type in advisor_report.PIPELINE:
+        stage(advisor_type)
+    return values
+
+
+def record_fingerprint(project_id, kind, template, project):
+    """Record the inputs a successful generation used (only for requests with a projectId)."""
+    if project_id:
+        fingerprint_store.record(project_id, kind, fingerprints.fingerprint([template], project))
+
+
+def advise(template, project, bypass_cache=False, **extra):
+    """Run one advisor template and return ``(parsed JSON or the fallback, parsed ok)``."""
+    return parse_advice(template, advice_content(template, project, bypass_cache, **extra))
+
 
+def advice_content(template, project, bypass_cache=False, **extra):
+    """The raw completion for one advisor template."""
+    messages = template_messages(template, project, **extra)
+    return call_gradient_ai(messages, max_tokens=max_tokens_for(template), bypass_cache=bypass_cache,
+                            endpoint="ai-advisor", template=template, accept=advice_accepted(template))
 
-@app.route("/health", methods=["GET"])
+
+def repair_json(prompt, max_tokens):
+    """Ask the model to fix only a malformed JSON fragment (see json_extract.extract)."""
+    if not JSON_REPAIR_REASK:
+        return ""
+    messages = [
+        {"role": "system", "content": FUNDINGNEMO_SYSTEM},
+        {"role": "user", "content": prompt}
+    ]
+    return call_gradient_ai(messages, max_tokens=max_tokens)
+
+
+def advice_accepted(template):
+    """``accept`` for advisor completions: cache only those whose JSON parses locally.
+
+    No repair re-ask here: the endpoint's own parse_advice makes it, so a
+    malformed completion costs one repair call, not two.
+    """
+    return lambda content: parse_advice(template, content, reask=None)[1]
+
+
+def parse_advice(template, content, reask=repair_json):
+    """Extract an advisor's JSON from its completion: ``(parsed, True)``, or ``(placeholder, False)``.
+
+    The placeholder is a copy, so callers may fill it in without changing
+    ADVISOR_FALLBACKS for every later request.
+    """
+    with metrics.timer("extract"):
+        parsed = json_extract.extract(content, template.schema, reask=reask)
+    if parsed is None:
+        return copy.deepcopy(ADVISOR_FALLBACKS.get(template.name, {"error": "Unable to parse response"})), False
+    return parsed, True
+
+
+def is_prefetch_type(value):
+    kind, _, name = str(value).partition(":")
+    return kind in PREFETCH_REGISTRIES and name in PREFETCH_REGISTRIES[kind]
+
+
+def error_response(e):
+    """Map an exception from the generation path to (message, status)."""
+    error_msg = str(e)
+    if error_msg == "RATE_LIMIT":
+        return "Rate limits exceeded, please try again later.", 429
+    if error_msg == "AUTH_ERROR":
+        return "AI service authentication error. Please check your API key.", 401
+    return error_msg, 500
+
+
+def endpoint_label():
+    """Route pattern for metric labels, so path parameters don't create new series."""
+    rule = request.url_rule
+    return (rule.rule.strip("/") or "root") if rule is not None else "unmatched"
+
+
+@bp.before_app_request
+def start_request_metrics():
+    start_jobs(current_app)
+    g.request_start = time.perf_counter()
+    g.timings = metrics.begin_request(endpoint_label(), server_timing=SERVER_TIMING)
+    data = None
+    if request.method == "POST":
+        with metrics.timer("parse"):
+            data = request.get_json(silent=True)
+    tenant = tenants.begin_request(tenants.resolve(request.headers.get("X-Tenant-Id"), data))
+    if request.method == "POST" and endpoint_label() in JOB_ENDPOINTS:
+        tenant_usage.record(tenant, requests=1)
+
+
+@bp.after_app_request
+def finish_request_metrics(response):
+    start = g.get("request_start")
+    if start is not None:
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint_label(),
+                                        status=response.status_code)
+        if SERVER_TIMING and g.timings:
+            response.headers["Server-Timing"] = metrics.server_timing(g.timings)
+    return response
+
+
+# Registered after finish_request_metrics so it runs first and is timed.
+@bp.after_app_request
+def compress_response(response):
+    with metrics.timer("compress"):
+        return compression.compress_response(response, request.headers.get("Accept-Encoding"),
+                                             g.get("encoded_body"))
+
+
+@bp.app_errorhandler(413)
+def request_too_large(e):
+    return jsonify({"error": f"Request body is larger than {MAX_REQUEST_BYTES} bytes"}), 413
+
+
+@bp.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus text-format metrics."""
+    return Response(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+@bp.route("/health", methods=["GET"])
 def health():
     """Health check endpoint."""
     return jsonify({"status": "ok"})
 
 
-@app.route("/generate-pitch", methods=["POST", "OPTIONS"])
+@bp.route("/prompts", methods=["GET"])
+def list_prompts():
+    """Prompt templates with their versions, project fields and required fields."""
+    return jsonify({
+        "generate-pitch": PITCH_TEMPLATES.describe(),
+        "ai-advisor": ADVISOR_TEMPLATES.describe(),
+        "pitch-feedback": FEEDBACK_TEMPLATES.describe(),
+    })
+
+
+@bp.route("/prompts/budgets", methods=["GET"])
+def prompt_budgets():
+    """Learned max_tokens per template in this worker."""
+    return jsonify(output_budget.stats())
+
+
+@bp.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    """Response cache hit/miss counters."""
+    return jsonify({**response_cache.stats(), "similarity": similar_results.stats(), "bodies": response_bodies.stats()})
+
+
+@bp.route("/upstream/stats", methods=["GET"])
+def upstream_stats():
+    """Upstream scheduler and request-coalescing counters."""
+    return jsonify({**scheduler.stats(), "singleflight": flights.stats(), "router": router.stats()})
+
+
+@bp.route("/tenants/usage", methods=["GET"])
+def tenant_usage_report():
+    """Requests, upstream calls and tokens per tenant (``?tenant=``, ``?days=``, default today)."""
+    try:
+        days = max(1, int(request.args.get("days", 1)))
+    except ValueError:
+        return jsonify({"error": "days must be an integer"}), 400
+    return jsonify({
+        "tenants": tenant_usage.usage(request.args.get("tenant"), days=days),
+        "accounting": {**tenant_usage.stats(), "overflowed": tenants.daily_overflowed()},
+    })
+
+
+@bp.route("/generate-pitch", methods=["POST", "OPTIONS"])
 def generate_pitch():
     """Generate pitch assets (tagline, 30sec, 2min, deck_outline, cold_email, linkedin_intro)."""
     if request.method == "OPTIONS":
         return "", 204
     
     try:
-        data = request.get_json()
-        project = data.get("project", {})
+        data, project, error = request_body()
+        if error:
+            return error
         asset_type = data.get("assetType", "")
+        metrics.set_labels(kind=asset_type if known_type(PITCH_TEMPLATES, asset_type) else "unknown")
         
-        prompts = {
-            "tagline": f"""Rewrite the following startup description into a crisp, investor-ready one-liner (under 15 words):
-
-Startup: {project.get('startup_name', '')}
-One-liner: {project.get('one_liner', '')}
-Problem: {project.get('problem_statement', '')}
-Solution: {project.get('solution_description', '')}
-Category: {project.get('category', '')}
-
-Return ONLY the tagline, nothing else.""",
-
-            "30sec": f"""Generate a 30-second spoken pitch suitable for a first investor meeting (about 80-100 words):
-
-Startup: {project.get('startup_name', '')}
-One-liner: {project.get('one_liner', '')}
-Problem: {project.get('problem_statement', '')}
-Solution: {project.get('solution_description', '')}
-Target Users: {project.get('target_users', '')}
-Traction: {project.get('traction_users', 'Early stage')} users, {project.get('traction_revenue', 'Pre-revenue')}
-Ask: {project.get('ask_amount', '')}
-
-The pitch should hook attention, state the problem, present the solution, mention traction, and end with the ask. Return ONLY the pitch text.""",
-
-            "2min": f"""Generate a structured 2-minute pitch with problem, solution, market, traction, and ask (about 300-350 words):
-
-Startup: {project.get('startup_name', '')}
-One-liner: {project.get('one_liner', '')}
-Problem: {project.get('problem_statement', '')}
-Solution: {project.get('solution_description', '')}
-Target Users: {project.get('target_users', '')}
-Why Now: {project.get('why_now', 'Market timing is right')}
-Differentiation: {project.get('differentiation', 'Unique approach')}
-Traction: Users: {project.get('traction_users', 'Early stage')}, Revenue: {project.get('traction_revenue', 'Pre-revenue')}, Growth: {project.get('traction_growth', 'Growing')}
-Business Model: {project.get('business_model', '')}
-Ask: {project.get('ask_amount', '')}
-Use of Funds: {project.get('use_of_funds', '')}
-
-Structure: Opening hook, problem deep-dive, solution explanation, market opportunity, traction proof, business model, team credibility (brief), and clear ask. Return ONLY the pitch text.""",
-
-            "deck_outline": f"""Generate a 6-slide pitch deck outline. Return JSON:
-[
-  {{ "slide": 1, "title": "string", "bullets": ["string"] }}
-]
-
-Startup: {project.get('startup_name', '')}
-One-liner: {project.get('one_liner', '')}
-Problem: {project.get('problem_statement', '')}
-Solution: {project.get('solution_description', '')}
-Target Users: {project.get('target_users', '')}
-Traction: {project.get('traction_users', 'N/A')} users, {project.get('traction_revenue', 'N/A')} revenue
-Business Model: {project.get('business_model', '')}
-Ask: {project.get('ask_amount', '')}
-Use of Funds: {project.get('use_of_funds', '')}
-
-Cover: Title/Hook, Problem, Solution, Traction/Market, Business Model, Ask. Return ONLY valid JSON.""",
-
-            "cold_email": f"""Write a concise investor cold email (≤120 words). No hype. Professional tone.
-
-Startup: {project.get('startup_name', '')}
-One-liner: {project.get('one_liner', '')}
-Problem: {project.get('problem_statement', '')}
-Solution: {project.get('solution_description', '')}
-Traction: {project.get('traction_users', 'Early')} users, {project.get('traction_revenue', 'Pre-revenue')}
-Ask: {project.get('ask_amount', '')}
-Category: {project.get('category', '')}
-Stage: {project.get('stage', '')}
-
-Include subject line. Format as:
-
-Subject: [subject]
-
-[email body]""",
-
-            "linkedin_intro": f"""Write a short, polite LinkedIn intro request. Non-salesy. Keep under 280 characters (LinkedIn limit).
-
-Startup: {project.get('startup_name', '')}
-One-liner: {project.get('one_liner', '')}
-Category: {project.get('category', '')}
-Traction: {project.get('traction_users', 'Early stage')}
-Ask: {project.get('ask_amount', '')}
-
-Be personal, mention why you're reaching out, and hint at your traction."""
-        }
-        
-        if asset_type not in prompts:
-            return jsonify({"error": f"Unknown asset type: {asset_type}"}), 400
+        template, error = resolve_template(PITCH_TEMPLATES, asset_type, data, project, "asset")
+        if error:
+            return error
         
-        messages = [
-            {"role": "system", "content": FUNDINGNEMO_SYSTEM},
-            {"role": "user", "content": prompts[asset_type]}
-        ]
+        project_id = data.get("projectId")
+        messages = template_messages(template, project)
+        max_tokens = max_tokens_for(template, stream=bool(data.get("stream")))
+        if data.get("stream"):
+            chunks = stream_gradient_ai(messages, max_tokens=max_tokens, bypass_cache=bool(data.get("bypassCache")),
+                                        endpoint="generate-pitch", template=template)
+            
+            def finish(content):
+                record_fingerprint(project_id, f"pitch:{asset_type}", template, project)
+                return {"content": content}
+            
+            return sse_response(chunks, finish)
         
-        content = call_gradient_ai(messages)
+        content = call_gradient_ai(messages, max_tokens=max_tokens, bypass_cache=bool(data.get("bypassCache")),
+                                   endpoint="generate-pitch", template=template)
+        record_fingerprint(project_id, f"pitch:{asset_type}", template, project)
         return jsonify({"content": content})
         
     except Exception as e:
-        error_msg = str(e)
-        if error_msg == "RATE_LIMIT":
-            return jsonify({"error": "Rate limits exceeded, please try again later."}), 429
-        if error_msg == "AUTH_ERROR":
-            return jsonify({"error": "AI service authentication error. Please check your API key."}), 401
-        return jsonify({"error": error_msg}), 500
+        error_msg, status = error_response(e)
+        return jsonify({"error": error_msg}), status
+
+
+@bp.route("/generate-pitch/batch", methods=["POST", "OPTIONS"])
+def generate_pitch_batch():
+    """Generate several pitch assets concurrently (defaults to every asset type).
+
+    With ``projectId`` and ``onlyStale``, assets whose project fields haven't
+    changed since they were last generated are skipped and listed under
+    ``skipped``.
+    """
+    if request.method == "OPTIONS":
+        return "", 204
+    
+    data, project, error = request_body()
+    if error:
+        return error
+    project_id = data.get("projectId")
+    asset_types, error = string_list(data, "assetTypes", PITCH_ASSET_TYPES)
+    if error:
+        return error
+    bypass_cache = bool(data.get("bypassCache"))
+    
+    unknown = [t for t in asset_types if t not in PITCH_ASSET_TYPES]
+    if unknown:
+        return jsonify({"error": f"Unknown asset types: {', '.join(map(str, unknown))}"}), 400
+    asset_types = list(dict.fromkeys(asset_types))
+    
+    skipped = []
+    if project_id and data.get("onlyStale"):
+        status = fingerprint_store.status(project_id, {
+            f"pitch:{t}": fingerprints.fingerprint([PITCH_TEMPLATES.get(t)], project) for t in asset_types
+        })
+        skipped = [t for t in asset_types if status[f"pitch:{t}"] == fingerprints.FRESH]
+        asset_types = [t for t in asset_types if t not in skipped]
+    
+    tenant = tenants.current()
+    
+    def generate(asset_type):
+        template = PITCH_TEMPLATES.get(asset_type)
+        with metrics.labels(endpoint="generate-pitch/batch", kind=asset_type), tenants.scope(tenant):
+            content = call_gradient_ai(template_messages(template, project), max_tokens=max_tokens_for(template),
+                                       bypass_cache=bypass_cache, endpoint="generate-pitch", template=template)
+        record_fingerprint(project_id, f"pitch:{asset_type}", template, project)
+        return content
+    
+    results, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_MAX_WORKERS, len(asset_types)))) as pool:
+        futures = {asset_type: pool.submit(generate, asset_type) for asset_type in asset_types}
+        for asset_type, future in futures.items():
+            try:
+                results[asset_type] = {"content": future.result()}
+            except Exception as e:
+                error_msg, status = error_response(e)
+                errors[asset_type] = {"error": error_msg, "status": status}
+    
+    status = 200
+    if errors and not results:
+        status = max(e["status"] for e in errors.values())
+    return jsonify({"results": results, "errors": errors, "skipped": skipped}), status
 
 
-@app.route("/ai-advisor", methods=["POST", "OPTIONS"])
+@bp.route("/ai-advisor", methods=["POST", "OPTIONS"])
 def ai_advisor():
     """AI advisor endpoints (smart_guidance, competitor_analysis, investor_matching, financial_model, marketing_strategy)."""
     if request.method == "OPTIONS":
         return "", 204
     
     try:
-        data = request.get_json()
-        project = data.get("project", {})
+        data, project, error = request_body()
+        if error:
+            return error
         advisor_type = data.get("advisorType", "")
+        metrics.set_labels(kind=advisor_type if known_type(ADVISOR_TEMPLATES, advisor_type) else "unknown")
         
-        prompts = {
-            "smart_guidance": f"""Based on stage and market, suggest fundraising guidance for this startup:
-
-Startup: {project.get('startup_name', '')}
-Category: {project.get('category', '')}
-Stage: {project.get('stage', '')}
-One-liner: {project.get('one_liner', '')}
-Problem: {project.get('problem_statement', '')}
-Solution: {project.get('solution_description', '')}
-Current Ask: {project.get('ask_amount', 'Not specified')}
-Business Model: {project.get('business_model', '')}
-Traction: Users: {project.get('traction_users', 'N/A')}, Revenue: {project.get('traction_revenue', 'N/A')}
-
-Suggest:
-- reasonable funding ask range
-- equity dilution range
-- valuation logic
-- runway estimate
-
-Return ONLY valid JSON in this format:
-{{
-  "recommended_ask": {{
-    "amount": "specific dollar range",
-    "reasoning": "why this range makes sense"
-  }},
-  "equity_guidance": {{
-    "range": "percentage range to give up",
-    "reasoning": "based on stage and traction"
-  }},
-  "use_of_funds_breakdown": [
-    {{"category": "Engineering", "percentage": 40, "reasoning": "build core product"}},
-    {{"category": "Sales & Marketing", "percentage": 30, "reasoning": "customer acquisition"}},
-    {{"category": "Operations", "percentage": 20, "reasoning": "infrastructure"}},
-    {{"category": "Buffer", "percentage": 10, "reasoning": "contingency"}}
-  ],
-  "valuation_estimate": {{
-    "range": "valuation range",
-    "method": "how calculated"
-  }},
-  "runway_recommendation": {{
-    "months": 18,
-    "reasoning": "why this timeline"
-  }}
-}}""",
-
-            "competitor_analysis": f"""List direct and indirect competitors and explain differentiation for this startup:
-
-Startup: {project.get('startup_name', '')}
-Category: {project.get('category', '')}
-One-liner: {project.get('one_liner', '')}
-Problem: {project.get('problem_statement', '')}
-Solution: {project.get('solution_description', '')}
-Target Users: {project.get('target_users', '')}
-Differentiation: {project.get('differentiation', 'Not specified')}
-
-Return a comparison table as valid JSON:
-{{
-  "direct_competitors": [
-    {{
-      "name": "Competitor Name",
-      "description": "What they do",
-      "funding": "Funding stage/amount if known",
-      "strengths": ["strength 1", "strength 2"],
-      "weaknesses": ["weakness 1", "weakness 2"],
-      "your_advantage": "How you differentiate"
-    }}
-  ],
-  "indirect_competitors": [
-    {{
-      "name": "Indirect Competitor",
-      "description": "How they compete indirectly",
-      "threat_level": "low/medium/high"
-    }}
-  ],
-  "market_positioning": {{
-    "your_niche": "Where you fit",
-    "blue_ocean_opportunities": ["opportunity 1", "opportunity 2"],
-    "key_differentiators": ["differentiator 1", "differentiator 2"]
-  }},
-  "competitive_moat": {{
-    "current_moat": "What protects you now",
-    "moat_to_build": "What to develop"
-  }}
-}}""",
-
-            "investor_matching": f"""Suggest relevant investor types, sample firms, and accelerators based on this startup profile:
-
-Startup: {project.get('startup_name', '')}
-Category: {project.get('category', '')}
-Stage: {project.get('stage', '')}
-Ask Amount: {project.get('ask_amount', '')}
-One-liner: {project.get('one_liner', '')}
-Business Model: {project.get('business_model', '')}
-Traction: Users: {project.get('traction_users', 'Early')}, Revenue: {project.get('traction_revenue', 'Pre-revenue')}
-
-Explain why each is a fit. Return ONLY valid JSON:
-{{
-  "tier1_investors": [
-    {{
-      "name": "VC/Angel Name",
-      "firm": "Firm name if applicable",
-      "type": "VC/Angel/Accelerator",
-      "check_size": "$X - $Y",
-      "thesis_match": "Why they'd be interested",
-      "portfolio_examples": ["Similar company 1", "Similar company 2"],
-      "approach_tip": "How to reach out"
-    }}
-  ],
-  "tier2_investors": [
-    {{
-      "name": "Investor Name",
-      "firm": "Firm",
-      "type": "VC/Angel",
-      "check_size": "$X - $Y",
-      "thesis_match": "Why relevant"
-    }}
-  ],
-  "accelerators": [
-    {{
-      "name": "Accelerator Name",
-      "investment": "Terms if known",
-      "why_apply": "Why good fit",
-      "deadline_hint": "Application timing"
-    }}
-  ],
-  "outreach_strategy": {{
-    "warm_intro_sources": ["Source 1", "Source 2"],
-    "cold_outreach_tips": ["Tip 1", "Tip 2"],
-    "timing_advice": "When to reach out"
-  }}
-}}""",
-
-            "financial_model": f"""Create financial projections for this startup:
-
-Startup: {project.get('startup_name', '')}
-Category: {project.get('category', '')}
-Stage: {project.get('stage', '')}
-Ask Amount: {project.get('ask_amount', '')}
-Business Model: {project.get('business_model', '')}
-Current Traction: Users: {project.get('traction_users', '0')}, Revenue: {project.get('traction_revenue', '$0')}, Growth: {project.get('traction_growth', 'N/A')}
-
-If information is missing, say so explicitly. Return ONLY valid JSON:
-{{
-  "funding_summary": {{
-    "recommended_raise": "$X",
-    "pre_money_valuation": "$X - $Y range",
-    "dilution": "X% - Y%",
-    "runway_months": 18
-  }},
-  "monthly_burn_projection": {{
-    "current": "$X",
-    "month_6": "$X",
-    "month_12": "$X",
-    "month_18": "$X"
-  }},
-  "revenue_projections": {{
-    "year_1": {{ "revenue": "$X", "users": "X", "assumptions": "key assumption" }},
-    "year_2": {{ "revenue": "$X", "users": "X", "assumptions": "key assumption" }},
-    "year_3": {{ "revenue": "$X", "users": "X", "assumptions": "key assumption" }}
-  }},
-  "unit_economics": {{
-    "cac_estimate": "$X",
-    "ltv_estimate": "$X",
-    "ltv_cac_ratio": "X:1",
-    "payback_period": "X months"
-  }},
-  "use_of_funds": [
-    {{ "category": "Product/Engineering", "amount": "$X", "percentage": 40 }},
-    {{ "category": "Sales/Marketing", "amount": "$X", "percentage": 30 }},
-    {{ "category": "Operations", "amount": "$X", "percentage": 20 }},
-    {{ "category": "Buffer", "amount": "$X", "percentage": 10 }}
-  ],
-  "key_milestones": [
-    {{ "month": 6, "milestone": "Milestone description", "metric": "Target metric" }},
-    {{ "month": 12, "milestone": "Milestone description", "metric": "Target metric" }},
-    {{ "month": 18, "milestone": "Milestone description", "metric": "Target metric" }}
-  ],
-  "risk_factors": ["Risk 1", "Risk 2", "Risk 3"]
-}}""",
-
-            "marketing_strategy": f"""Create a marketing strategy for this startup:
-
-Startup: {project.get('startup_name', '')}
-Category: {project.get('category', '')}
-Target Users: {project.get('target_users', '')}
-One-liner: {project.get('one_liner', '')}
-Solution: {project.get('solution_description', '')}
-Go-to-Market Notes: {project.get('go_to_market', 'Not specified')}
-Business Model: {project.get('business_model', '')}
-
-Return ONLY valid JSON:
-{{
-  "target_segments": [
-    {{
-      "segment": "Segment name",
-      "description": "Who they are",
-      "pain_points": ["pain 1", "pain 2"],
-      "channels": ["channel 1", "channel 2"],
-      "messaging": "Key message for this segment"
-    }}
-  ],
-  "acquisition_channels": [
-    {{
-      "channel": "Channel name",
-      "priority": "high/medium/low",
-      "estimated_cac": "$X - $Y",
-      "tactics": ["tactic 1", "tactic 2"],
-      "timeline": "When to start"
-    }}
-  ],
-  "content_strategy": {{
-    "themes": ["theme 1", "theme 2"],
-    "formats": ["format 1", "format 2"],
-    "distribution": ["platform 1", "platform 2"]
-  }},
-  "launch_playbook": {{
-    "pre_launch": ["action 1", "action 2"],
-    "launch_week": ["action 1", "action 2"],
-    "post_launch": ["action 1", "action 2"]
-  }},
-  "metrics_to_track": ["metric 1", "metric 2", "metric 3"],
-  "budget_allocation": {{
-    "paid": 30,
-    "organic": 40,
-    "partnerships": 20,
-    "events": 10
-  }}
-}}"""
-        }
-        
-        if advisor_type not in prompts:
-            return jsonify({"error": f"Unknown advisor type: {advisor_type}"}), 400
+        template, error = resolve_template(ADVISOR_TEMPLATES, advisor_type, data, project, "advisor")
+        if error:
+            return error
         
-        messages = [
-            {"role": "system", "content": FUNDINGNEMO_SYSTEM},
-            {"role": "user", "content": prompts[advisor_type]}
-        ]
+        bypass_cache = bool(data.get("bypassCache"))
+        key, similar = lookup_similar(template, project, bypass_cache)
+        if similar is not None:
+            parsed, score = similar
+            return jsonify({"data": parsed, "cached": True, "similarity": round(score, 3)})
         
-        content = call_gradient_ai(messages, max_tokens=1500)
+        content = advice_content(template, project, bypass_cache)
+        kind = ("ai-advisor", template.name, template.version)
+        response = cached_body(kind, content)
+        if response is not None:
+            # Only parsed (non-fallback) results have their body cached.
+            record_fingerprint(data.get("projectId"), f"advisor:{advisor_type}", template, project)
+            return response
         
-        # Clean up markdown code blocks if present
-        content = content.replace("```json\n", "").replace("```\n", "").replace("```", "").strip()
+        parsed, parsed_ok = parse_advice(template, content)
+        if parsed_ok:
+            store_similar(key, parsed)
+            record_fingerprint(data.get("projectId"), f"advisor:{advisor_type}", template, project)
         
-        # Try to extract JSON
-        import re
-        json_match = re.search(r'\{[\s\S]*\}', content)
-        if json_match:
-            content = json_match.group(0)
-        
-        # Parse JSON
-        import json
-        try:
-            parsed = json.loads(content)
-        except json.JSONDecodeError:
-            # Return fallback
-            fallbacks = {
-                "smart_guidance": {"recommended_ask": {"amount": "Please try again", "reasoning": "Unable to generate"}},
-                "competitor_analysis": {"direct_competitors": [], "indirect_competitors": []},
-                "investor_matching": {"tier1_investors": [], "tier2_investors": [], "accelerators": []},
-                "financial_model": {"funding_summary": {"recommended_raise": "TBD"}},
-                "marketing_strategy": {"target_segments": [], "acquisition_channels": []}
-            }
-            parsed = fallbacks.get(advisor_type, {"error": "Unable to parse response"})
-        
-        return jsonify({"data": parsed})
+        return body_response(kind, content, {"data": parsed}, cache=parsed_ok)
         
     except Exception as e:
-        error_msg = str(e)
-        if error_msg == "RATE_LIMIT":
-            return jsonify({"error": "Rate limits exceeded, please try again later."}), 429
-        if error_msg == "AUTH_ERROR":
-            return jsonify({"error": "AI service authentication error. Please check your API key."}), 401
-        return jsonify({"error": error_msg}), 500
+        error_msg, status = error_response(e)
+        return jsonify({"error": error_msg}), status
+
+
+@bp.route("/ai-advisor/report", methods=["POST", "OPTIONS"])
+def ai_advisor_report():
+    """Run every advisor as one pipeline; later stages reuse earlier results.
+
+    With ``stream`` each advisor result is sent as an SSE ``result`` event as
+    soon as it finishes. With ``projectId`` and ``onlyStale``, stages whose
+    inputs (and the stages they build on) are unchanged are skipped, except
+    where a stale stage needs them as context.
+    """
+    if request.method == "OPTIONS":
+        return "", 204
+    
+    data, project, error = request_body()
+    if error:
+        return error
+    project_id = data.get("projectId")
+    advisor_types, error = string_list(data, "advisorTypes", advisor_report.PIPELINE)
+    if error:
+        return error
+    bypass_cache = bool(data.get("bypassCache"))
+    
+    unknown = [t for t in advisor_types if t not in advisor_report.PIPELINE]
+    if unknown:
+        return jsonify({"error": f"Unknown advisor types: {', '.join(map(str, unknown))}"}), 400
+    
+    stage_fingerprints = report_fingerprints(project) if project_id else {}
+    skipped = []
+    if project_id and data.get("onlyStale"):
+        status = fingerprint_store.status(project_id, {f"report:{t}": stage_fingerprints[t] for t in advisor_types})
+        needed = {t for t in advisor_types if status[f"report:{t}"] != fingerprints.FRESH}
+        for advisor_type in list(needed):
+            needed.update(d for d in advisor_report.PIPELINE[advisor_type] if d in advisor_types)
+        skipped = [t for t in advisor_types if t not in needed]
+        advisor_types = [t for t in advisor_types if t in needed]
+    
+    tenant = tenants.current()
+    
+    def run_stage(advisor_type, context_summary):
+        with metrics.labels(endpoint="ai-advisor/report", kind=advisor_type), tenants.scope(tenant):
+            if context_summary is None:
+                template = ADVISOR_TEMPLATES.get(advisor_type)
+                result, ok = advise(template, project, bypass_cache=bypass_cache)
+            else:
+                template = REPORT_TEMPLATES.get(advisor_type)
+                result, ok = advise(template, project, bypass_cache=bypass_cache, context_summary=context_summary)
+        if project_id and ok:
+            fingerprint_store.record(project_id, f"report:{advisor_type}", stage_fingerprints[advisor_type])
+        return result, ok
+    
+    stages = advisor_report.run_pipeline(run_stage, advisor_types)
+    
+    if data.get("stream"):
+        def events():
+            results, errors = {}, {}
+            try:
+                for advisor_type, result, error in stages:
+                    if error is None:
+                        results[advisor_type] = result
+                        yield sse_event("result", {"advisorType": advisor_type, "data": result})
+                    else:
+                        error_msg, status = error_response(error)
+                        errors[advisor_type] = {"error": error_msg, "status": status}
+                        yield sse_event("error", {"advisorType": advisor_type, **errors[advisor_type]})
+                yield sse_event("done", {"data": results, "errors": errors, "skipped": skipped})
+            finally:
+                stages.close()
+        
+        return Response(events(), mimetype="text/event-stream", headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+    
+    results, errors = {}, {}
+    for advisor_type, result, error in stages:
+        if error is None:
+            results[advisor_type] = result
+        else:
+            error_msg, status = error_response(error)
+            errors[advisor_type] = {"error": error_msg, "status": status}
+    
+    status = 200
+    if errors and not results:
+        status = max(e["status"] for e in errors.values())
+    return jsonify({"data": results, "errors": errors, "skipped": skipped}), status
 
 
-@app.route("/pitch-feedback", methods=["POST", "OPTIONS"])
+@bp.route("/staleness", methods=["POST", "OPTIONS"])
+def staleness():
+    """Which generated assets and advisor results the current project fields have made stale.
+
+    Each type is ``fresh`` (inputs unchanged since it was last generated),
+    ``stale`` or ``missing`` (never generated for this projectId).
+    """
+    if request.method == "OPTIONS":
+        return "", 204
+    
+    data, project, error = request_body()
+    if error:
+        return error
+    project_id = data.get("projectId")
+    if not project_id:
+        return jsonify({"error": "projectId is required"}), 400
+    
+    current = {f"pitch:{t}": fingerprints.fingerprint([PITCH_TEMPLATES.get(t)], project) for t in PITCH_ASSET_TYPES}
+    current.update({f"advisor:{t}": fingerprints.fingerprint([ADVISOR_TEMPLATES.get(t)], project)
+                    for t in ADVISOR_TEMPLATES.names()})
+    current.update({f"report:{t}": value for t, value in report_fingerprints(project).items()})
+    status = fingerprint_store.status(project_id, current)
+    
+    grouped = {"assets": {}, "advisors": {}, "report": {}}
+    for kind, value in status.items():
+        group, _, name = kind.partition(":")
+        grouped[{"pitch": "assets", "advisor": "advisors", "report": "report"}[group]][name] = value
+    return jsonify(grouped)
+
+
+@bp.route("/prefetch", methods=["POST", "OPTIONS"])
+def prefetch_generations():
+    """Queue low-priority background generations of what a saved project's tabs will ask for next.
+
+    ``types`` (default PREFETCH_TYPES) are ``advisor:<type>`` or
+    ``pitch:<asset type>``. Submitting a changed project for the same
+    ``projectId`` cancels what is still queued for the previous version.
+    """
+    if request.method == "OPTIONS":
+        return "", 204
+    
+    data, project, error = request_body()
+    if error:
+        return error
+    project_id = data.get("projectId")
+    types, error = string_list(data, "types", prefetch.PREFETCH_TYPES)
+    if error:
+        return error
+    if not project_id:
+        return jsonify({"error": "projectId is required"}), 400
+    unknown = [t for t in types if not is_prefetch_type(t)]
+    if unknown:
+        return jsonify({"error": f"Unknown prefetch types: {', '.join(map(str, unknown))}"}), 400
+    if not prefetch.PREFETCH:
+        return jsonify({"queued": [], "enabled": False}), 202
+    
+    # Changes to any field a prefetchable template reads make a new version.
+    version = fingerprints.fingerprint(
+        [registry.get(name) for registry in PREFETCH_REGISTRIES.values() for name in registry.names()], project
+    )
+    fingerprint_store.record(project_id, "prefetch", version)
+    tasks = [prefetch.Task(project_id, version, *t.split(":", 1), project, tenants.current())
+             for t in dict.fromkeys(types)]
+    queued = prefetcher.submit(tasks)
+    return jsonify({"queued": [f"{kind}:{name}" for kind, name in queued], "version": version}), 202
+
+
+@bp.route("/prefetch/stats", methods=["GET"])
+def prefetch_stats():
+    """Prefetch outcomes in this worker; ``hit_rate`` is used / generated."""
+    return jsonify(prefetcher.stats())
+
+
+@bp.route("/jobs", methods=["POST", "OPTIONS"])
+def submit_job():
+    """Queue a generation as a background job and return its id immediately.
+
+    The body is ``{"endpoint", "payload", "webhookUrl"}`` where ``payload``
+    is what the synchronous endpoint takes.
+    """
+    if request.method == "OPTIONS":
+        return "", 204
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    endpoint = data.get("endpoint", "")
+    payload = data.get("payload")
+    webhook_url = data.get("webhookUrl")
+    
+    if endpoint not in JOB_ENDPOINTS:
+        return jsonify({"error": f"Unknown job endpoint: {endpoint}"}), 400
+    if not isinstance(payload, dict):
+        return jsonify({"error": "payload must be an object"}), 400
+    if webhook_url:
+        problem = jobs.check_webhook_url(webhook_url)
+        if problem:
+            return jsonify({"error": problem}), 400
+    
+    # An explicit refresh must not be answered with an earlier job's result.
+    job, created = job_queue.submit(endpoint, payload, webhook_url or None, dedupe=not payload.get("bypassCache"))
+    view = jobs.public_view(job)
+    view["deduplicated"] = not created
+    return jsonify(view), 202, {"Location": f"/jobs/{job['id']}"}
+
+
+@bp.route("/jobs/stats", methods=["GET"])
+def job_stats():
+    """Job counts by state plus this worker's processing counters."""
+    return jsonify(job_queue.stats())
+
+
+@bp.route("/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    """Status of a background job, with its result once it has finished."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(jobs.public_view(job))
+
+
+def parse_feedback(content, reask=repair_json):
+    """Turn a pitch-feedback completion into ``(feedback items, parsed ok)``."""
+    with metrics.timer("extract"):
+        parsed = json_extract.extract(content, reask=reask)
+    if not isinstance(parsed, dict):
+        return [{"category": "Overall", "score": "needs_work", "feedback": "Unable to parse feedback. Please try again."}], False
+    
+    if "feedback" in parsed:
+        return parsed["feedback"], True
+    score = parsed.get("score", 0)
+    return [
+        {"category": "Overall Score", "score": "good" if isinstance(score, (int, float)) and score >= 7 else "needs_work", "feedback": f"Score: {parsed.get('score', 'N/A')}/10"},
+        {"category": "Strengths", "score": "good", "feedback": ". ".join(map(str, parsed.get("strengths", [])))},
+        {"category": "Areas to Improve", "score": "needs_work", "feedback": ". ".join(map(str, parsed.get("weaknesses", [])))},
+        {"category": "Suggested Rewrite", "score": "good", "feedback": parsed.get("rewrite_suggestion", "No rewrite provided")}
+    ], True
+
+
+def feedback_accepted(content):
+    """``accept`` for pitch-feedback completions: cache only those that parse locally (see advice_accepted)."""
+    return parse_feedback(content, reask=None)[1]
+
+
+@bp.route("/pitch-feedback", methods=["POST", "OPTIONS"])
 def pitch_feedback():
     """Get AI feedback on user's pitch."""
     if request.method == "OPTIONS":
         return "", 204
     
     try:
-        data = request.get_json()
-        project = data.get("project", {})
+        data, project, error = request_body()
+        if error:
+            return error
         prompt_type = data.get("promptType", "")
         user_pitch = data.get("userPitch", "")
         
-        user_prompt = f"""Score this pitch on clarity, credibility, and conciseness (1–10).
-
-Company context:
-- Name: {project.get('startup_name', '')}
-- One-liner: {project.get('one_liner', '')}
-- Problem: {project.get('problem_statement', '')}
-- Solution: {project.get('solution_description', '')}
-- Target users: {project.get('target_users', '')}
-- Traction: {project.get('traction_users', 'Not specified')} users, {project.get('traction_revenue', 'Not specified')} revenue
-- Ask: {project.get('ask_amount', '')}
-
-Pitch type: {prompt_type}
-
-User's pitch attempt:
-\"\"\"
-{user_pitch}
-\"\"\"
-
-Return ONLY valid JSON in this exact format:
-{{
-  "score": number,
-  "strengths": ["strength 1", "strength 2"],
-  "weaknesses": ["weakness 1", "weakness 2"],
-  "rewrite_suggestion": "improved version of the pitch",
-  "feedback": [
-    {{"category": "Clarity", "score": "good", "feedback": "1-2 sentences of specific advice"}},
-    {{"category": "Hook", "score": "needs_work", "feedback": "1-2 sentences"}},
-    {{"category": "Specificity", "score": "good", "feedback": "1-2 sentences"}},
-    {{"category": "Traction", "score": "needs_work", "feedback": "1-2 sentences"}},
-    {{"category": "Ask", "score": "missing", "feedback": "1-2 sentences"}}
-  ]
-}}"""
-
-        messages = [
-            {"role": "system", "content": FUNDINGNEMO_SYSTEM},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        content = call_gradient_ai(messages, max_tokens=1000)
+        metrics.set_labels(kind="pitch_feedback")
+        template = FEEDBACK_TEMPLATES.get("pitch_feedback")
+        bypass_cache = bool(data.get("bypassCache"))
+        key, similar = lookup_similar(template, project, bypass_cache, prompt_type=prompt_type, user_pitch=user_pitch)
+        if similar is not None:
+            content, score = similar
+            marker = {"cached": True, "similarity": round(score, 3)}
+            if data.get("stream"):
+                return sse_response(iter_once(content), lambda content: {"feedback": parse_feedback(content)[0], **marker})
+            return jsonify({"feedback": parse_feedback(content)[0], **marker})
         
-        # Parse JSON
-        import json
-        try:
-            clean_content = content.replace("```json\n", "").replace("```\n", "").replace("```", "").strip()
-            parsed = json.loads(clean_content)
+        messages = template_messages(template, project, prompt_type=prompt_type, user_pitch=user_pitch)
+        max_tokens = max_tokens_for(template, stream=bool(data.get("stream")))
+        if data.get("stream"):
+            chunks = stream_gradient_ai(messages, max_tokens=max_tokens, bypass_cache=bypass_cache,
+                                        endpoint="pitch-feedback", template=template, accept=feedback_accepted)
             
-            if "feedback" in parsed:
-                feedback = parsed["feedback"]
-            else:
-                feedback = [
-                    {"category": "Overall Score", "score": "good" if parsed.get("score", 0) >= 7 else "needs_work", "feedback": f"Score: {parsed.get('score', 'N/A')}/10"},
-                    {"category": "Strengths", "score": "good", "feedback": ". ".join(parsed.get("strengths", []))},
-                    {"category": "Areas to Improve", "score": "needs_work", "feedback": ". ".join(parsed.get("weaknesses", []))},
-                    {"category": "Suggested Rewrite", "score": "good", "feedback": parsed.get("rewrite_suggestion", "No rewrite provided")}
-                ]
-        except json.JSONDecodeError:
-            feedback = [{"category": "Overall", "score": "needs_work", "feedback": "Unable to parse feedback. Please try again."}]
+            def finish(content):
+                feedback, parsed_ok = parse_feedback(content)
+                if parsed_ok:
+                    store_similar(key, content)
+                return {"feedback": feedback}
+            
+            return sse_response(chunks, finish)
+        
+        content = call_gradient_ai(messages, max_tokens=max_tokens, bypass_cache=bypass_cache,
+                                   endpoint="pitch-feedback", template=template, accept=feedback_accepted)
+        kind = ("pitch-feedback", template.name, template.version)
+        response = cached_body(kind, content)
+        if response is not None:
+            # Only parsed results have their body cached.
+            store_similar(key, content)
+            return response
         
-        return jsonify({"feedback": feedback})
+        feedback, parsed_ok = parse_feedback(content)
+        if parsed_ok:
+            store_similar(key, content)
+        return body_response(kind, content, {"feedback": feedback}, cache=parsed_ok)
         
     except Exception as e:
-        error_msg = str(e)
-        if error_msg == "RATE_LIMIT":
-            return jsonify({"error": "Rate limits exceeded, please try again later."}), 429
-        if error_msg == "AUTH_ERROR":
-            return jsonify({"error": "AI service authentication error. Please check your API key."}), 401
-        return jsonify({"error": error_msg}), 500
+        error_msg, status = error_response(e)
+        return jsonify({"error": error_msg}), status
+
+
+def check_config():
+    """Validate settings once at startup.
+
+    Raises ValueError for values the app cannot run with and returns
+    warnings for ones it can (a provider without an API key answers every
+    generation with an error).
+    """
+    problems = []
+    if MAX_REQUEST_BYTES <= 0:
+        problems.append(f"MAX_REQUEST_BYTES must be positive, got {MAX_REQUEST_BYTES}")
+    unknown = [t for t in prefetch.PREFETCH_TYPES if not is_prefetch_type(t)]
+    if unknown:
+        problems.append(f"PREFETCH_TYPES: unknown types {', '.join(unknown)}")
+    for provider in router.providers:
+        if not provider.url.startswith(("http://", "https://")):
+            problems.append(f"provider {provider.name}: URL must be http(s), got {provider.url!r}")
+    if problems:
+        raise ValueError("Invalid configuration: " + "; ".join(problems))
+    return [f"{provider.key_env} is not set (provider {provider.name})"
+            for provider in router.providers if not provider.api_key()]
+
+
+def create_app():
+    """Build a Flask app serving this module's endpoints.
+
+    Everything that can be shared between gunicorn workers (config, prompt
+    templates, caches, metric registrations) is set up at import, so with
+    ``preload_app`` it is done once in the master and inherited
+    copy-on-write. Per-process state (connections, job threads) is created
+    after the fork by ``warm_up``. That state is module-level, so every app
+    built here shares the caches, scheduler, job queue and prefetcher of
+    the process; only routing, config and extensions are per app. Jobs run
+    through whichever app started the process's job threads.
+    """
+    warnings = check_config()
+    app = Flask(__name__)
+    app.json = TimedJSONProvider(app)
+    app.config["MAX_CONTENT_LENGTH"] = MAX_REQUEST_BYTES
+    CORS(app)
+    app.register_blueprint(bp)
+    app.extensions["fundingnemo_run_job"] = job_runner(app)
+    # Build the URL map now instead of on the first request.
+    app.url_map.update()
+    for warning in warnings:
+        app.logger.warning(warning)
+    return app
+
+
+def warm_up(flask_app=None):
+    """Per-worker start-up: job and prefetch threads, and keep-alive connections to every provider.
+
+    Called by gunicorn's post_worker_init hook, after the fork, so no
+    socket or thread is shared between workers. Jobs run through
+    ``flask_app`` (default: the module-level ``app``). Returns the number
+    of upstream connections opened.
+    """
+    start_jobs(flask_app or app)
+    prefetcher.start()
+    return http_client.warm(provider.url for provider in router.providers)
+
+
+app = create_app()
 
 
 if __name__ == "__main__":
+    warm_up()
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=False)
@@ -0,0 +1 @@
+"""Offline benchmarks for the Flask backend. Run from flask-backend/ with ``python -m bench.<name>``."""
@@ -0,0 +1,48 @@
+"""Wall-clock time of six sequential /generate-pitch calls versus one batch call.
+
+    python -m bench.batch --latency 0.5
+"""
+import argparse
+import os
+import time
+
+from bench.stub_server import GradientStub
+
+PROJECT = {
+    "startup_name": "Acme Robotics",
+    "one_liner": "Warehouse robots as a service",
+    "problem_statement": "Warehouses cannot hire enough pickers.",
+    "solution_description": "Autonomous picking robots leased per month.",
+    "category": "Robotics",
+    "ask_amount": "$2M",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub upstream latency (s)")
+    args = parser.parse_args()
+
+    with GradientStub(latency=args.latency) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        import app
+        app.GRADIENT_API_URL = stub.url
+        client = app.app.test_client()
+
+        start = time.perf_counter()
+        for asset_type in app.PITCH_ASSET_TYPES:
+            client.post("/generate-pitch", json={"project": PROJECT, "assetType": asset_type, "bypassCache": True})
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = client.post("/generate-pitch/batch", json={"project": PROJECT, "bypassCache": True})
+        batch = time.perf_counter() - start
+
+    body = response.get_json()
+    print(f"sequential: {sequential:.2f} s  ({len(app.PITCH_ASSET_TYPES)} calls)")
+    print(f"     batch: {batch:.2f} s  ({len(body['results'])} ok, {len(body['errors'])} errors)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Response cache lookup cost versus an upstream round trip.
+
+    python -m bench.cache --latency 0.5 --lookups 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import llm_cache
+from bench.stub_server import GradientStub
+
+MESSAGES = [
+    {"role": "system", "content": "You are FundingNEMO."},
+    {"role": "user", "content": "Rewrite this startup description into a tagline. " * 40},
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.5, help="stub upstream latency (s)")
+    parser.add_argument("--lookups", type=int, default=20000)
+    args = parser.parse_args()
+
+    with GradientStub(latency=args.latency, content="x" * 4000) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        import app
+
+        tmp = tempfile.mkdtemp()
+        backends = {
+            "memory": llm_cache.MemoryCache(),
+            "sqlite": llm_cache.SqliteCache(path=os.path.join(tmp, "cache.sqlite3")),
+        }
+        for name, cache in backends.items():
+            app.GRADIENT_API_URL = stub.url
+            app.response_cache = cache
+
+            start = time.perf_counter()
+            app.call_gradient_ai(MESSAGES)
+            miss = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(args.lookups):
+                app.call_gradient_ai(MESSAGES)
+            hit = (time.perf_counter() - start) / args.lookups
+
+            print(f"{name:>6}: miss {miss * 1000:.1f} ms  hit {hit * 1e6:.1f} us  "
+                  f"speedup {miss / hit:,.0f}x  stats {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Compare two bench.loadtest result files run by run.
+
+    python -m bench.compare before.json after.json --threshold 0.10 --fail-on-regression
+"""
+import argparse
+import json
+import sys
+
+# (label, path into a run, True if higher is better)
+METRICS = [
+    ("throughput req/s", ("throughput_rps",), True),
+    ("p50 ms", ("latency", "all", "p50"), False),
+    ("p95 ms", ("latency", "all", "p95"), False),
+    ("p99 ms", ("latency", "all", "p99"), False),
+    ("error rate", ("error_rate",), False),
+    ("rss/worker MB", ("rss_mb", "per_worker_mean"), False),
+]
+
+
+def lookup(run, path):
+    value = run
+    for key in path:
+        if not isinstance(value, dict) or value.get(key) is None:
+            return None
+        value = value[key]
+    return value
+
+
+def fmt(label, value):
+    if value is None:
+        return "-"
+    if label.endswith(" ms"):
+        return f"{value * 1000:.0f}"
+    if label == "error rate":
+        return f"{value:.2%}"
+    return f"{value:.1f}"
+
+
+def compare(before, after, threshold):
+    """Yield (run key, label, before, after, change, regressed) for runs present in both files."""
+    runs = {(r["config"], r["concurrency"]): r for r in before["runs"]}
+    for run in after["runs"]:
+        key = (run["config"], run["concurrency"])
+        if key not in runs:
+            continue
+        for label, path, higher_is_better in METRICS:
+            old, new = lookup(runs[key], path), lookup(run, path)
+            if old is None or new is None:
+                continue
+            if label == "error rate":
+                # Absolute percentage points; relative change is meaningless near zero.
+                change = new - old
+                regressed = change > threshold / 10
+            else:
+                change = (new - old) / old if old else 0.0
+                regressed = -change > threshold if higher_is_better else change > threshold
+            yield key, label, old, new, change, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change counted as a regression (error rate: threshold/10 absolute)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if anything regressed")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before {before['meta'].get('commit')}  after {after['meta'].get('commit')}")
+    regressions = 0
+    current = None
+    for key, label, old, new, change, regressed in compare(before, after, args.threshold):
+        if key != current:
+            current = key
+            print(f"\n{key[0]} concurrency {key[1]}")
+        regressions += regressed
+        change_text = f"{change * 100:+.2f}pp" if label == "error rate" else f"{change:+.1%}"
+        print(f"  {label:<18} {fmt(label, old):>10} -> {fmt(label, new):<10} {change_text:>10}"
+              f"{'  REGRESSION' if regressed else ''}")
+
+    if current is None:
+        print("no runs in common (matched by config and concurrency)")
+    print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
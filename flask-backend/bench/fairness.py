@@ -0,0 +1,87 @@
+"""Light users' latency while one tenant floods the upstream, FIFO versus fair share.
+
+One heavy tenant keeps ``--heavy-clients`` generations in flight (a
+"generate all" loop) while ``--light-tenants`` users each send one request
+at a time with think time in between. The scheduler allows
+``--max-concurrency`` upstream calls, so requests queue; with fair sharing
+queued calls take turns by tenant instead of arriving order.
+
+    python -m bench.fairness --duration 10 --max-concurrency 4
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from bench.load import PROJECT, percentile
+from bench.stub_server import GradientStub
+
+
+def run(app, args, fair_share):
+    import upstream_scheduler
+
+    app.scheduler = upstream_scheduler.UpstreamScheduler(max_concurrency=args.max_concurrency, fair_share=fair_share,
+                                                         queue_timeout=120)
+    client = app.app.test_client()
+    latencies = {"heavy": [], "light": []}
+    lock = threading.Lock()
+    stop = time.monotonic() + args.duration
+
+    def loop(kind, tenant, client_id, think):
+        i = 0
+        while time.monotonic() < stop:
+            i += 1
+            start = time.perf_counter()
+            response = client.post("/generate-pitch", headers={"X-Tenant-Id": tenant}, json={
+                "assetType": "tagline", "project": {**PROJECT, "startup_name": f"{tenant} {client_id}-{i}"},
+            })
+            elapsed = time.perf_counter() - start
+            assert response.status_code == 200, response.get_json()
+            with lock:
+                latencies[kind].append(elapsed)
+            time.sleep(think)
+
+    threads = [threading.Thread(target=loop, args=("heavy", "heavy", i, 0)) for i in range(args.heavy_clients)]
+    threads += [threading.Thread(target=loop, args=("light", f"light-{i}", 0, args.think))
+                for i in range(args.light_tenants)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument("--heavy-clients", type=int, default=24)
+    parser.add_argument("--light-tenants", type=int, default=4)
+    parser.add_argument("--think", type=float, default=0.2, help="light users' pause between requests (s)")
+    parser.add_argument("--latency", type=float, default=0.1, help="stub upstream latency (s)")
+    args = parser.parse_args()
+
+    with GradientStub(latency=args.latency, content="Robots pick orders while your team sleeps.") as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        os.environ["LLM_CACHE_BACKEND"] = "none"
+        os.environ["TENANT_USAGE_PATH"] = os.path.join(tempfile.mkdtemp(), "tenants.sqlite3")
+        import app
+
+        print(f"{args.heavy_clients} heavy clients vs {args.light_tenants} light tenants, "
+              f"{args.max_concurrency} upstream slots, {args.latency * 1000:.0f}ms upstream latency")
+        for label, fair_share in (("FIFO", False), ("fair share", True)):
+            latencies = run(app, args, fair_share)
+            print(f"  {label}")
+            for kind in ("light", "heavy"):
+                samples = latencies[kind]
+                print(f"    {kind:<6} {len(samples):5d} requests  p50 {percentile(samples, 0.5) * 1000:6.0f}ms  "
+                      f"p99 {percentile(samples, 0.99) * 1000:6.0f}ms")
+        app.tenant_usage.flush()
+        usage = app.tenant_usage.usage()
+        print("  upstream calls by tenant, both runs: " + ", ".join(f"{t} {u['upstream_calls']}" for t, u in usage.items()))
+
+
+if __name__ == "__main__":
+    main()
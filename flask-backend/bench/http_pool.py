@@ -0,0 +1,68 @@
+"""Per-call latency of a fresh ``requests.post`` versus the pooled session.
+
+    python -m bench.http_pool --calls 500 --threads 8
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import http_client
+from bench.stub_server import GradientStub
+
+BODY = {"model": "stub", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 10}
+
+
+def fresh_call(url):
+    return requests.post(url, json=BODY, timeout=(5, 60)).json()
+
+
+def pooled_call(url):
+    return http_client.get_session().post(url, json=BODY, timeout=http_client.timeout()).json()
+
+
+def run(fn, url, calls, threads):
+    samples = []
+
+    def one(_):
+        start = time.perf_counter()
+        fn(url)
+        samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(calls)))
+    wall = time.perf_counter() - start
+    samples.sort()
+    return {
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[int(len(samples) * 0.95)] * 1000,
+        "wall_s": wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    with GradientStub() as stub:
+        results = {}
+        for name, fn in (("fresh", fresh_call), ("pooled", pooled_call)):
+            stub.connections.clear()
+            results[name] = run(fn, stub.url, args.calls, args.threads)
+            results[name]["connections"] = len(stub.connections)
+
+    for name, r in results.items():
+        print(f"{name:>7}: mean {r['mean_ms']:.3f} ms  p50 {r['p50_ms']:.3f} ms  "
+              f"p95 {r['p95_ms']:.3f} ms  wall {r['wall_s']:.2f} s  connections {r['connections']}")
+    saved = results["fresh"]["mean_ms"] - results["pooled"]["mean_ms"]
+    print(f"saved per call: {saved:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
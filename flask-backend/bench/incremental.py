@@ -0,0 +1,101 @@
+"""Upstream calls in an edit-heavy session: full regeneration versus onlyStale.
+
+A founder edits one project field at a time and regenerates every pitch
+asset and the advisor report after each edit. Counts stub requests for
+full and ``onlyStale`` regeneration, each with and without the response
+cache. Like a real model, the stub never returns the same funding plan
+twice, so a regenerated stage changes the context of the stages after it.
+
+    python -m bench.incremental --edits 20 --workers 4
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import tempfile
+
+from bench.report import echo_example
+from bench.stub_server import GradientStub
+
+PROJECT = {
+    "startup_name": "Acme Robotics",
+    "one_liner": "Warehouse robots as a service",
+    "problem_statement": "Mid-size warehouses cannot hire enough pickers and lose orders at peak.",
+    "solution_description": "Autonomous picking robots leased per month, live in two weeks.",
+    "category": "Robotics",
+    "stage": "Seed",
+    "target_users": "Mid-size 3PL warehouses",
+    "business_model": "Robots-as-a-service subscription",
+    "ask_amount": "$2M",
+    "use_of_funds": "Hiring and fleet expansion",
+    "traction_users": "12 pilots",
+    "traction_revenue": "$40K MRR",
+    "traction_growth": "15% MoM",
+}
+
+
+def session(app, caches, edits, seed, only_stale):
+    """Generate everything once, then apply ``edits`` single-field edits, regenerating after each.
+
+    Requests rotate over ``caches`` like requests spread over gunicorn
+    workers, each with its own in-memory response cache.
+    """
+    client = app.app.test_client()
+    requests_sent = itertools.count()
+    rng = random.Random(seed)
+    project = dict(PROJECT)
+    project_id = f"bench-{seed}-{only_stale}"
+    for i in range(edits + 1):
+        if i:
+            field = rng.choice(list(PROJECT))
+            project[field] = f"{PROJECT[field]} (rev {i})"
+        body = {"projectId": project_id, "project": project, "onlyStale": only_stale}
+        for path in ("/generate-pitch/batch", "/ai-advisor/report"):
+            app.response_cache = caches[next(requests_sent) % len(caches)]
+            response = client.post(path, json=body)
+            assert response.status_code == 200, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edits", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=4, help="simulated workers with separate memory caches")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    completions = itertools.count(1)
+
+    def content(body):
+        prompt = body["messages"][-1]["content"]
+        if "JSON" not in prompt:
+            return "Robots pick orders while your team sleeps."
+        result = json.loads(echo_example(body))
+        if isinstance(result.get("recommended_ask"), dict):
+            result["recommended_ask"]["amount"] = f"${next(completions)}M"
+        return json.dumps(result)
+
+    with GradientStub(content=content) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        os.environ["FINGERPRINT_PATH"] = os.path.join(tempfile.mkdtemp(), "fingerprints.sqlite3")
+        import app
+        import llm_cache
+
+        calls = {}
+        for mode, backend, only_stale in (("full, no cache", "none", False), ("full, memory cache", "memory", False),
+                                          ("onlyStale, no cache", "none", True),
+                                          ("onlyStale, memory cache", "memory", True)):
+            caches = [llm_cache.make_cache(backend) for _ in range(args.workers)]
+            before = stub.requests
+            session(app, caches, args.edits, args.seed, only_stale)
+            calls[mode] = stub.requests - before
+
+    generations = (args.edits + 1) * (len(app.PITCH_ASSET_TYPES) + len(app.advisor_report.PIPELINE))
+    print(f"{args.edits} single-field edits, {generations} generations requested, {args.workers} workers")
+    for mode, count in calls.items():
+        print(f"  {mode:<24} {count:5d} upstream calls ({count / calls['full, no cache']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
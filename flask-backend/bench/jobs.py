@@ -0,0 +1,64 @@
+"""Holding a request open for a long advisor call versus queueing it as a job.
+
+    python -m bench.jobs --latency 2.0 --jobs 12 --workers 4
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from bench.stub_server import GradientStub
+
+PROJECT = {"startup_name": "Acme", "one_liner": "Rockets for small satellites"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=2.0, help="stub upstream latency (s)")
+    parser.add_argument("--jobs", type=int, default=12, help="distinct advisor jobs to queue")
+    parser.add_argument("--workers", type=int, default=4, help="JOB_WORKERS")
+    args = parser.parse_args()
+
+    content = json.dumps({"funding_summary": {"recommended_raise": "$1M"}, "use_of_funds": []})
+    with GradientStub(latency=args.latency, content=content) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        os.environ["LLM_CACHE_BACKEND"] = "none"
+        os.environ["JOB_QUEUE_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+        os.environ["JOB_WORKERS"] = str(args.workers)
+        os.environ["JOB_POLL_INTERVAL"] = "0.05"
+        import app
+
+        client = app.app.test_client()
+
+        def payload(i):
+            return {"project": {**PROJECT, "startup_name": f"Acme {i}"}, "advisorType": "financial_model"}
+
+        start = time.perf_counter()
+        client.post("/ai-advisor", json=payload(-1))
+        held = time.perf_counter() - start
+        print(f"synchronous /ai-advisor: connection held {held * 1000:.0f} ms")
+
+        start = time.perf_counter()
+        ids = [client.post("/jobs", json={"endpoint": "ai-advisor", "payload": payload(i)}).get_json()["jobId"]
+               for i in range(args.jobs)]
+        submitted = time.perf_counter() - start
+        duplicate = client.post("/jobs", json={"endpoint": "ai-advisor", "payload": payload(0)}).get_json()
+
+        pending = set(ids)
+        while pending:
+            time.sleep(0.02)
+            pending = {i for i in pending if client.get(f"/jobs/{i}").get_json()["status"] in ("queued", "running")}
+        drained = time.perf_counter() - start
+
+        print(f"POST /jobs: {submitted / args.jobs * 1000:.1f} ms per submit, "
+              f"{args.jobs} jobs done in {drained:.2f}s with {args.workers} workers "
+              f"({args.jobs * args.latency / drained:.1f}x sequential throughput)")
+        print(f"duplicate submit deduplicated={duplicate['deduplicated']}; "
+              f"upstream requests {stub.requests} for {args.jobs + 1} distinct prompts")
+        print(app.job_queue.stats())
+
+
+if __name__ == "__main__":
+    main()
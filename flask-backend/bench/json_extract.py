@@ -0,0 +1,77 @@
+"""Parse success rate and cost on messy model outputs: legacy regex path vs json_extract.
+
+    python -m bench.json_extract --iterations 2000
+"""
+import argparse
+import json
+import re
+import time
+
+import json_extract
+
+GOOD = json.dumps({
+    "recommended_ask": {"amount": "$1.5M - $2M", "reasoning": "18 months of runway at seed burn {est.}"},
+    "equity_guidance": {"range": "15% - 20%", "reasoning": "Typical seed dilution"},
+    "use_of_funds_breakdown": [
+        {"category": "Engineering", "percentage": 40, "reasoning": "build core product"},
+        {"category": "Sales & Marketing", "percentage": 30, "reasoning": "customer acquisition"},
+    ],
+    "valuation_estimate": {"range": "$8M - $10M", "method": "Comparable seed rounds"},
+    "runway_recommendation": {"months": 18, "reasoning": "Reach Series A metrics"},
+}, indent=2)
+
+CORPUS = {
+    "clean": GOOD,
+    "fenced": f"```json\n{GOOD}\n```",
+    "prose around": f"Here is the analysis you asked for:\n\n{GOOD}\n\nLet me know if you need changes!",
+    "trailing prose with braces": f"{GOOD}\n\nNote: adjust {{valuation}} for your market.",
+    "two objects": f'{GOOD}\n\nAlternative: {{"recommended_ask": {{}}}}',
+    "trailing commas": GOOD.replace('"Typical seed dilution"', '"Typical seed dilution",').replace("18\n", "18,\n", 1),
+    "truncated (max_tokens)": GOOD[: int(len(GOOD) * 0.8)],
+    "fence without newline": f"```json{GOOD}```",
+    "brace inside string first": 'The model said "{" first. ' + GOOD,
+    "no json": "I'm sorry, I can't help with that.",
+}
+
+
+def legacy_parse(content):
+    """The pre-json_extract ai_advisor parsing path."""
+    content = content.replace("```json\n", "").replace("```\n", "").replace("```", "").strip()
+    json_match = re.search(r'\{[\s\S]*\}', content)
+    if json_match:
+        content = json_match.group(0)
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return None
+
+
+def new_parse(content):
+    return json_extract.extract(content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"decoder: {'orjson' if json_extract.orjson else 'json'}")
+    print(f"{'case':>28}  {'legacy':>16}  {'json_extract':>16}")
+    totals = {"legacy": 0, "new": 0}
+    for case, text in CORPUS.items():
+        row = []
+        for name, fn in (("legacy", legacy_parse), ("new", new_parse)):
+            ok = fn(text) is not None
+            totals[name] += ok
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                fn(text)
+            per_parse = (time.perf_counter() - start) / args.iterations
+            row.append(f"{'ok ' if ok else 'FAIL'} {per_parse * 1e6:8.1f} us")
+        print(f"{case:>28}  {row[0]:>16}  {row[1]:>16}")
+    n = len(CORPUS)
+    print(f"{'success rate':>28}  {totals['legacy']}/{n:<14}  {totals['new']}/{n}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Concurrent load against a real gunicorn process backed by a delayed stub.
+
+Shows how many slow completions one worker sustains per worker class while
+/health keeps answering. Every request has a distinct prompt, so each one
+is a separate upstream call:
+
+    python -m bench.load --worker-class sync --concurrency 20
+    python -m bench.load --worker-class gthread --threads 16 --concurrency 20
+    python -m bench.load --worker-class gevent --concurrency 100
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench.stub_server import GradientStub
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT = {"startup_name": "Acme Robotics", "one_liner": "Warehouse robots as a service"}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(port, upstream_url, args, extra_env=None):
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        GRADIENT_API_URL=upstream_url,
+        MODEL_ACCESS_KEY=os.environ.get("MODEL_ACCESS_KEY", "bench"),
+        LLM_CACHE_BACKEND="none",
+        GUNICORN_WORKER_CLASS=args.worker_class,
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        GUNICORN_ACCESSLOG="",
+        **(extra_env or {}),
+    )
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))] if samples else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--worker-class", default="gthread", choices=["sync", "gthread", "gevent"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=1.0, help="stub upstream latency (s)")
+    args = parser.parse_args()
+
+    with GradientStub(latency=args.latency) as stub:
+        port = free_port()
+        proc = start_gunicorn(port, stub.url, args)
+        base = f"http://127.0.0.1:{port}"
+        latencies, health, errors = [], [], []
+        done = threading.Event()
+
+        def probe_health():
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    requests.get(f"{base}/health", timeout=10)
+                    health.append(time.perf_counter() - start)
+                except requests.RequestException:
+                    health.append(10.0)
+                time.sleep(0.1)
+
+        def one(i):
+            start = time.perf_counter()
+            try:
+                # A distinct prompt per request, so identical prompts aren't coalesced into one upstream call.
+                project = {**PROJECT, "startup_name": f"{PROJECT['startup_name']} {i}"}
+                r = requests.post(f"{base}/generate-pitch", timeout=120,
+                                  json={"project": project, "assetType": "tagline"})
+                if r.status_code != 200:
+                    errors.append(r.status_code)
+            except requests.RequestException as e:
+                errors.append(type(e).__name__)
+            latencies.append(time.perf_counter() - start)
+
+        prober = threading.Thread(target=probe_health, daemon=True)
+        prober.start()
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+                list(pool.map(one, range(args.requests)))
+        finally:
+            wall = time.perf_counter() - start
+            done.set()
+            proc.terminate()
+            proc.wait()
+
+    in_flight = sum(latencies) / wall
+    threads = args.threads if args.worker_class == "gthread" else 1
+    print(f"{args.worker_class} x{args.workers} (threads={threads}), concurrency {args.concurrency}, "
+          f"upstream latency {args.latency:.1f}s")
+    print(f"  throughput {args.requests / wall:.1f} req/s  avg in-flight {in_flight:.1f}  "
+          f"errors {len(errors)} {sorted(set(map(str, errors)))}")
+    print(f"  /generate-pitch p50 {percentile(latencies, 0.5):.2f}s  p95 {percentile(latencies, 0.95):.2f}s")
+    print(f"  /health         p50 {percentile(health, 0.5) * 1000:.0f}ms  max {max(health) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
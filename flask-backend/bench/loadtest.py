@@ -0,0 +1,305 @@
+"""Offline load test across gunicorn worker/thread settings.
+
+Drives /generate-pitch, /ai-advisor and /pitch-feedback against a local
+Gradient stub (latency distribution, streaming, 429/5xx and malformed
+output injection) and writes latency percentiles, throughput, error rates
+and RSS per worker as JSON that bench.compare can diff between commits:
+
+    python -m bench.loadtest --configs gthread:2x8 gevent:2 sync:4 --concurrency 16 64 \\
+        --latency 1.0 --latency-dist lognormal --error-rate 0.02 --output before.json
+    python -m bench.compare before.json after.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+
+from bench.load import BACKEND_DIR, free_port, percentile, start_gunicorn
+from bench.report import echo_example
+from bench.stub_server import LATENCY_DISTS, GradientStub
+
+PROJECT = {
+    "startup_name": "Acme Robotics",
+    "one_liner": "Warehouse robots as a service",
+    "problem_statement": "Mid-size warehouses cannot hire enough pickers and lose orders at peak.",
+    "solution_description": "Autonomous picking robots leased per month, live in two weeks.",
+    "category": "Robotics",
+    "stage": "Seed",
+    "target_users": "Mid-size 3PL warehouses",
+    "business_model": "Robots-as-a-service subscription",
+    "ask_amount": "$2M",
+    "traction_users": "12 pilots",
+    "traction_revenue": "$40K MRR",
+}
+ASSET_TYPES = ("tagline", "30sec", "2min", "deck_outline", "cold_email", "linkedin_intro")
+ADVISOR_TYPES = ("smart_guidance", "competitor_analysis", "investor_matching", "financial_model", "marketing_strategy")
+STREAMABLE = ("generate-pitch", "pitch-feedback")
+FEEDBACK = json.dumps({
+    "score": 7,
+    "strengths": ["Clear problem framing", "Concrete customer"],
+    "weaknesses": ["No traction numbers"],
+    "rewrite_suggestion": "Warehouses lose orders at peak because they cannot hire pickers.",
+})
+
+
+def stub_content(body):
+    """Pitch text, the advisor's JSON example, or a feedback JSON, depending on the prompt."""
+    prompt = body["messages"][-1]["content"]
+    if "Score this pitch" in prompt:
+        return FEEDBACK
+    if "JSON" in prompt:
+        return echo_example(body)
+    return " ".join(["Robots pick orders while your team sleeps."] * 8)
+
+
+def parse_config(spec):
+    """``gthread:2x8`` -> (worker class, workers, threads)."""
+    worker_class, _, shape = spec.partition(":")
+    workers, _, threads = (shape or "1").partition("x")
+    return worker_class, int(workers), int(threads or 1)
+
+
+def request_body(endpoint, rng, stream_fraction):
+    if endpoint == "generate-pitch":
+        body = {"project": PROJECT, "assetType": rng.choice(ASSET_TYPES)}
+    elif endpoint == "ai-advisor":
+        body = {"project": PROJECT, "advisorType": rng.choice(ADVISOR_TYPES)}
+    else:
+        body = {"project": PROJECT, "promptType": "30sec", "userPitch": "We help warehouses pick faster."}
+    if endpoint in STREAMABLE and rng.random() < stream_fraction:
+        body["stream"] = True
+    return body
+
+
+def child_pids(pid):
+    """Direct children of ``pid`` (gunicorn workers of the master)."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def summarize(samples):
+    if not samples:
+        return None
+    return {
+        "count": len(samples),
+        "mean": sum(samples) / len(samples),
+        "p50": percentile(samples, 0.50),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+        "max": max(samples),
+    }
+
+
+def run_load(base, endpoints, weights, concurrency, duration, stream_fraction, seed):
+    """Closed-loop load: ``concurrency`` clients send requests back to back for ``duration`` seconds."""
+    results = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        local = []
+        while time.perf_counter() < deadline:
+            endpoint = rng.choices(endpoints, weights)[0]
+            body = request_body(endpoint, rng, stream_fraction)
+            start = time.perf_counter()
+            ttfb = None
+            status = None
+            try:
+                response = session.post(f"{base}/{endpoint}", json=body, timeout=120, stream=body.get("stream"))
+                status = response.status_code
+                if body.get("stream") and status == 200:
+                    for chunk in response.iter_content(chunk_size=None):
+                        if ttfb is None:
+                            ttfb = time.perf_counter() - start
+                        if b"event: error" in chunk:
+                            status = "stream_error"
+                response.close()
+            except requests.RequestException as e:
+                status = type(e).__name__
+            local.append((endpoint, status, time.perf_counter() - start, ttfb))
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def run_config(spec, concurrency, stub, args):
+    worker_class, workers, threads = parse_config(spec)
+    port = free_port()
+    proc = start_gunicorn(
+        port, stub.url,
+        argparse.Namespace(worker_class=worker_class, workers=workers, threads=threads),
+        extra_env={"JOB_QUEUE_PATH": os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")},
+    )
+    endpoints, weights = zip(*args.mix.items())
+    rss = defaultdict(list)
+    done = threading.Event()
+
+    def sample_memory():
+        while not done.is_set():
+            for pid in child_pids(proc.pid):
+                value = rss_mb(pid)
+                if value is not None:
+                    rss[pid].append(value)
+            done.wait(0.5)
+
+    stub_requests = stub.requests
+    injected = dict(stub.injected)
+    sampler = threading.Thread(target=sample_memory, daemon=True)
+    sampler.start()
+    try:
+        results, wall = run_load(f"http://127.0.0.1:{port}", endpoints, weights, concurrency,
+                                 args.duration, args.stream_fraction, args.seed)
+    finally:
+        done.set()
+        sampler.join()
+        master_rss = rss_mb(proc.pid)
+        proc.terminate()
+        proc.wait()
+
+    errors = Counter(str(status) for _, status, _, _ in results if status != 200)
+    by_endpoint = defaultdict(list)
+    for endpoint, status, latency, _ in results:
+        by_endpoint[endpoint].append(latency)
+    return {
+        "config": spec,
+        "worker_class": worker_class,
+        "workers": workers,
+        "threads": threads if worker_class == "gthread" else 1,
+        "concurrency": concurrency,
+        "duration": wall,
+        "requests": len(results),
+        "throughput_rps": len(results) / wall,
+        "error_rate": sum(errors.values()) / len(results) if results else 0.0,
+        "errors": dict(errors),
+        "latency": {
+            "all": summarize([r[2] for r in results if r[1] == 200]),
+            **{endpoint: summarize(samples) for endpoint, samples in sorted(by_endpoint.items())},
+        },
+        "ttfb": summarize([r[3] for r in results if r[3] is not None]),
+        "rss_mb": {
+            "per_worker_max": [max(samples) for samples in rss.values()],
+            "per_worker_mean": (sum(max(samples) for samples in rss.values()) / len(rss)) if rss else None,
+            "master": master_rss,
+        },
+        "stub": {
+            "requests": stub.requests - stub_requests,
+            "injected": {fault: stub.injected[fault] - injected[fault] for fault in injected},
+        },
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_run(run):
+    latency = run["latency"]["all"] or {"p50": float("nan"), "p95": float("nan"), "p99": float("nan")}
+    rss = run["rss_mb"]["per_worker_mean"]
+    print(f"{run['config']:<14} c={run['concurrency']:<4} {run['throughput_rps']:7.1f} req/s  "
+          f"p50 {latency['p50'] * 1000:6.0f}ms  p95 {latency['p95'] * 1000:6.0f}ms  p99 {latency['p99'] * 1000:6.0f}ms  "
+          f"errors {run['error_rate']:6.1%}  rss/worker {rss or 0:5.0f}MB")
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        endpoint, _, weight = part.partition("=")
+        mix[endpoint.strip()] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configs", nargs="+", default=["gthread:2x8"],
+                        help="worker_class:workers[xthreads], e.g. gthread:2x8 gevent:2 sync:4")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[16])
+    parser.add_argument("--duration", type=float, default=15, help="seconds per run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("generate-pitch=5,ai-advisor=3,pitch-feedback=2"),
+                        help="endpoint weights")
+    parser.add_argument("--stream-fraction", type=float, default=0.0,
+                        help="fraction of pitch/feedback requests sent with stream=true")
+    parser.add_argument("--latency", type=float, default=1.0, help="mean stub latency (s)")
+    parser.add_argument("--latency-dist", default="lognormal", choices=LATENCY_DISTS)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.01, help="stub seconds per streamed token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stub 5xx fraction")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="stub 429 fraction")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="stub malformed-output fraction")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    stub = GradientStub(
+        latency=args.latency, latency_dist=args.latency_dist, latency_sigma=args.latency_sigma,
+        token_delay=args.token_delay, error_rate=args.error_rate, error_status=args.error_status,
+        rate_limit_rate=args.rate_limit_rate, malformed_rate=args.malformed_rate,
+        content=stub_content, seed=args.seed,
+    )
+    runs = []
+    with stub:
+        for spec in args.configs:
+            for concurrency in args.concurrency:
+                run = run_config(spec, concurrency, stub, args)
+                print_run(run)
+                runs.append(run)
+
+    if args.output:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": time.time(),
+                "python": platform.python_version(),
+                "args": {key: value for key, value in vars(args).items() if key != "output"},
+            },
+            "runs": runs,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Tab-open latency after a project save, with and without /prefetch.
+
+Each simulated founder saves a project (sometimes saving a second edit
+right after the first), waits ``--think`` seconds and then opens
+SmartGuidance, the tagline and 30-second pitch, and the financial model
+one after another. Sessions start ``--stagger`` seconds apart. Reports
+tab-open latency, upstream calls per session and the prefetch outcome
+counters.
+
+    python -m bench.prefetch --sessions 8 --latency 1.5 --think 1 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from bench.load import percentile
+from bench.report import PROJECT, echo_example
+from bench.stub_server import GradientStub
+
+TABS = [("/ai-advisor", {"advisorType": "smart_guidance"}), ("/generate-pitch", {"assetType": "tagline"}),
+        ("/generate-pitch", {"assetType": "30sec"}), ("/ai-advisor", {"advisorType": "financial_model"})]
+
+
+def session(client, index, args, use_prefetch, rng, latencies):
+    time.sleep(index * args.stagger)
+    project_id = f"bench-{use_prefetch}-{args.think_now}-{index}"
+    project = {**PROJECT, "startup_name": f"{PROJECT['startup_name']} {project_id}"}
+    if use_prefetch:
+        client.post("/prefetch", json={"projectId": project_id, "project": project})
+    if rng.random() < args.reedit:
+        # A second save before the tabs open: work queued for the first version is wasted if it still runs.
+        time.sleep(0.1)
+        project = {**project, "one_liner": project["one_liner"] + " (edited)"}
+        if use_prefetch:
+            client.post("/prefetch", json={"projectId": project_id, "project": project})
+    time.sleep(args.think_now)
+    for path, body in TABS:
+        start = time.perf_counter()
+        response = client.post(path, json={**body, "project": project})
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent founders per run")
+    parser.add_argument("--latency", type=float, default=1.5, help="stub upstream latency (s)")
+    parser.add_argument("--think", type=float, nargs="+", default=[1.0, 5.0], help="seconds from save to first tab")
+    parser.add_argument("--stagger", type=float, default=1.0, help="seconds between session starts")
+    parser.add_argument("--workers", type=int, default=4, help="PREFETCH_WORKERS")
+    parser.add_argument("--reedit", type=float, default=0.25, help="fraction of sessions that save twice")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    with GradientStub(content=echo_example, latency=args.latency) as stub:
+        tmp = tempfile.mkdtemp()
+        os.environ.update(GRADIENT_API_URL=stub.url, LLM_CACHE_BACKEND="memory",
+                          FINGERPRINT_PATH=os.path.join(tmp, "fingerprints.sqlite3"),
+                          TENANT_USAGE_PATH=os.path.join(tmp, "tenants.sqlite3"))
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        import app
+        import prefetch
+
+        client = app.app.test_client()
+        print(f"{args.sessions} sessions per run, {args.latency:.1f}s upstream latency, "
+              f"{args.stagger:.1f}s apart, {args.reedit:.0%} save twice, {len(TABS)} tabs each, "
+              f"{args.workers} prefetch threads")
+        for think in args.think:
+            args.think_now = think
+            for use_prefetch in (False, True):
+                app.prefetcher = prefetch.Prefetcher(app.run_prefetch, app.prefetch_current, app.upstream_busy,
+                                                    workers=args.workers)
+                before = stub.requests
+                latencies = []
+                rng = random.Random(args.seed)
+                threads = [threading.Thread(target=session, args=(client, i, args, use_prefetch,
+                                                                  random.Random(rng.random()), latencies))
+                           for i in range(args.sessions)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                # Let prefetches nobody waited for finish so their upstream calls are counted.
+                while app.prefetcher.stats()["queue"] or app.scheduler.stats()["in_flight"]:
+                    time.sleep(0.05)
+                calls = (stub.requests - before) / args.sessions
+                label = f"think {think:.1f}s, {'prefetch' if use_prefetch else 'on demand'}"
+                print(f"  {label:<26} tab p50 {percentile(latencies, 0.5) * 1000:6.0f}ms  "
+                      f"p95 {percentile(latencies, 0.95) * 1000:6.0f}ms  {calls:4.1f} upstream calls/session")
+                if use_prefetch:
+                    stats = app.prefetcher.stats()
+                    print("    " + ", ".join(f"{event} {stats[event]}" for event in
+                                             ("generated", "uncached", "used", "cancelled", "cached", "over_budget",
+                                              "expired"))
+                          + f", hit rate {stats['hit_rate']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
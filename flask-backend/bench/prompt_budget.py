@@ -0,0 +1,194 @@
+"""Prompt tokens, max_tokens and latency with fixed budgets versus prompt budgeting.
+
+"fixed" renders every field verbatim with the old 900/1500/1000 budgets;
+"budgeted" compacts prompts and uses max_tokens learned from a warm-up.
+The stub charges ``--prefill`` seconds per prompt token, so latency follows
+prompt size.
+
+    python -m bench.prompt_budget --latency 0.2 --prefill 0.0005
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.report import echo_example
+from bench.stub_server import GradientStub
+
+VERBOSE = ("Independent pharmacies spend hours every week reconciling insurance claims by hand, "
+           "and most of them still fax prior authorizations to payers. ")
+
+PROJECTS = {
+    "sparse": {
+        "startup_name": "Shelfie",
+        "one_liner": "Inventory counts from a phone video",
+        "problem_statement": "",
+        "solution_description": "N/A",
+        "category": "Retail",
+        "stage": "Pre-seed",
+        "target_users": "",
+        "traction_users": "N/A",
+        "traction_revenue": "",
+        "ask_amount": "TBD",
+    },
+    "typical": {
+        "startup_name": "Acme Robotics",
+        "one_liner": "Warehouse robots as a service",
+        "problem_statement": "Mid-size warehouses cannot hire enough pickers and lose orders at peak.",
+        "solution_description": "Autonomous picking robots leased per month, live in two weeks.",
+        "category": "Robotics",
+        "stage": "Seed",
+        "target_users": "Mid-size 3PL warehouses",
+        "business_model": "Robots-as-a-service subscription",
+        "ask_amount": "$2M",
+        "traction_users": "12 pilots",
+        "traction_revenue": "$40K MRR",
+    },
+    "verbose": {
+        "startup_name": "ClaimPilot",
+        "one_liner": "Autopilot for pharmacy insurance claims",
+        "problem_statement": VERBOSE * 12,
+        "solution_description": "ClaimPilot reads the pharmacy system, files claims and appeals automatically. " * 10,
+        "why_now": "Payers opened claim APIs in 2024. " * 6,
+        "differentiation": "Built by former PBM engineers with direct payer integrations. " * 6,
+        "go_to_market": "Partner with pharmacy cooperatives, then land and expand into regional chains. " * 6,
+        "category": "Health tech",
+        "stage": "Seed",
+        "target_users": "Independent pharmacies",
+        "business_model": "Per-claim fee plus SaaS",
+        "ask_amount": "$3M",
+        "traction_users": "80 pharmacies",
+        "traction_revenue": "$25K MRR",
+        "traction_growth": "20% MoM",
+    },
+}
+
+PITCH_WORDS = {"tagline": 12, "linkedin_intro": 45, "30sec": 90, "cold_email": 120, "2min": 330, "deck_outline": 250}
+FEEDBACK = json.dumps({
+    "score": 7,
+    "strengths": ["Clear problem framing", "Concrete customer"],
+    "weaknesses": ["No traction numbers", "Ask is missing"],
+    "rewrite_suggestion": "Warehouses lose orders at peak because they cannot hire pickers. " * 3,
+    "feedback": [{"category": c, "score": "good", "feedback": "Name the customer and the number. " * 2}
+                 for c in ("Clarity", "Hook", "Specificity", "Traction", "Ask")],
+})
+FIXED_MAX_TOKENS = {"generate-pitch": 900, "ai-advisor": 1500, "pitch-feedback": 1000}
+
+
+def requests_for(project):
+    for asset_type in PITCH_WORDS:
+        yield "generate-pitch", asset_type, {"project": project, "assetType": asset_type}
+    for advisor_type in ("smart_guidance", "competitor_analysis", "investor_matching", "financial_model",
+                         "marketing_strategy"):
+        yield "ai-advisor", advisor_type, {"project": project, "advisorType": advisor_type}
+    yield "pitch-feedback", "pitch_feedback", {"project": project, "promptType": "30sec",
+                                               "userPitch": "We help warehouses pick faster with robots."}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2, help="stub base latency (s)")
+    parser.add_argument("--prefill", type=float, default=0.0005, help="stub seconds per prompt token")
+    parser.add_argument("--warmup", type=int, default=5, help="completions per template before budgets adapt")
+    parser.add_argument("--tpm", type=int, default=100000, help="token-per-minute budget for the reservation estimate")
+    args = parser.parse_args()
+
+    sent = []
+
+    def content(body):
+        sent.append((body["max_tokens"], sum(len(m["content"]) for m in body["messages"]) // 4))
+        prompt = body["messages"][-1]["content"]
+        for asset_type, words in PITCH_WORDS.items():
+            if _asks_for(prompt, asset_type):
+                return " ".join(["word"] * words)
+        if "Score this pitch" in prompt:
+            return FEEDBACK
+        return echo_example(body)
+
+    with GradientStub(latency=args.latency, prompt_token_delay=args.prefill, content=content) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        os.environ["LLM_CACHE_BACKEND"] = "none"
+        import app
+        import prompt_budget
+        app.GRADIENT_API_URL = stub.url
+        client = app.app.test_client()
+
+        fixed_max_tokens = app.max_tokens_for
+        modes = {}
+        for mode in ("fixed", "budgeted"):
+            if mode == "fixed":
+                prompt_budget.COMPACTION = False
+                app.max_tokens_for = lambda template: FIXED_MAX_TOKENS[_endpoint_of(template)]
+            else:
+                prompt_budget.COMPACTION = True
+                app.max_tokens_for = fixed_max_tokens
+                app.output_budget = prompt_budget.OutputBudget(min_samples=args.warmup)
+                with ThreadPoolExecutor(max_workers=16) as pool:
+                    for _ in range(args.warmup):
+                        list(pool.map(lambda r: client.post(f"/{r[0]}", json=r[2]),
+                                      [r for p in PROJECTS.values() for r in requests_for(p)]))
+
+            rows = defaultdict(list)
+            for project_name, project in PROJECTS.items():
+                for endpoint, kind, body in requests_for(project):
+                    del sent[:]
+                    start = time.perf_counter()
+                    response = client.post(f"/{endpoint}", json=body)
+                    elapsed = time.perf_counter() - start
+                    assert response.status_code == 200, response.get_json()
+                    max_tokens, prompt_tokens = sent[0]
+                    rows[project_name].append((kind, prompt_tokens, max_tokens, elapsed))
+            modes[mode] = rows
+
+    print(f"{'project':<8} {'prompt tokens':>20} {'max_tokens':>20} {'latency ms':>20}")
+    totals = {mode: [0, 0, 0.0] for mode in modes}
+    for project_name in PROJECTS:
+        line = f"{project_name:<8}"
+        for column in (1, 2, 3):
+            before = sum(r[column] for r in modes["fixed"][project_name])
+            after = sum(r[column] for r in modes["budgeted"][project_name])
+            totals["fixed"][column - 1] += before
+            totals["budgeted"][column - 1] += after
+            if column == 3:
+                calls = len(modes["fixed"][project_name])
+                before, after = before * 1000 / calls, after * 1000 / calls
+            line += f" {before:>8.0f} -> {after:<8.0f}"
+        print(line)
+
+    print("\nper template (typical project): max_tokens fixed -> learned")
+    for (kind, _, before, _), (_, _, after, _) in zip(modes["fixed"]["typical"], modes["budgeted"]["typical"]):
+        print(f"  {kind:<20} {before:>5} -> {after}")
+
+    for mode, (prompt_tokens, max_tokens, seconds) in totals.items():
+        calls = sum(len(rows) for rows in modes[mode].values())
+        reserved = (prompt_tokens + max_tokens) / calls
+        print(f"{mode:>8}: {prompt_tokens / calls:.0f} prompt tokens/call, {max_tokens / calls:.0f} max_tokens/call, "
+              f"{seconds / calls * 1000:.0f} ms/call; {args.tpm / reserved:.0f} calls/min fit a {args.tpm} TPM reservation")
+
+
+def _asks_for(prompt, asset_type):
+    markers = {
+        "tagline": "crisp, investor-ready one-liner",
+        "linkedin_intro": "LinkedIn intro",
+        "30sec": "30-second spoken pitch",
+        "cold_email": "investor cold email",
+        "2min": "2-minute pitch",
+        "deck_outline": "6-slide pitch deck",
+    }
+    return markers[asset_type] in prompt
+
+
+def _endpoint_of(template):
+    import prompts
+    if template.name in prompts.PITCH_TEMPLATES:
+        return "generate-pitch"
+    if template.name in prompts.FEEDBACK_TEMPLATES:
+        return "pitch-feedback"
+    return "ai-advisor"
+
+
+if __name__ == "__main__":
+    main()
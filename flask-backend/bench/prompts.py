@@ -0,0 +1,62 @@
+"""Per-request prompt rendering cost: every template (old handlers) vs only the requested one.
+
+The old handlers built the whole prompts dict on each call and used one
+entry; rendering every registered template reproduces that work.
+
+    python -m bench.prompts --iterations 20000
+"""
+import argparse
+import timeit
+import tracemalloc
+
+from prompts import ADVISOR_TEMPLATES, PITCH_TEMPLATES
+
+PROJECT = {
+    "startup_name": "Acme Robotics",
+    "one_liner": "Warehouse robots as a service",
+    "problem_statement": "Warehouses cannot hire enough pickers. " * 5,
+    "solution_description": "Autonomous picking robots leased per month. " * 5,
+    "category": "Robotics",
+    "stage": "Seed",
+    "target_users": "Mid-size 3PL warehouses",
+    "business_model": "Robots-as-a-service subscription",
+    "ask_amount": "$2M",
+    "use_of_funds": "Engineering and first deployments",
+}
+
+
+def render_all(registry):
+    return {name: registry.get(name).render(PROJECT) for name in registry.names()}
+
+
+def render_one(registry, name):
+    return registry.get(name).render(PROJECT)
+
+
+def peak_bytes(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    for label, registry, name in (("generate-pitch", PITCH_TEMPLATES, "tagline"),
+                                  ("ai-advisor", ADVISOR_TEMPLATES, "smart_guidance")):
+        cases = {
+            f"all {len(registry.names())} templates": lambda: render_all(registry),
+            f"only {name}": lambda: render_one(registry, name),
+        }
+        print(label)
+        for case, fn in cases.items():
+            per_call = timeit.timeit(fn, number=args.iterations) / args.iterations
+            print(f"  {case:>20}: {per_call * 1e6:7.2f} us/request  peak alloc {peak_bytes(fn):>6} B")
+
+
+if __name__ == "__main__":
+    main()
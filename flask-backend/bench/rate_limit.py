@@ -0,0 +1,72 @@
+"""Burst goodput against a rate-limiting stub, with and without the scheduler.
+
+    python -m bench.rate_limit --burst 60 --stub-rps 10
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import upstream_scheduler
+from bench.stub_server import GradientStub
+
+
+def burst(app, count, endpoints):
+    outcomes = []
+
+    def one(i):
+        endpoint = endpoints[i % len(endpoints)]
+        messages = [{"role": "user", "content": f"prompt {i}"}]
+        start = time.perf_counter()
+        try:
+            app.call_gradient_ai(messages, bypass_cache=True, endpoint=endpoint)
+            ok = True
+        except Exception as e:
+            ok = str(e) != "RATE_LIMIT" and None
+        outcomes.append((endpoint, ok, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        list(pool.map(one, range(count)))
+    return outcomes, time.perf_counter() - start
+
+
+def report(name, outcomes, wall):
+    ok = sum(1 for _, result, _ in outcomes if result)
+    limited = sum(1 for _, result, _ in outcomes if result is False)
+    print(f"{name}: {ok}/{len(outcomes)} ok, {limited} user-visible 429s, wall {wall:.1f}s")
+    for endpoint in sorted({e for e, _, _ in outcomes}):
+        times = [t for e, result, t in outcomes if e == endpoint and result]
+        if times:
+            print(f"    {endpoint:>15}: mean latency {statistics.mean(times):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--burst", type=int, default=60)
+    parser.add_argument("--stub-rps", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with GradientStub(latency=args.latency, rate_limit=args.stub_rps) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        import app
+        app.GRADIENT_API_URL = stub.url
+        endpoints = ["pitch-feedback", "ai-advisor"]
+
+        app.scheduler = upstream_scheduler.UpstreamScheduler(max_concurrency=1000, max_retries=0)
+        report("no scheduling ", *burst(app, args.burst, endpoints))
+        time.sleep(1.5)
+
+        app.scheduler = upstream_scheduler.UpstreamScheduler(
+            max_concurrency=args.stub_rps, requests_per_second=args.stub_rps * 0.9,
+            max_retries=5, backoff_base=0.25,
+        )
+        report("scheduled     ", *burst(app, args.burst, endpoints))
+        print(f"    scheduler stats: {app.scheduler.stats()}  stub rejected: {stub.rejected}")
+
+
+if __name__ == "__main__":
+    main()
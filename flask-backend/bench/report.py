@@ -0,0 +1,67 @@
+"""Five separate /ai-advisor calls versus one /ai-advisor/report pipeline.
+
+The stub answers each prompt with the JSON example embedded in it, so
+completion size follows what each prompt asks for.
+
+    python -m bench.report --latency 1.0
+"""
+import argparse
+import json
+import os
+import time
+
+import json_extract
+from bench.stub_server import GradientStub
+
+PROJECT = {
+    "startup_name": "Acme Robotics",
+    "one_liner": "Warehouse robots as a service",
+    "problem_statement": "Mid-size warehouses cannot hire enough pickers and lose orders at peak. " * 4,
+    "solution_description": "Autonomous picking robots leased per month, live in two weeks. " * 4,
+    "category": "Robotics",
+    "stage": "Seed",
+    "target_users": "Mid-size 3PL warehouses",
+    "business_model": "Robots-as-a-service subscription",
+    "ask_amount": "$2M",
+    "traction_users": "12 pilots",
+    "traction_revenue": "$40K MRR",
+}
+
+
+def echo_example(body):
+    prompt = body["messages"][-1]["content"]
+    value, _ = json_extract.find_json(prompt.split("JSON", 1)[-1])
+    return json.dumps(value if value is not None else {"note": "no example"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=1.0, help="stub upstream latency (s)")
+    args = parser.parse_args()
+
+    with GradientStub(latency=args.latency, content=echo_example) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        import advisor_report
+        import app
+        app.GRADIENT_API_URL = stub.url
+        client = app.app.test_client()
+
+        start = time.perf_counter()
+        for advisor_type in advisor_report.PIPELINE:
+            client.post("/ai-advisor", json={"project": PROJECT, "advisorType": advisor_type, "bypassCache": True})
+        separate = (time.perf_counter() - start, stub.requests, stub.prompt_tokens, stub.completion_tokens)
+
+        stub.requests = stub.prompt_tokens = stub.completion_tokens = 0
+        start = time.perf_counter()
+        body = client.post("/ai-advisor/report", json={"project": PROJECT, "bypassCache": True}).get_json()
+        report = (time.perf_counter() - start, stub.requests, stub.prompt_tokens, stub.completion_tokens)
+
+    for name, (wall, calls, prompt, completion) in (("5 separate calls", separate), ("report pipeline", report)):
+        print(f"{name:>16}: {wall:.2f}s ({wall / args.latency:.1f} LLM latencies), {calls} calls, "
+              f"{prompt} prompt + {completion} completion = {prompt + completion} tokens")
+    print(f"report sections: {sorted(body['data'])}, errors: {body['errors']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Latency and errors with one upstream provider versus the model router.
+
+Three scenarios against local Gradient stubs, driven through /pitch-feedback:
+
+* split:  a fast, a slow and a flaky provider; each alone, then routed.
+* hedge:  two heavy-tailed (lognormal) providers with hedging off and on.
+* outage: the preferred provider starts failing every call half way through.
+
+    python -m bench.router --requests 300 --concurrency 16
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.load import percentile
+from bench.stub_server import GradientStub
+
+FEEDBACK = '{"score": 7, "strengths": ["Clear problem"], "weaknesses": ["No traction numbers"]}'
+PROJECT = {"startup_name": "Acme Robotics", "one_liner": "Warehouse robots as a service"}
+
+
+def drive(client, count, concurrency, on_progress=None):
+    """Send ``count`` distinct feedback requests; return (latencies of successes, error count)."""
+
+    def one(i):
+        if on_progress:
+            on_progress(i)
+        start = time.perf_counter()
+        response = client.post("/pitch-feedback", json={"project": PROJECT, "userPitch": f"Pitch number {i}."})
+        return response.status_code, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(count)))
+    latencies = [elapsed for status, elapsed in results if status == 200]
+    return latencies, len(results) - len(latencies)
+
+
+def report(label, latencies, errors, stubs, before):
+    total = len(latencies) + errors
+    split = "  ".join(f"{name} {stub.requests - before[name]}" for name, stub in stubs.items())
+    if latencies:
+        print(f"  {label:<22} p50 {percentile(latencies, 0.50) * 1000:6.0f}ms  "
+              f"p95 {percentile(latencies, 0.95) * 1000:6.0f}ms  p99 {percentile(latencies, 0.99) * 1000:6.0f}ms  "
+              f"errors {errors / total:6.1%}  upstream: {split}")
+    else:
+        print(f"  {label:<22} all {total} requests failed  upstream: {split}")
+
+
+def run(app, model_router, label, stubs, names, args, hedge=False, on_progress=None):
+    app.router = model_router.ModelRouter(
+        [model_router.Provider(name, stubs[name].url, "bench-model") for name in names],
+    )
+    model_router.HEDGE = hedge
+    before = {name: stub.requests for name, stub in stubs.items()}
+    latencies, errors = drive(app.app.test_client(), args.requests, args.concurrency, on_progress)
+    report(label, latencies, errors, stubs, before)
+    return app.router
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300, help="requests per run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="fast provider mean latency (s)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+    os.environ["LLM_CACHE_BACKEND"] = "none"
+    os.environ["UPSTREAM_MAX_CONCURRENCY"] = str(args.concurrency * 2)
+    stubs = {
+        "fast": GradientStub(latency=args.latency, latency_dist="lognormal", latency_sigma=0.3,
+                             content=FEEDBACK, seed=1),
+        "slow": GradientStub(latency=args.latency * 3, latency_dist="lognormal", latency_sigma=0.3,
+                             content=FEEDBACK, seed=2),
+        "flaky": GradientStub(latency=args.latency, latency_dist="lognormal", latency_sigma=0.3,
+                              error_rate=0.3, content=FEEDBACK, seed=3),
+        "tail_a": GradientStub(latency=args.latency, latency_dist="lognormal", latency_sigma=1.0,
+                               content=FEEDBACK, seed=4),
+        "tail_b": GradientStub(latency=args.latency, latency_dist="lognormal", latency_sigma=1.0,
+                               content=FEEDBACK, seed=5),
+    }
+    for stub in stubs.values():
+        stub.start()
+    try:
+        os.environ["GRADIENT_API_URL"] = stubs["fast"].url
+        import app
+        import model_router
+
+        print("split (fast / slow / flaky)")
+        for name in ("fast", "slow", "flaky"):
+            run(app, model_router, f"{name} only", stubs, [name], args)
+        # List the worst provider first so the router has to learn the ranking.
+        router = run(app, model_router, "routed", stubs, ["flaky", "slow", "fast"], args)
+        print(f"  failovers {router.stats()['failovers']}")
+
+        print("\nhedge (two lognormal sigma=1.0 providers)")
+        run(app, model_router, "hedge off", stubs, ["tail_a", "tail_b"], args)
+        # Let p95 warm up before measuring, as it would in a running worker.
+        router = app.router
+        model_router.HEDGE = True
+        drive(app.app.test_client(), model_router.HEDGE_MIN_SAMPLES * 2, args.concurrency)
+        before = {name: stub.requests for name, stub in stubs.items()}
+        hedges = router.hedges
+        latencies, errors = drive(app.app.test_client(), args.requests, args.concurrency)
+        report("hedge on", latencies, errors, stubs, before)
+        print(f"  hedged {router.hedges - hedges} of {args.requests} calls, "
+              f"backup won {router.stats()['hedge_wins']}")
+        model_router.HEDGE = False
+
+        print("\noutage (fast fails every call after half the requests)")
+
+        def fail_half_way(i):
+            if i == args.requests // 2:
+                stubs["fast"].error_rate = 1.0
+
+        router = run(app, model_router, "fast + slow", stubs, ["fast", "slow"], args, on_progress=fail_half_way)
+        stats = router.stats()
+        circuits = ", ".join(f"{p['name']} {p['circuit']}" for p in stats["providers"])
+        print(f"  failovers {stats['failovers']}; circuits: {circuits}")
+    finally:
+        for stub in stubs.values():
+            stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Response serialization: encode cost, cached-body reuse and bytes on the wire.
+
+Encodes each advisor's response body with Flask's stdlib provider and with
+FastJSONProvider, then replays cached /ai-advisor hits with the body cache
+and compression on and off. The stub answers each prompt with the JSON
+example embedded in it, and ``--scale`` repeats list items to mimic longer
+model outputs.
+
+    python -m bench.serialization --scale 8
+"""
+import argparse
+import json
+import os
+import time
+
+from bench.report import PROJECT, echo_example
+from bench.stub_server import GradientStub
+
+
+def scaled(value, scale):
+    """``value`` with every list repeated ``scale`` times."""
+    if isinstance(value, dict):
+        return {k: scaled(v, scale) for k, v in value.items()}
+    if isinstance(value, list):
+        return [scaled(v, scale) for v in value] * scale
+    return value
+
+
+def per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=8, help="repeat list items in advisor results")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    with GradientStub(content=lambda body: json.dumps(scaled(json.loads(echo_example(body)), args.scale))) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        os.environ["LLM_CACHE_BACKEND"] = "memory"
+        import app
+        import compression
+        import json_provider
+        from flask.json.provider import DefaultJSONProvider
+
+        client = app.app.test_client()
+        stdlib = DefaultJSONProvider(app.app)
+        fast = json_provider.FastJSONProvider(app.app)
+        print(f"encoder: {fast.backend}, compression: {', '.join(compression.supported())}")
+
+        print("\nencode (us/body)")
+        bodies = {}
+        for advisor_type in app.advisor_report.PIPELINE:
+            response = client.post("/ai-advisor", json={"advisorType": advisor_type, "project": PROJECT})
+            assert response.status_code == 200, response.get_json()
+            bodies[advisor_type] = obj = response.get_json()
+            size = len(stdlib.dumps(obj))
+            stdlib_us = per_call_us(lambda: stdlib.dumps(obj).encode("utf-8"), args.iterations)
+            fast_us = per_call_us(lambda: fast.encode(obj), args.iterations)
+            print(f"  {advisor_type:<24} {size:7d} B  json {stdlib_us:7.1f}  {fast.backend} {fast_us:7.1f}  "
+                  f"({stdlib_us / fast_us:.1f}x)")
+
+        advisor_types = list(bodies)
+        print("\ncached /ai-advisor hit (us/request, bytes on the wire)")
+        for label, body_cache, accept in (("encode every hit", False, None), ("body cache", True, None),
+                                          ("encode + gzip", False, "gzip"), ("body cache + gzip", True, "gzip"),
+                                          ("body cache + br", True, "br")):
+            if accept and accept not in compression.supported():
+                continue
+            json_provider.BODY_CACHE = body_cache
+            headers = {"Accept-Encoding": accept} if accept else {}
+            sent = 0
+            start = time.perf_counter()
+            for i in range(args.iterations):
+                advisor_type = advisor_types[i % len(advisor_types)]
+                response = client.post("/ai-advisor", json={"advisorType": advisor_type, "project": PROJECT},
+                                       headers=headers)
+                sent += len(response.data)
+            elapsed = (time.perf_counter() - start) / args.iterations * 1e6
+            print(f"  {label:<20} {elapsed:8.0f}  {sent // args.iterations:7d} B")
+
+
+if __name__ == "__main__":
+    main()
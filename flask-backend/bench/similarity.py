@@ -0,0 +1,88 @@
+"""Near-duplicate cache: hit rate on small edits, false hits and lookup cost.
+
+Stores ``--entries`` distinct pitches spread over ``--projects`` projects,
+then looks up typo/punctuation edits of stored pitches (should hit) and
+fresh pitches for the same projects (should miss) at several thresholds.
+
+    python -m bench.similarity --entries 2000 --projects 100
+"""
+import argparse
+import random
+import string
+import sys
+import time
+
+import prompts
+import similarity_cache
+
+
+def vocabulary(rng, size=2000):
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(2, 9))) for _ in range(size)]
+
+
+def sentence(rng, words, length):
+    return " ".join(rng.choice(words) for _ in range(length)).capitalize() + "."
+
+
+def project(rng, words, index):
+    return {
+        "startup_name": f"Startup {index}",
+        "one_liner": sentence(rng, words, 6),
+        "problem_statement": sentence(rng, words, 20),
+        "solution_description": sentence(rng, words, 20),
+        "target_users": sentence(rng, words, 4),
+        "ask_amount": f"${rng.randint(1, 9)}M",
+    }
+
+
+def edit(rng, text):
+    """A founder's resubmission: one or two typos, or a changed punctuation mark."""
+    chars = list(text)
+    for _ in range(rng.randint(1, 2)):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice(string.ascii_lowercase + ",.")
+    return "".join(chars)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=100)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    template = prompts.FEEDBACK_TEMPLATES.get("pitch_feedback")
+    rng = random.Random(args.seed)
+    words = vocabulary(rng)
+    projects = [project(rng, words, i) for i in range(args.projects)]
+    stored = [(rng.choice(projects), sentence(rng, words, 60)) for _ in range(args.entries)]
+    edits = [(p, edit(rng, text)) for p, text in (rng.choice(stored) for _ in range(args.lookups))]
+    fresh = [(rng.choice(projects), sentence(rng, words, 60)) for _ in range(args.lookups)]
+
+    def key(request):
+        project, text = request
+        return similarity_cache.request_key(template, project, prompt_type="30sec", user_pitch=text)
+
+    print(f"{args.entries} stored pitches over {args.projects} projects, "
+          f"{args.lookups} edited and {args.lookups} fresh lookups")
+    for threshold in (0.8, 0.85, 0.9, 0.95):
+        cache = similarity_cache.SimilarityCache(threshold=threshold, max_entries=args.entries)
+        start = time.perf_counter()
+        for request in stored:
+            cache.set(*key(request), "feedback")
+        set_us = (time.perf_counter() - start) / len(stored) * 1e6
+
+        start = time.perf_counter()
+        edit_hits = sum(cache.get(*key(request)) is not None for request in edits)
+        false_hits = sum(cache.get(*key(request)) is not None for request in fresh)
+        get_us = (time.perf_counter() - start) / (2 * args.lookups) * 1e6
+        print(f"  threshold {threshold:.2f}: edits hit {edit_hits / len(edits):6.1%}  "
+              f"fresh hit {false_hits / len(fresh):6.1%}  set {set_us:5.0f}us  get {get_us:5.0f}us")
+
+    sketch = similarity_cache.sketch(key(stored[0])[1])
+    print(f"sketch: {len(sketch)} hashes, {sys.getsizeof(sketch)} bytes")
+
+
+if __name__ == "__main__":
+    main()
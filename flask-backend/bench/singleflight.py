@@ -0,0 +1,73 @@
+"""Upstream calls made for a burst of identical prompts, with coalescing.
+
+    python -m bench.singleflight --callers 20
+    python -m bench.singleflight --callers 20 --processes 4   # cross-worker, SQLite cache + leases
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.stub_server import GradientStub
+
+MESSAGES = [{"role": "user", "content": "Generate a tagline for Acme Robotics."}]
+
+
+def burst(callers):
+    import app
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(lambda _: app.call_gradient_ai(MESSAGES, endpoint="ai-advisor"), range(callers)))
+    return app.flights.stats()
+
+
+def worker(callers, barrier, results):
+    barrier.wait()
+    results.put(burst(callers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--callers", type=int, default=20, help="concurrent callers per process")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    with GradientStub(latency=args.latency) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        if args.processes > 1:
+            tmp = tempfile.mkdtemp()
+            os.environ.update(
+                LLM_CACHE_BACKEND="sqlite",
+                LLM_CACHE_PATH=os.path.join(tmp, "cache.sqlite3"),
+                SINGLEFLIGHT_SHARED="true",
+                SINGLEFLIGHT_PATH=os.path.join(tmp, "leases.sqlite3"),
+            )
+        import app  # noqa: F401 -- imported before forking, like gunicorn --preload
+
+        start = time.perf_counter()
+        if args.processes > 1:
+            ctx = multiprocessing.get_context("fork")
+            barrier, results = ctx.Barrier(args.processes), ctx.Queue()
+            procs = [ctx.Process(target=worker, args=(args.callers, barrier, results))
+                     for _ in range(args.processes)]
+            for p in procs:
+                p.start()
+            stats = [results.get() for _ in procs]
+            for p in procs:
+                p.join()
+        else:
+            stats = [burst(args.callers)]
+        wall = time.perf_counter() - start
+
+    callers = args.callers * args.processes
+    print(f"{callers} identical calls across {args.processes} process(es): "
+          f"{stub.requests} upstream request(s), wall {wall:.2f}s")
+    for i, s in enumerate(stats):
+        print(f"  process {i}: {s}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Cold start: import time, first-request latency and gunicorn time-to-ready.
+
+Each measurement starts a fresh interpreter, as a new worker on a
+scale-from-zero platform would. The stub charges ``--connect-latency`` for
+every new connection to stand in for the TLS handshake to the real API,
+so the first generation shows what warming the pool saves. ``--output``
+writes the medians as JSON; ``--baseline`` compares against such a file
+and can fail on regressions:
+
+    python -m bench.startup --runs 5 --output startup.json
+    # ...change something...
+    python -m bench.startup --runs 5 --baseline startup.json --threshold 0.20 --fail-on-regression
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import requests
+
+from bench.load import BACKEND_DIR, PROJECT, free_port
+from bench.loadtest import git_commit
+from bench.stub_server import GradientStub
+
+# (key, label); all are milliseconds, lower is better.
+METRICS = [
+    ("import_ms", "import app"),
+    ("warm_up_ms", "warm_up()"),
+    ("first_cold_ms", "first generation, cold pool"),
+    ("first_warm_ms", "first generation, warmed pool"),
+    ("steady_ms", "second generation"),
+    ("gunicorn_ready_ms", "gunicorn ready, preload"),
+    ("gunicorn_ready_no_preload_ms", "gunicorn ready, no preload"),
+]
+
+
+def child(warm):
+    """Runs in a fresh interpreter: import, optionally warm, then two generations."""
+    start = time.perf_counter()
+    import app
+    result = {"import_ms": (time.perf_counter() - start) * 1000}
+    if warm:
+        start = time.perf_counter()
+        app.warm_up()
+        result["warm_up_ms"] = (time.perf_counter() - start) * 1000
+    client = app.app.test_client()
+    times = []
+    for i in range(2):
+        start = time.perf_counter()
+        response = client.post("/generate-pitch", json={"assetType": "tagline",
+                                                        "project": {**PROJECT, "startup_name": f"Startup {i}"}})
+        times.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_json()
+    result["first_warm_ms" if warm else "first_cold_ms"], result["steady_ms"] = times
+    print(json.dumps(result))
+
+
+def run_child(env, warm):
+    output = subprocess.run(
+        [sys.executable, "-m", "bench.startup", "--child", "warm" if warm else "cold"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def gunicorn_ready_ms(env, preload, workers):
+    """Milliseconds from launching gunicorn until /health answers."""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env=dict(env, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_ACCESSLOG="",
+                 GUNICORN_PRELOAD=str(preload).lower()),
+    )
+    try:
+        deadline = start + 20
+        while time.perf_counter() < deadline:
+            try:
+                requests.get(f"http://127.0.0.1:{port}/health", timeout=1)
+                return (time.perf_counter() - start) * 1000
+            except requests.RequestException:
+                time.sleep(0.005)
+        raise RuntimeError("gunicorn did not start")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers")
+    parser.add_argument("--connect-latency", type=float, default=0.15, help="stub seconds per new connection")
+    parser.add_argument("--output", help="write medians to this JSON file")
+    parser.add_argument("--baseline", help="compare with a previous --output file")
+    parser.add_argument("--threshold", type=float, default=0.20, help="relative slowdown counted as a regression")
+    parser.add_argument("--min-delta", type=float, default=5.0, help="ignore slowdowns smaller than this (ms)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 if anything regressed")
+    parser.add_argument("--child", choices=["cold", "warm"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child == "warm")
+        return
+
+    samples = {key: [] for key, _ in METRICS}
+    with GradientStub(connect_latency=args.connect_latency) as stub:
+        env = dict(os.environ, GRADIENT_API_URL=stub.url, MODEL_ACCESS_KEY=os.environ.get("MODEL_ACCESS_KEY", "bench"),
+                   LLM_CACHE_BACKEND="none")
+        for _ in range(args.runs):
+            for warm in (False, True):
+                for key, value in run_child(env, warm).items():
+                    samples[key].append(value)
+            samples["gunicorn_ready_ms"].append(gunicorn_ready_ms(env, True, args.workers))
+            samples["gunicorn_ready_no_preload_ms"].append(gunicorn_ready_ms(env, False, args.workers))
+
+    results = {key: round(statistics.median(values), 1) for key, values in samples.items() if values}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+
+    print(f"median of {args.runs} runs, {args.connect_latency * 1000:.0f}ms per new upstream connection")
+    regressions = 0
+    for key, label in METRICS:
+        if key not in results:
+            continue
+        line = f"  {label:<30} {results[key]:8.1f} ms"
+        old = (baseline or {}).get(key)
+        if old:
+            change = (results[key] - old) / old
+            regressed = change > args.threshold and results[key] - old > args.min_delta
+            regressions += regressed
+            line += f"   baseline {old:8.1f} ms {change:+7.1%}{'  REGRESSION' if regressed else ''}"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": {"commit": git_commit(), "runs": args.runs, "workers": args.workers,
+                                "connect_latency": args.connect_latency}, "results": results}, f, indent=2)
+    if baseline is not None:
+        print(f"\n{regressions} regression(s) beyond {args.threshold:.0%}")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
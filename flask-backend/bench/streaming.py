@@ -0,0 +1,61 @@
+"""Time-to-first-byte of a buffered /generate-pitch call versus stream=true.
+
+    python -m bench.streaming --latency 0.3 --tokens 300 --token-delay 0.01
+"""
+import argparse
+import logging
+import os
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from bench.stub_server import GradientStub
+
+PROJECT = {"startup_name": "Acme Robotics", "one_liner": "Warehouse robots as a service"}
+
+
+def timed(url, body):
+    start = time.perf_counter()
+    with requests.post(url, json=body, stream=True, timeout=120) as response:
+        ttfb = None
+        for _ in response.iter_content(chunk_size=None):
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+    return ttfb, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3, help="stub first-token latency (s)")
+    parser.add_argument("--tokens", type=int, default=300)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    content = " ".join(f"word{i}" for i in range(args.tokens))
+    with GradientStub(latency=args.latency, content=content, token_delay=args.token_delay) as stub:
+        os.environ["GRADIENT_API_URL"] = stub.url
+        os.environ.setdefault("MODEL_ACCESS_KEY", "bench")
+        import app
+        app.GRADIENT_API_URL = stub.url
+        server = make_server("127.0.0.1", 0, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_port}/generate-pitch"
+
+        body = {"project": PROJECT, "assetType": "2min", "bypassCache": True}
+        for name, extra in (("buffered", {}), ("streamed", {"stream": True})):
+            ttfb, total = timed(url, {**body, **extra})
+            print(f"{name}: ttfb {ttfb * 1000:.0f} ms  total {total * 1000:.0f} ms")
+
+        # Disconnect mid-stream and check the upstream generation was cancelled.
+        with requests.post(url, json={**body, "stream": True}, stream=True, timeout=120) as response:
+            next(response.iter_content(chunk_size=None))
+        time.sleep(args.token_delay * 20 + 0.5)
+        print(f"upstream streams cancelled after client disconnect: {stub.cancelled}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""Local stand-in for the Gradient chat/completions API.
+
+Run it on its own to point a dev server at it instead of spending credits:
+
+    python -m bench.stub_server --port 8001 --latency 1.5 --latency-dist lognormal --error-rate 0.02
+    GRADIENT_API_URL=http://127.0.0.1:8001/v1/chat/completions MODEL_ACCESS_KEY=x python app.py
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_DISTS = ("fixed", "uniform", "exponential", "lognormal")
+MALFORMATIONS = ("prose", "fenced", "trailing_comma", "truncated", "not_json")
+
+
+class GradientStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        # Stands in for the TCP/TLS handshake a new connection to the real API costs.
+        if self.server.stub.connect_latency:
+            time.sleep(self.server.stub.connect_latency)
+        super().setup()
+
+    def do_HEAD(self):
+        self.send_response(405)
+        self.send_header("Allow", "POST")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        stub = self.server.stub
+        stub.record_request(self)
+
+        if not stub.admit() or stub.inject("rate_limit_rate"):
+            self._send_json(429, {"error": "rate limited"}, {"Retry-After": str(stub.retry_after)})
+            return
+
+        latency = stub.draw_latency()
+        if latency:
+            time.sleep(latency)
+        if stub.prompt_token_delay:
+            time.sleep(stub.prompt_token_delay * stub.prompt_tokens_for(body))
+
+        if stub.inject("error_rate"):
+            self._send_json(stub.error_status, {"error": "injected upstream error"})
+            return
+
+        content = stub.content_for(body)
+        if body.get("stream"):
+            self._stream(stub, content)
+            return
+        if stub.token_delay:
+            time.sleep(stub.token_delay * (len(content.split(" ")) - 1))
+
+        usage = stub.record_usage(body, content)
+        self._send_json(200, {
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, stub, content):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = content.split(" ")
+        try:
+            for i, token in enumerate(tokens):
+                if i and stub.token_delay:
+                    time.sleep(stub.token_delay)
+                delta = token if i == 0 else " " + token
+                self._write_chunk({"choices": [{"delta": {"content": delta}}]})
+            self._write_chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            stub.record_cancel()
+            self.close_connection = True
+
+    def _write_chunk(self, event):
+        data = event if isinstance(event, str) else json.dumps(event)
+        frame = f"data: {data}\n\n".encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(frame), frame))
+        self.wfile.flush()
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+class GradientStub:
+    """Threaded stub server. Use as a context manager; ``url`` points at it."""
+
+    def __init__(self, latency=0.0, content="stub completion", token_delay=0.0,
+                 rate_limit=None, retry_after=1, port=0, prompt_token_delay=0.0,
+                 latency_dist="fixed", latency_sigma=0.5, error_rate=0.0, error_status=503,
+                 rate_limit_rate=0.0, malformed_rate=0.0, seed=None, host="127.0.0.1", connect_latency=0.0):
+        # ``latency`` is the mean (median for lognormal) of ``latency_dist``.
+        self.latency = latency
+        self.latency_dist = latency_dist
+        self.latency_sigma = latency_sigma
+        # Seconds before a new connection is served.
+        self.connect_latency = connect_latency
+        # Fractions of requests answered with error_status, a 429 or malformed content.
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self._random = random.Random(seed)
+        self.injected = dict.fromkeys(("error_rate", "rate_limit_rate", "malformed_rate"), 0)
+        self.content = content
+        self.token_delay = token_delay
+        # Prefill cost: seconds per prompt token before the first byte.
+        self.prompt_token_delay = prompt_token_delay
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self._window = []
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = StubHTTPServer((host, port), GradientStubHandler)
+        self._server.stub = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def content_for(self, body):
+        content = self.content(body) if callable(self.content) else self.content
+        if self.inject("malformed_rate"):
+            content = self.malform(content)
+        return content
+
+    def draw_latency(self):
+        """One latency sample from ``latency_dist``."""
+        if not self.latency or self.latency_dist == "fixed":
+            return self.latency
+        with self._lock:
+            if self.latency_dist == "uniform":
+                return self._random.uniform(0, 2 * self.latency)
+            if self.latency_dist == "exponential":
+                return self._random.expovariate(1 / self.latency)
+            if self.latency_dist == "lognormal":
+                return self._random.lognormvariate(math.log(self.latency), self.latency_sigma)
+        raise ValueError(f"Unknown latency distribution: {self.latency_dist}")
+
+    def inject(self, fault):
+        """Decide whether this request gets ``fault`` (an attribute holding its rate)."""
+        rate = getattr(self, fault)
+        if not rate:
+            return False
+        with self._lock:
+            hit = self._random.random() < rate
+            if hit:
+                self.injected[fault] += 1
+        return hit
+
+    def malform(self, content):
+        """The kinds of broken output models return: prose, fences, cut-off JSON."""
+        with self._lock:
+            kind = self._random.choice(MALFORMATIONS)
+        if kind == "prose":
+            return f"Sure! Here is what you asked for:\n{content}\nLet me know if you need changes."
+        if kind == "fenced":
+            return f"```json\n{content}\n```"
+        if kind == "trailing_comma":
+            return content.replace("}", ",}", 1) if "}" in content else content + ","
+        if kind == "truncated":
+            return content[:max(1, len(content) * 2 // 3)]
+        return "I'm sorry, I can't produce that right now."
+
+    def record_request(self, handler):
+        with self._lock:
+            self.requests += 1
+            self.connections.add(handler.client_address)
+
+    def prompt_tokens_for(self, body):
+        return sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+
+    def record_usage(self, body, content):
+        """Approximate usage (4 characters per token) and add it to the totals."""
+        prompt = self.prompt_tokens_for(body)
+        completion = len(content) // 4
+        with self._lock:
+            self.prompt_tokens += prompt
+            self.completion_tokens += completion
+        return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+    def admit(self):
+        """Sliding one-second window limiter used when ``rate_limit`` is set."""
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rate_limit:
+                self.rejected += 1
+                return False
+            self._window.append(now)
+            return True
+
+    def record_cancel(self):
+        with self._lock:
+            self.cancelled += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        """Serve on the calling thread (used by ``python -m bench.stub_server``)."""
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=1.0, help="mean upstream latency (s)")
+    parser.add_argument("--latency-dist", default="fixed", choices=LATENCY_DISTS)
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal sigma")
+    parser.add_argument("--connect-latency", type=float, default=0.0, help="seconds per new connection (handshake)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds per streamed token")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction with malformed content")
+    parser.add_argument("--content", default='{"score": 7, "strengths": ["clear"], "weaknesses": ["vague"]}')
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    stub = GradientStub(
+        latency=args.latency, latency_dist=args.latency_dist, latency_sigma=args.latency_sigma,
+        token_delay=args.token_delay, error_rate=args.error_rate, error_status=args.error_status,
+        rate_limit_rate=args.rate_limit_rate, malformed_rate=args.malformed_rate, content=args.content,
+        seed=args.seed, host=args.host, port=args.port, connect_latency=args.connect_latency,
+    )
+    print(f"Gradient stub listening on {stub.url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
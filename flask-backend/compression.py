@@ -0,0 +1,76 @@
+"""Response compression negotiated from Accept-Encoding.
+
+JSON and text responses of at least COMPRESS_MIN_BYTES are sent as br
+(when the brotli package is installed) or gzip. Streamed responses are
+left alone so SSE events still reach the client one at a time.
+"""
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+
+COMPRESSION = os.environ.get("RESPONSE_COMPRESSION", "true").lower() == "true"
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5))
+
+COMPRESSIBLE = ("application/json", "text/plain", "text/html")
+
+
+def supported():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding):
+    """The preferred encoding we support from an Accept-Encoding header, or None."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in supported():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def encode(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_response(response, accept_encoding, variants=None):
+    """Compress ``response`` in place if it is worth it and the client accepts it.
+
+    ``variants`` (a json_provider.BodyEntry) holds previously compressed
+    copies of the same body and receives new ones.
+    """
+    if (not COMPRESSION or response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return response
+    body = variants.get(encoding) if variants is not None else None
+    if body is None:
+        body = encode(data, encoding)
+        if variants is not None:
+            variants.add(encoding, body)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    return response
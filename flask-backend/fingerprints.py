@@ -0,0 +1,101 @@
+"""Fingerprints of the project fields behind each generated asset.
+
+A fingerprint hashes a template's name and version and the values of the
+project fields it renders (plus the fingerprints of the stages it builds
+on). After a generation succeeds its fingerprint is recorded under
+``(project id, kind)``; comparing with the fingerprint of the current
+project tells which assets and advisor results an edit made stale.
+Fingerprints live in a SQLite file shared by every worker on the host.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import sqlite_store
+
+FINGERPRINT_PATH = os.environ.get("FINGERPRINT_PATH", "/tmp/fundingnemo-fingerprints.sqlite3")
+FINGERPRINT_RETENTION = float(os.environ.get("FINGERPRINT_RETENTION", 90 * 24 * 3600))
+
+FRESH, STALE, MISSING = "fresh", "stale", "missing"
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.split())
+    return value
+
+
+def fingerprint(templates, project, depends_on=()):
+    """Hash of the templates and the project fields they read; ``depends_on`` are upstream fingerprints."""
+    parts = [
+        [template.name, template.version, [[f, _normalize(project.get(f))] for f in template.fields]]
+        for template in templates
+    ]
+    raw = json.dumps([parts, list(depends_on)], sort_keys=True, separators=(",", ":"), ensure_ascii=False,
+                     default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class FingerprintStore:
+    PURGE_INTERVAL = 3600
+
+    def __init__(self, path=FINGERPRINT_PATH, retention=FINGERPRINT_RETENTION):
+        self.path = path
+        self.retention = retention
+        self._local = threading.local()
+        self._last_purge = 0.0
+        self._stats_lock = threading.Lock()
+        self.recorded = 0
+        self.checked = 0
+        self.stale = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "project_id TEXT NOT NULL, kind TEXT NOT NULL, fingerprint TEXT NOT NULL, updated REAL NOT NULL, "
+                "PRIMARY KEY (project_id, kind))"
+            )
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._local)
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def status(self, project_id, current):
+        """``{kind: fresh|stale|missing}`` for ``current``, a ``{kind: fingerprint}`` dict."""
+        kinds = list(current)
+        rows = self._connect().execute(
+            f"SELECT kind, fingerprint FROM fingerprints WHERE project_id = ? AND kind IN ({','.join('?' * len(kinds))})",
+            (project_id, *kinds),
+        ).fetchall() if kinds else []
+        stored = dict(rows)
+        status = {}
+        for kind, value in current.items():
+            if kind not in stored:
+                status[kind] = MISSING
+            else:
+                status[kind] = FRESH if stored[kind] == value else STALE
+        self._count("checked", len(status))
+        self._count("stale", sum(1 for s in status.values() if s != FRESH))
+        return status
+
+    def record(self, project_id, kind, value):
+        """Remember that ``kind`` was generated for ``project_id`` from inputs with fingerprint ``value``."""
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO fingerprints (project_id, kind, fingerprint, updated) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (project_id, kind) DO UPDATE SET fingerprint = excluded.fingerprint, updated = excluded.updated",
+            (project_id, kind, value, now),
+        )
+        self._count("recorded")
+        if now - self._last_purge > self.PURGE_INTERVAL:
+            self._last_purge = now
+            conn.execute("DELETE FROM fingerprints WHERE updated < ?", (now - self.retention,))
+
+    def stats(self):
+        with self._stats_lock:
+            return {"recorded": self.recorded, "checked": self.checked, "stale": self.stale}
@@ -0,0 +1,65 @@
+"""Gunicorn settings, all overridable from the environment.
+
+The default gthread worker keeps /health responsive while other threads
+wait on slow upstream completions. GUNICORN_WORKER_CLASS=gevent switches
+to cooperative greenlets, where the upstream HTTP client becomes
+non-blocking and a single worker can hold hundreds of in-flight calls.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# The upstream scheduler splits UPSTREAM_RPS/UPSTREAM_TPM by this count.
+os.environ.setdefault("WEB_CONCURRENCY", str(workers))
+# gunicorn silently turns sync workers into gthread when threads > 1.
+threads = int(os.environ.get("GUNICORN_THREADS", 8)) if worker_class == "gthread" else 1
+worker_connections = int(os.environ.get("GUNICORN_WORKER_CONNECTIONS", 200))
+backlog = int(os.environ.get("GUNICORN_BACKLOG", 2048))
+
+# Must outlive the upstream read timeout so a slow completion is not
+# mistaken for a hung worker.
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 90))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-") or None
+
+# Import the app once in the master so workers fork with config, templates
+# and caches already built (shared copy-on-write) and a bad config fails
+# the deploy instead of every worker. Off for gevent by default: its
+# monkey-patching must happen before ssl and requests are imported.
+preload_app = os.environ.get("GUNICORN_PRELOAD", str(worker_class != "gevent")).lower() == "true"
+
+# Size the upstream keep-alive pool and the scheduler's concurrency cap to
+# the number of requests a worker can have in flight, unless they are
+# configured explicitly. Never below the standalone default of 16: one
+# request can fan out (a batch runs up to six upstream calls at once), and
+# job and prefetch threads call upstream too, so a cap of just the thread
+# count would queue calls into 429s the upstream never sent.
+if worker_class == "gevent":
+    in_flight = worker_connections
+elif worker_class == "gthread":
+    in_flight = threads
+else:
+    in_flight = None
+if in_flight:
+    upstream_calls = max(16, in_flight)
+    os.environ.setdefault("UPSTREAM_POOL_MAXSIZE", str(upstream_calls))
+    os.environ.setdefault("UPSTREAM_MAX_CONCURRENCY", str(upstream_calls))
+
+
+def post_worker_init(worker):
+    # After the fork (and gevent's patching): start job threads and open
+    # upstream connections before the worker takes traffic.
+    import app
+
+    opened = app.warm_up()
+    worker.log.info("Worker %s warmed %d upstream connection(s)", worker.pid, opened)
+
+
+def worker_exit(server, worker):
+    # Write this worker's unflushed per-tenant usage before it goes away.
+    import app
+
+    app.tenant_usage.flush()
@@ -0,0 +1,97 @@
+"""Process-wide pooled HTTP session for upstream model calls."""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+POOL_CONNECTIONS = int(os.environ.get("UPSTREAM_POOL_CONNECTIONS", 4))
+POOL_MAXSIZE = int(os.environ.get("UPSTREAM_POOL_MAXSIZE", 16))
+POOL_BLOCK = os.environ.get("UPSTREAM_POOL_BLOCK", "false").lower() == "true"
+CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", 60))
+WARM_CONNECTIONS = int(os.environ.get("UPSTREAM_WARM_CONNECTIONS", 2))
+
+_session = None
+_lock = threading.Lock()
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=POOL_BLOCK,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+def get_session():
+    """Return the shared session, creating it on first use.
+
+    urllib3's connection pools are thread-safe, so one session is shared by
+    every thread in the worker process and TCP/TLS connections are reused
+    across calls instead of being re-established each time.
+    """
+    global _session
+    session = _session
+    if session is None:
+        with _lock:
+            if _session is None:
+                _session = _build_session()
+            session = _session
+    return session
+
+
+def timeout():
+    """(connect, read) timeout tuple for upstream requests."""
+    return (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+
+def warm(urls, connections=WARM_CONNECTIONS):
+    """Open up to ``connections`` keep-alive connections to each URL's host.
+
+    Each connection is opened by a concurrent HEAD request whose status is
+    ignored, so the first real calls skip the TCP/TLS handshake. Returns the
+    number of connections opened; unreachable hosts are skipped.
+    """
+    session = get_session()
+    connections = max(0, min(connections, POOL_MAXSIZE))
+    targets = [url for url in dict.fromkeys(urls) for _ in range(connections)]
+    if not targets:
+        return 0
+
+    def head(url):
+        try:
+            session.head(url, timeout=(CONNECT_TIMEOUT, CONNECT_TIMEOUT), allow_redirects=False)
+            return True
+        except requests.RequestException:
+            return False
+
+    with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+        return sum(pool.map(head, targets))
+
+
+def reset_session():
+    """Drop the shared session so the next call builds a fresh pool."""
+    global _session
+    with _lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def _after_fork_in_child():
+    # Sockets inherited from a preloaded parent must not be shared between
+    # gunicorn workers; start each child with an empty pool.
+    global _session, _lock
+    _lock = threading.Lock()
+    _session = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,388 @@
+"""Durable background jobs for long generations.
+
+Jobs live in a SQLite file shared by every gunicorn worker on the host.
+Each worker process runs a few job threads that claim queued jobs under a
+lease, renewed while the job runs; a job whose worker died is picked up
+again once its lease expires.
+Results are kept for ``JOB_RETENTION`` seconds and can be pushed to a
+webhook when the job finishes.
+"""
+import hashlib
+import hmac
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.parse
+import uuid
+
+import http_client
+import sqlite_store
+
+JOB_PATH = os.environ.get("JOB_QUEUE_PATH", "/tmp/fundingnemo-jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+JOB_RETENTION = float(os.environ.get("JOB_RETENTION", 24 * 3600))
+JOB_LEASE_TTL = float(os.environ.get("JOB_LEASE_TTL", 300))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1.0))
+WEBHOOK_RETRIES = int(os.environ.get("JOB_WEBHOOK_RETRIES", 3))
+WEBHOOK_SECRET = os.environ.get("JOB_WEBHOOK_SECRET", "")
+# Comma-separated webhook hosts; when set, no other host is accepted.
+WEBHOOK_ALLOWED_HOSTS = frozenset(
+    host.strip().lower() for host in os.environ.get("JOB_WEBHOOK_ALLOWED_HOSTS", "").split(",") if host.strip()
+)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+STATES = (QUEUED, RUNNING, SUCCEEDED, FAILED)
+
+_COLUMNS = ("id", "endpoint", "payload", "webhook_url", "status", "http_status", "result", "error",
+            "attempts", "created", "started", "finished", "webhook_status")
+
+
+def dedup_key(endpoint, payload, webhook_url=None):
+    """Hash of the endpoint, canonical payload and webhook; identical submissions share a job."""
+    raw = json.dumps([endpoint, payload, webhook_url], sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def check_webhook_url(url):
+    """Why ``url`` can't be used as a webhook, or None if it can.
+
+    Only http(s) URLs are accepted. With JOB_WEBHOOK_ALLOWED_HOSTS the host
+    must be listed; otherwise every address it resolves to must be public,
+    so a submitter can't make the server POST to loopback, link-local
+    (cloud metadata) or private-network services.
+    """
+    try:
+        parsed = urllib.parse.urlsplit(str(url))
+        port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    except ValueError:
+        return "webhookUrl is not a valid URL"
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return "webhookUrl must be an http(s) URL"
+    host = parsed.hostname.lower()
+    if WEBHOOK_ALLOWED_HOSTS:
+        return None if host in WEBHOOK_ALLOWED_HOSTS else f"webhookUrl host {host} is not allowed"
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, UnicodeError):
+        return f"webhookUrl host {host} does not resolve"
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%", 1)[0]).is_global:
+            return f"webhookUrl host {host} is not a public address"
+    return None
+
+
+def sign(body):
+    """HMAC-SHA256 of a webhook body with JOB_WEBHOOK_SECRET."""
+    return hmac.new(WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+class JobQueue:
+    """SQLite-backed job queue with in-process worker threads.
+
+    ``run(endpoint, payload)`` (given here or to ``start``) executes a job
+    and returns ``(status, body)`` where ``status`` is the HTTP status the synchronous endpoint would have
+    returned.
+    """
+    PURGE_INTERVAL = 60
+
+    def __init__(self, run=None, path=JOB_PATH, workers=JOB_WORKERS, retention=JOB_RETENTION,
+                 lease_ttl=JOB_LEASE_TTL, max_attempts=JOB_MAX_ATTEMPTS, poll_interval=JOB_POLL_INTERVAL):
+        self.run = run
+        self.path = path
+        self.workers = workers
+        self.retention = retention
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        self._started_pid = None
+        self._pending = False
+        self._last_purge = 0.0
+        self._stats_lock = threading.Lock()
+        self.processed = 0
+        self.deduplicated = 0
+        self.webhook_failures = 0
+        self.leases_lost = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, endpoint TEXT NOT NULL, payload TEXT NOT NULL, dedup_key TEXT NOT NULL, "
+                "webhook_url TEXT, status TEXT NOT NULL, http_status INTEGER, result TEXT, error TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, lease_expires REAL, created REAL NOT NULL, "
+                "started REAL, finished REAL, webhook_status TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key)")
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._local)
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def started(self):
+        return self._started_pid == os.getpid()
+
+    def start(self, run=None):
+        """Start this process's job threads (once per process; safe to call per request).
+
+        ``run(endpoint, payload)``, if given, replaces the one passed to the
+        constructor, e.g. to bind jobs to the app serving this process.
+        """
+        if self._started_pid == os.getpid() or self.workers <= 0:
+            return
+        with self._wakeup:
+            if self._started_pid == os.getpid():
+                return
+            if run is not None:
+                self.run = run
+            self._started_pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True).start()
+
+    def submit(self, endpoint, payload, webhook_url=None, dedupe=True):
+        """Queue a job, returning ``(job, created)``.
+
+        A job with the same endpoint, payload and webhook that is still
+        queued, running or retained as succeeded is returned instead of a
+        new one, unless ``dedupe`` is False.
+        """
+        key = dedup_key(endpoint, payload, webhook_url)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = None
+            if dedupe:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND status != ? ORDER BY created DESC LIMIT 1",
+                    (key, FAILED),
+                ).fetchone()
+            if row is None:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, endpoint, payload, dedup_key, webhook_url, status, created) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, endpoint, json.dumps(payload), key, webhook_url, QUEUED, time.time()),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        if row is not None:
+            self._count("deduplicated")
+            return self.get(row[0]), False
+        with self._wakeup:
+            self._pending = True
+            self._wakeup.notify()
+        return self.get(job_id), True
+
+    def get(self, job_id):
+        """Job as a dict, or None once it is unknown or purged."""
+        row = self._connect().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def counts(self):
+        """Number of retained jobs in each state."""
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return counts
+
+    def stats(self):
+        return {
+            **self.counts(),
+            "processed": self.processed,
+            "deduplicated": self.deduplicated,
+            "webhook_failures": self.webhook_failures,
+            "leases_lost": self.leases_lost,
+        }
+
+    def claim(self):
+        """Lease the oldest runnable job, or return None.
+
+        Jobs left running by a dead worker become runnable again when their
+        lease expires, up to ``max_attempts`` attempts.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, http_status = 500, finished = ? "
+                "WHERE status = ? AND lease_expires <= ? AND attempts >= ?",
+                (FAILED, "Job worker stopped before finishing", now, RUNNING, now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_expires <= ?) "
+                "ORDER BY created LIMIT 1",
+                (QUEUED, RUNNING, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires = ?, started = ? "
+                    "WHERE id = ?",
+                    (RUNNING, now + self.lease_ttl, now, row[0]),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        job = self.get(row[0])
+        # The lease's expiry doubles as the owner's token: it changes whenever anyone renews or re-claims it.
+        job["lease_expires"] = now + self.lease_ttl
+        return job
+
+    def _heartbeat(self, job, stop):
+        """Renew ``job``'s lease every third of the lease TTL until ``stop`` is set or the lease is lost."""
+        while not stop.wait(self.lease_ttl / 3):
+            expires = time.time() + self.lease_ttl
+            try:
+                cur = self._connect().execute(
+                    "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = ? AND lease_expires = ?",
+                    (expires, job["id"], RUNNING, job["lease_expires"]),
+                )
+            except sqlite3.Error:
+                # Busy; two thirds of the lease are left for the next beat.
+                continue
+            if cur.rowcount != 1:
+                return
+            job["lease_expires"] = expires
+
+    def execute(self, job):
+        """Run a claimed job, store its outcome and deliver the webhook.
+
+        The lease is renewed while the job runs, so a generation that takes
+        longer than JOB_LEASE_TTL isn't claimed and paid for again by
+        another worker. The outcome is only stored if this worker still
+        holds the lease.
+        """
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(job, stop), name="job-heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            try:
+                status, body = self.run(job["endpoint"], job["payload"])
+            except Exception as e:
+                status, body = 500, {"error": str(e)}
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        succeeded = status < 400
+        error = None if succeeded else (body or {}).get("error", f"HTTP {status}")
+        cur = self._connect().execute(
+            "UPDATE jobs SET status = ?, http_status = ?, result = ?, error = ?, finished = ?, lease_expires = NULL "
+            "WHERE id = ? AND status = ? AND lease_expires = ?",
+            (SUCCEEDED if succeeded else FAILED, status, json.dumps(body) if succeeded else None, error,
+             time.time(), job["id"], RUNNING, job["lease_expires"]),
+        )
+        if cur.rowcount != 1:
+            # Another worker took the job over; its outcome and webhook are the ones that count.
+            self._count("leases_lost")
+            return
+        self._count("processed")
+
+        if job["webhook_url"]:
+            self.deliver(self.get(job["id"]))
+
+    def deliver(self, job):
+        """POST the finished job to its webhook, retrying with backoff."""
+        view = public_view(job)
+        view.pop("webhook", None)
+        body = json.dumps(view).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if WEBHOOK_SECRET:
+            headers["X-FundingNemo-Signature"] = f"sha256={sign(body)}"
+
+        outcome = "failed"
+        # Checked again at delivery: the host may resolve differently by now.
+        attempts = WEBHOOK_RETRIES if check_webhook_url(job["webhook_url"]) is None else 0
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(2 ** (attempt - 1))
+            try:
+                # Redirects are not followed; they could lead anywhere.
+                response = http_client.get_session().post(
+                    job["webhook_url"], data=body, headers=headers, timeout=http_client.timeout(),
+                    allow_redirects=False,
+                )
+                response.close()
+                if response.ok:
+                    outcome = "delivered"
+                    break
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    break
+            except Exception:
+                continue
+
+        if outcome == "failed":
+            self._count("webhook_failures")
+        self._connect().execute("UPDATE jobs SET webhook_status = ? WHERE id = ?", (outcome, job["id"]))
+
+    def purge(self):
+        """Drop finished jobs older than the retention period."""
+        cur = self._connect().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND finished <= ?",
+            (SUCCEEDED, FAILED, time.time() - self.retention),
+        )
+        return max(cur.rowcount, 0)
+
+    def _work(self):
+        while True:
+            try:
+                if time.time() - self._last_purge > self.PURGE_INTERVAL:
+                    self._last_purge = time.time()
+                    self.purge()
+                job = self.claim()
+            except sqlite3.OperationalError:
+                # Database busy with another worker; back off and retry.
+                job = None
+            if job is None:
+                with self._wakeup:
+                    if not self._pending:
+                        self._wakeup.wait(self.poll_interval)
+                    self._pending = False
+                continue
+            try:
+                self.execute(job)
+            except sqlite3.Error:
+                # The outcome couldn't be written. The job stays leased and is
+                # retried once the lease expires; this thread keeps working.
+                time.sleep(self.poll_interval)
+
+
+def public_view(job):
+    """The API representation of a job."""
+    view = {
+        "jobId": job["id"],
+        "endpoint": job["endpoint"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "createdAt": job["created"],
+        "startedAt": job["started"],
+        "finishedAt": job["finished"],
+    }
+    if job["status"] == SUCCEEDED:
+        view["result"] = job["result"]
+    if job["status"] == FAILED:
+        view["error"] = job["error"]
+        view["httpStatus"] = job["http_status"]
+    if job["webhook_url"]:
+        view["webhook"] = job["webhook_status"] or "pending"
+    return view
@@ -0,0 +1,173 @@
+"""Structured-output extraction for model completions.
+
+Completions often wrap the requested JSON in code fences or prose, leave a
+trailing comma, or stop mid-object when they hit max_tokens. ``extract``
+finds the first balanced JSON value in a single linear pass, applies cheap
+local repairs, can ask the model to fix only the broken JSON, and finally
+conforms the result to a per-type schema.
+"""
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+_TOKENS = re.compile(r'["\\{}\[\]]')
+_CLOSERS = {"{": "}", "[": "]"}
+_FENCE = re.compile(r"```[a-zA-Z]*\n?")
+_TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+_DANGLING_TAIL = re.compile(r'(,\s*"(?:[^"\\]|\\.)*"\s*:?\s*|[,:]\s*)$')
+
+# Opening brackets tried before giving up; bounds the work on pathological input.
+MAX_CANDIDATES = 16
+
+REPAIR_PROMPT = """The following JSON is malformed. Fix it so it is valid JSON.
+Keep every value that is present. Do not add commentary.
+Return ONLY the corrected JSON.
+
+{broken}"""
+
+
+def loads(text):
+    """Decode JSON, returning None instead of raising."""
+    try:
+        return _loads(text)
+    except ValueError:
+        return None
+
+
+def _scan(text, start):
+    """Scan the value opening at ``text[start]``.
+
+    Returns ``(end, open_stack, in_string)``: ``end`` is the index after the
+    matching close, or None if the text ends first (``open_stack`` then
+    lists the closers still needed) or brackets are mismatched (``open_stack``
+    is None).
+    """
+    stack = []
+    in_string = False
+    skip = -1
+    for match in _TOKENS.finditer(text, start):
+        i = match.start()
+        if i < skip:
+            continue
+        c = match.group()
+        if c == "\\":
+            skip = i + 2
+        elif c == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif c in _CLOSERS:
+            stack.append(_CLOSERS[c])
+        elif not stack or stack.pop() != c:
+            return None, None, False
+        elif not stack:
+            return i + 1, [], False
+    return None, stack, in_string
+
+
+def _close_truncated(fragment, stack, in_string):
+    """Close a value cut off mid-stream (e.g. by max_tokens)."""
+    if in_string:
+        fragment += '"'
+    fragment = _DANGLING_TAIL.sub("", fragment.rstrip())
+    return fragment + "".join(reversed(stack))
+
+
+def _decode(candidate):
+    value = loads(candidate)
+    if value is None:
+        value = loads(_TRAILING_COMMA.sub(r"\1", candidate))
+    return value
+
+
+def find_json(text, opener="{"):
+    """Return ``(value, raw_candidate)`` for the first decodable JSON value.
+
+    ``value`` is None when nothing decodes; ``raw_candidate`` is then the
+    best fragment to hand to a repair step.
+    """
+    text = text.strip()
+    if text.startswith(opener):
+        value = loads(text)
+        if value is not None:
+            return value, text
+    if "```" in text:
+        text = _FENCE.sub("", text).replace("```", "")
+
+    pos = text.find(opener)
+    if pos == -1:
+        return None, None
+    # Common case: one value wrapped in prose; a single slice decodes it.
+    end = text.rfind(_CLOSERS[opener])
+    if end > pos:
+        value = loads(text[pos:end + 1])
+        if value is not None:
+            return value, text[pos:end + 1]
+
+    first_candidate = None
+    for _ in range(MAX_CANDIDATES):
+        if pos == -1:
+            break
+        end, stack, in_string = _scan(text, pos)
+        if end is not None:
+            candidate = text[pos:end]
+            value = _decode(candidate)
+            if value is not None:
+                return value, candidate
+            first_candidate = first_candidate or candidate
+        elif stack:
+            candidate = text[pos:]
+            value = _decode(_close_truncated(candidate, stack, in_string))
+            if value is not None:
+                return value, candidate
+            first_candidate = first_candidate or candidate
+        pos = text.find(opener, pos + 1)
+    return None, first_candidate or text
+
+
+def conform(value, schema):
+    """Give ``value`` every key in ``schema`` with the declared type.
+
+    ``schema`` maps required top-level keys to ``dict``/``list``/``str``;
+    missing or mistyped keys get an empty value so callers can rely on the
+    shape. Returns ``(value, problems)``.
+    """
+    if not isinstance(value, dict):
+        return {key: kind() for key, kind in schema.items()}, ["not an object"]
+    problems = []
+    for key, kind in schema.items():
+        if key not in value:
+            problems.append(f"missing {key}")
+            value[key] = kind()
+        elif not isinstance(value[key], kind):
+            problems.append(f"{key} is not {kind.__name__}")
+            value[key] = kind()
+    return value, problems
+
+
+def extract(content, schema=None, reask=None):
+    """Parse a completion into JSON, or return None.
+
+    ``reask(prompt, max_tokens)`` is called once with a short repair prompt
+    containing only the broken fragment when local parsing fails.
+    """
+    value, candidate = find_json(content)
+    if value is None and reask is not None and candidate:
+        prompt = REPAIR_PROMPT.format(broken=candidate)
+        try:
+            repaired = reask(prompt, max(256, len(candidate) // 3 + 128))
+        except Exception:
+            # A failed repair is treated like an unparseable completion.
+            repaired = ""
+        value, _ = find_json(repaired)
+    if value is None:
+        return None
+    if schema is not None:
+        value, _ = conform(value, schema)
+    return value
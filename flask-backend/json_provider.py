@@ -0,0 +1,143 @@
+"""Flask JSON provider backed by orjson when it is installed.
+
+orjson encodes straight to UTF-8 bytes several times faster than the
+stdlib encoder, so responses also skip the str round trip. Output keeps
+Flask's conventions (sorted keys, compact unless debugging, dates and
+dataclasses through ``default``); without orjson the stdlib provider runs
+unchanged.
+
+``BodyCache`` keeps the serialized body (and its compressed variants) of
+responses built from a cached completion, so a cache hit doesn't extract
+and encode the same large advisor JSON again.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+BODY_CACHE = os.environ.get("RESPONSE_BODY_CACHE", "true").lower() == "true"
+BODY_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_BODY_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+
+if orjson is not None:
+    # Dates and dataclasses go through ``default`` so they match the stdlib provider.
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    backend = "orjson" if orjson is not None else "json"
+
+    def encode(self, obj, pretty=False):
+        """Serialize ``obj`` to UTF-8 bytes."""
+        if orjson is None:
+            separators = None if pretty else (",", ":")
+            return super().dumps(obj, indent=2 if pretty else None, separators=separators).encode("utf-8")
+        option = _OPTIONS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def pretty(self):
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self.bytes_response(self.encode(obj, pretty=self.pretty()) + b"\n")
+
+    def bytes_response(self, body):
+        """A JSON response for an already serialized body."""
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class BodyEntry:
+    """One cached body: ``identity`` bytes plus compressed variants by encoding."""
+
+    __slots__ = ("cache", "key", "identity", "variants")
+
+    def __init__(self, cache, key, identity):
+        self.cache = cache
+        self.key = key
+        self.identity = identity
+        self.variants = {}
+
+    def get(self, encoding):
+        return self.variants.get(encoding)
+
+    def add(self, encoding, body):
+        """Keep a compressed copy; it counts toward the cache's size limit."""
+        self.cache.add_variant(self, encoding, body)
+
+    def size(self):
+        return len(self.identity) + len(self.key[1]) + sum(map(len, self.variants.values()))
+
+
+class BodyCache:
+    """Serialized response bodies by ``(kind, completion)``, LRU-bounded by size.
+
+    Entries are BodyEntry objects; compression.compress_response adds their
+    compressed variants through ``add_variant``, so those bytes count too.
+    """
+
+    def __init__(self, max_bytes=BODY_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(self, key, body):
+        entry = BodyEntry(self, key, body)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.size()
+            self._entries[key] = entry
+            self.bytes += entry.size()
+            self._evict()
+        return entry
+
+    def add_variant(self, entry, encoding, body):
+        with self._lock:
+            # An entry that was evicted or replaced meanwhile is no longer counted; don't grow it.
+            if self._entries.get(entry.key) is not entry or encoding in entry.variants:
+                return
+            entry.variants[encoding] = body
+            self.bytes += len(body)
+            self._evict()
+
+    def _evict(self):
+        while self.bytes > self.max_bytes and len(self._entries) > 1:
+            _, old = self._entries.popitem(last=False)
+            self.bytes -= old.size()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
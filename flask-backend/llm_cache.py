@@ -0,0 +1,202 @@
+"""Content-addressed cache for upstream completions.
+
+Keys are a hash of the rendered messages plus model and max_tokens, so any
+change to the prompt (project fields, template text) produces a new key.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import sqlite_store
+
+CACHE_BACKEND = os.environ.get("LLM_CACHE_BACKEND", "memory")
+CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 2048))
+CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "/tmp/fundingnemo-llm-cache.sqlite3")
+
+
+def cache_key(messages, model, max_tokens):
+    """Stable hash of the request; whitespace in message content is normalized."""
+    normalized = [
+        [m.get("role", ""), " ".join(str(m.get("content", "")).split())]
+        for m in messages
+    ]
+    raw = json.dumps([model, max_tokens, normalized], separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class BaseCache:
+    backend = "base"
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+
+    def _count(self, field, n=1):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + n)
+
+    def get(self, key):
+        value = self._get(key)
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def peek(self, key):
+        """Like get() but without touching the hit/miss counters."""
+        return self._get(key)
+
+    def set(self, key, value):
+        self._set(key, value)
+        self._count("sets")
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "hits": self.hits,
+                "misses": self.misses,
+                "sets": self.sets,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+
+class NullCache(BaseCache):
+    """Cache that never stores anything (LLM_CACHE_BACKEND=none)."""
+    backend = "none"
+
+    def _get(self, key):
+        return None
+
+    def _set(self, key, value):
+        pass
+
+
+class MemoryCache(BaseCache):
+    """In-process LRU with a TTL, an entry cap and a byte-size cap."""
+    backend = "memory"
+
+    def __init__(self, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires, size = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                self._bytes -= size
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        evicted = 0
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, time.monotonic() + self.ttl, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, old_size) = self._data.popitem(last=False)
+                self._bytes -= old_size
+                evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+
+    def stats(self):
+        stats = super().stats()
+        with self._lock:
+            stats.update(entries=len(self._data), bytes=self._bytes)
+        return stats
+
+
+class SqliteCache(BaseCache):
+    """On-disk cache shared by every gunicorn worker on the host."""
+    backend = "sqlite"
+    PRUNE_EVERY = 100
+
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_entries=CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires ON llm_cache (expires)")
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._local)
+
+    def _get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM llm_cache WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _set(self, key, value):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, expires) VALUES (?, ?, ?)",
+            (key, value, time.time() + self.ttl),
+        )
+        if self.sets % self.PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def _prune(self, conn):
+        cur = conn.execute("DELETE FROM llm_cache WHERE expires <= ?", (time.time(),))
+        evicted = max(cur.rowcount, 0)
+        cur = conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        evicted += max(cur.rowcount, 0)
+        if evicted:
+            self._count("evictions", evicted)
+
+    def stats(self):
+        stats = super().stats()
+        stats["entries"] = self._connect().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return stats
+
+
+def make_cache(backend=CACHE_BACKEND):
+    """Build the cache selected by LLM_CACHE_BACKEND (memory, sqlite or none)."""
+    if backend == "sqlite":
+        return SqliteCache()
+    if backend == "none":
+        return NullCache()
+    if backend == "memory":
+        return MemoryCache()
+    raise ValueError(f"Unknown LLM_CACHE_BACKEND: {backend}")
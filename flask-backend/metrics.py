@@ -0,0 +1,238 @@
+"""In-process metrics with a Prometheus text exporter.
+
+Hot-path cost is a dict lookup and a lock per observation; callers pass
+every label of a metric as a keyword argument, and each metric reads them
+into its series key with a getter built once at registration. Labels for the
+current request (endpoint, asset/advisor type) live in a context variable
+so deep call sites such as call_gradient_ai can label their observations
+without extra arguments.
+"""
+import bisect
+import contextlib
+import contextvars
+import operator
+import os
+import threading
+import time
+
+ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_labels = contextvars.ContextVar("metrics_labels", default={})
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _key_getter(labelnames):
+    """Function from a labels dict to the series key: label values in ``labelnames`` order."""
+    if not labelnames:
+        return lambda labels: ()
+    if len(labelnames) == 1:
+        name = labelnames[0]
+        return lambda labels: (labels[name],)
+    return operator.itemgetter(*labelnames)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._key = _key_getter(self.labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._key = _key_getter(self.labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def collect(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, (("le", _format_value(bound)),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class GaugeCallback:
+    """Value read from a callback at scrape time, e.g. cache or scheduler stats.
+
+    ``fn`` returns ``(label_values, value)`` pairs.
+    """
+
+    def __init__(self, name, help, fn, labelnames=(), kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def collect(self):
+        for key, value in self.fn():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, fn, labelnames=(), kind="gauge"):
+        return self.register(GaugeCallback(name, help, fn, labelnames, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "fundingnemo_request_seconds", "HTTP request latency.", ("endpoint", "status"))
+STAGE_SECONDS = REGISTRY.histogram(
+    "fundingnemo_stage_seconds", "Time spent per request stage.", ("stage", "endpoint", "kind"))
+UPSTREAM_TOKENS = REGISTRY.counter(
+    "fundingnemo_upstream_tokens_total", "Tokens reported by the upstream usage block.",
+    ("endpoint", "kind", "type"))
+UPSTREAM_RESPONSE_BYTES = REGISTRY.counter(
+    "fundingnemo_upstream_response_bytes_total", "Completion text size.", ("endpoint", "kind"))
+CACHE_LOOKUPS = REGISTRY.counter(
+    "fundingnemo_cache_lookups_total", "Response cache lookups.", ("endpoint", "kind", "result"))
+
+
+def begin_request(endpoint, server_timing=True):
+    """Reset labels for a new request and return its Server-Timing list (None if not wanted).
+
+    Worker threads are reused across requests, so nothing may carry over.
+    """
+    timings = [] if server_timing else None
+    _labels.set({"endpoint": endpoint, "timings": timings})
+    return timings
+
+
+def current_labels():
+    return _labels.get()
+
+
+def set_labels(**labels):
+    """Add labels for the rest of the current request/thread context."""
+    _labels.set({**_labels.get(), **labels})
+
+
+@contextlib.contextmanager
+def labels(**values):
+    """Temporarily add labels, e.g. per asset inside a batch worker thread."""
+    token = _labels.set({**_labels.get(), **values})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def observe_stage(stage, seconds):
+    current = _labels.get()
+    STAGE_SECONDS.observe(seconds, stage=stage, endpoint=current.get("endpoint", ""),
+                          kind=current.get("kind", ""))
+    timings = current.get("timings")
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+class _Timer:
+    # A class rather than a generator context manager: it runs several times
+    # per request, and this is a few times cheaper to enter and exit.
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter() if ENABLED else None
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            observe_stage(self.stage, time.perf_counter() - self.start)
+
+
+def timer(stage):
+    """Time a request stage; also recorded for the Server-Timing header."""
+    return _Timer(stage)
+
+
+def server_timing(timings):
+    """Format (stage, seconds) pairs as a Server-Timing header value."""
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
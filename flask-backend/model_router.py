@@ -0,0 +1,352 @@
+"""Route upstream calls across several OpenAI-compatible providers.
+
+Each provider keeps an EWMA of its error rate, a circuit breaker, and an
+EWMA and recent samples of its latency per call class (a template,
+buffered or streamed), since a streamed call's headers and a 1500-token
+advisor take very different times. Calls go to the healthy provider with
+the best weighted latency for their class and fail over to the next one on
+a retryable error. Interactive calls can be hedged: if the first provider
+hasn't answered within its p95 latency for the class, a second request
+goes to the runner-up and the first response wins. The second request
+needs its own upstream slot and rate-limit budget (``admit``); without
+one the call isn't hedged.
+
+Providers come from ``UPSTREAM_PROVIDERS`` (a JSON list of
+``{"name", "url", "model", "keyEnv", "weight"}``); without it there is a
+single provider built from GRADIENT_API_URL, the default model and
+MODEL_ACCESS_KEY.
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+
+from upstream_scheduler import RETRYABLE_STATUSES, UpstreamError
+
+PROVIDERS = os.environ.get("UPSTREAM_PROVIDERS", "")
+EWMA_ALPHA = float(os.environ.get("ROUTER_EWMA_ALPHA", 0.2))
+EXPLORE = float(os.environ.get("ROUTER_EXPLORE", 0.05))
+ERROR_PENALTY = float(os.environ.get("ROUTER_ERROR_PENALTY", 4.0))
+CIRCUIT_FAILURES = int(os.environ.get("CIRCUIT_FAILURES", 5))
+CIRCUIT_RESET = float(os.environ.get("CIRCUIT_RESET", 30))
+HEDGE = os.environ.get("UPSTREAM_HEDGE", "false").lower() == "true"
+# Templates behind interactive calls that are worth a duplicate request.
+HEDGE_TEMPLATES = frozenset(
+    name.strip() for name in os.environ.get("UPSTREAM_HEDGE_TEMPLATES", "pitch_feedback,tagline").split(",")
+    if name.strip()
+)
+HEDGE_DELAY = float(os.environ.get("HEDGE_DELAY", 2.0))
+HEDGE_MIN_DELAY = float(os.environ.get("HEDGE_MIN_DELAY", 0.1))
+HEDGE_MIN_SAMPLES = int(os.environ.get("HEDGE_MIN_SAMPLES", 20))
+HEDGE_WORKERS = int(os.environ.get("HEDGE_WORKERS", 32))
+
+# Failures that say something about the provider rather than the request.
+FAILOVER_STATUSES = RETRYABLE_STATUSES | {401, 402}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def is_provider_failure(error):
+    if isinstance(error, UpstreamError):
+        return error.status in FAILOVER_STATUSES
+    return isinstance(error, requests.RequestException)
+
+
+class CircuitBreaker:
+    """Opens after ``failures`` consecutive failures; after ``reset`` seconds
+    one trial call is let through and its outcome closes or reopens it."""
+
+    def __init__(self, failures=CIRCUIT_FAILURES, reset=CIRCUIT_RESET):
+        self.failures = failures
+        self.reset = reset
+        self.state = CLOSED
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.reset:
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def available(self):
+        """Like ``allow`` but without claiming the half-open trial."""
+        with self._lock:
+            if self.state == OPEN:
+                return time.monotonic() - self._opened_at >= self.reset
+            return self.state == CLOSED or not self._trial
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._consecutive = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == HALF_OPEN or self._consecutive >= self.failures:
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+
+class Provider:
+    def __init__(self, name, url, model, key_env="MODEL_ACCESS_KEY", weight=1.0, alpha=EWMA_ALPHA):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.key_env = key_env
+        # Read once: the environment doesn't change under a running worker.
+        self._api_key = os.environ.get(key_env)
+        self.weight = float(weight)
+        self.alpha = alpha
+        self.breaker = CircuitBreaker()
+        # EWMA over every call, for dashboards; routing and hedging use _classes.
+        self.latency = None
+        self.error_rate = 0.0
+        # call class -> [latency EWMA, recent latencies]
+        self._classes = {}
+        self.calls = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def api_key(self):
+        return self._api_key
+
+    def score(self, kind=""):
+        """Lower is better: EWMA latency for ``kind`` calls, penalized by errors, divided by weight."""
+        latency = self._classes.get(kind)
+        if latency is None:
+            return 0.0
+        return latency[0] * (1 + ERROR_PENALTY * self.error_rate) / self.weight
+
+    def p95(self, kind=""):
+        """p95 latency of recent ``kind`` calls, or None with too few samples."""
+        with self._lock:
+            latency = self._classes.get(kind)
+            if latency is None or len(latency[1]) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(latency[1])
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def record(self, elapsed, failed, kind=""):
+        with self._lock:
+            self.calls += 1
+            if failed:
+                self.failures += 1
+            else:
+                latency = self._classes.get(kind)
+                if latency is None:
+                    latency = self._classes[kind] = [elapsed, deque(maxlen=200)]
+                latency[0] = self.alpha * elapsed + (1 - self.alpha) * latency[0]
+                latency[1].append(elapsed)
+                self.latency = elapsed if self.latency is None else (
+                    self.alpha * elapsed + (1 - self.alpha) * self.latency)
+            self.error_rate = self.alpha * failed + (1 - self.alpha) * self.error_rate
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    def stats(self):
+        classes = {}
+        for kind in list(self._classes):
+            p95 = self.p95(kind)
+            classes[kind] = {"latency_ewma_ms": round(self._classes[kind][0] * 1000, 1),
+                             "p95_ms": round(p95 * 1000, 1) if p95 is not None else None}
+        with self._lock:
+            return {
+                "name": self.name,
+                "model": self.model,
+                "weight": self.weight,
+                "circuit": self.breaker.state,
+                "latency_ewma_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+                "error_ewma": round(self.error_rate, 4),
+                "calls": self.calls,
+                "failures": self.failures,
+                "classes": classes,
+            }
+
+
+class ModelRouter:
+    def __init__(self, providers, explore=EXPLORE, hedge_delay=HEDGE_DELAY, hedge_min_delay=HEDGE_MIN_DELAY):
+        if not providers:
+            raise ValueError("ModelRouter needs at least one provider")
+        self.providers = list(providers)
+        self.explore = explore
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self.failovers = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_skipped = 0
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def ranked(self, kind=""):
+        """Providers whose circuit admits a call, best first for ``kind`` calls.
+
+        A small fraction of calls goes to a weighted-random provider first
+        so a recovered provider's latency estimate gets refreshed.
+        """
+        healthy = sorted((p for p in self.providers if p.breaker.available()), key=lambda p: p.score(kind))
+        if len(healthy) > 1 and random.random() < self.explore:
+            pick = random.choices(healthy, [p.weight for p in healthy])[0]
+            healthy.remove(pick)
+            healthy.insert(0, pick)
+        return healthy
+
+    def call(self, send, hedge=False, kind="", admit=None):
+        """Return ``send(provider)`` from the best provider, failing over on provider errors.
+
+        ``kind`` is the call class latencies are tracked under. A hedge is
+        only sent if ``admit()`` returns a function that releases its
+        upstream slot (None means no capacity; no ``admit``, always).
+        Errors caused by the request itself (e.g. 400) are raised at once.
+        If every provider fails, the last error is raised for the scheduler
+        to back off and retry.
+        """
+        candidates = self.ranked(kind)
+        if not candidates:
+            raise UpstreamError("All upstream providers are unavailable", 503)
+        last_error = None
+        for index, provider in enumerate(candidates):
+            if index:
+                self._count("failovers")
+            try:
+                if hedge and index == 0:
+                    return self._hedged(send, provider, candidates[1:], kind, admit)
+                return self._attempt(send, provider, kind)
+            except Exception as e:
+                if not is_provider_failure(e):
+                    raise
+                last_error = e
+        if last_error is None:
+            raise UpstreamError("All upstream providers are unavailable", 503)
+        raise last_error
+
+    def _attempt(self, send, provider, kind=""):
+        if not provider.breaker.allow():
+            raise UpstreamError(f"Circuit open for {provider.name}", 503)
+        start = time.monotonic()
+        try:
+            response = send(provider)
+        except Exception as e:
+            if is_provider_failure(e):
+                provider.record(time.monotonic() - start, True, kind)
+            else:
+                # The request was at fault, not the provider.
+                provider.record(time.monotonic() - start, False, kind)
+            raise
+        provider.record(time.monotonic() - start, False, kind)
+        return response
+
+    def _executor(self):
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._pool = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _hedged(self, send, primary, others, kind="", admit=None):
+        """Send to ``primary``; after its p95 latency for ``kind`` also send to the runner-up."""
+        delay = max(self.hedge_min_delay, primary.p95(kind) or self.hedge_delay)
+        pool = self._executor()
+        first = pool.submit(self._attempt, send, primary, kind)
+        done, _ = wait([first], timeout=delay)
+        if done:
+            return first.result()
+
+        release = admit() if admit is not None else _no_release
+        if release is None:
+            # No upstream slot or rate-limit budget for a second request right now.
+            self._count("hedges_skipped")
+            return first.result()
+        backup = others[0] if others else primary
+        self._count("hedges")
+        second = pool.submit(self._attempt, send, backup, kind)
+        # The caller's slot is freed as soon as this returns, possibly while
+        # the losing request is still running upstream. So the hedge's slot
+        # is held until both are done, to keep in-flight calls under the cap.
+        both_done = _CountDown(2, release)
+        first.add_done_callback(both_done)
+        second.add_done_callback(both_done)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        self._count("hedge_wins")
+                    for loser in pending:
+                        loser.add_done_callback(_close_response)
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def stats(self):
+        with self._lock:
+            stats = {"failovers": self.failovers, "hedges": self.hedges, "hedge_wins": self.hedge_wins,
+                     "hedges_skipped": self.hedges_skipped}
+        stats["providers"] = [p.stats() for p in self.providers]
+        return stats
+
+
+def _no_release():
+    pass
+
+
+class _CountDown:
+    """Done-callback that calls ``fn()`` once it has been called ``count`` times."""
+
+    def __init__(self, count, fn):
+        self.count = count
+        self.fn = fn
+        self._lock = threading.Lock()
+
+    def __call__(self, _future):
+        with self._lock:
+            self.count -= 1
+            last = self.count == 0
+        if last:
+            self.fn()
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
+
+
+def load_providers(default_url, default_model, spec=PROVIDERS):
+    """Providers from UPSTREAM_PROVIDERS, or the single default one."""
+    if not spec:
+        return [Provider("gradient", default_url, default_model)]
+    providers = []
+    for i, entry in enumerate(json.loads(spec)):
+        providers.append(Provider(
+            entry.get("name") or f"provider{i}",
+            entry.get("url") or default_url,
+            entry.get("model") or default_model,
+            key_env=entry.get("keyEnv", "MODEL_ACCESS_KEY"),
+            weight=entry.get("weight", 1.0),
+        ))
+    return providers
@@ -0,0 +1,182 @@
+"""Speculative generation of the results a project's tabs are likely to ask for next.
+
+After a project is saved the frontend almost always opens SmartGuidance,
+the pitch assets and the financial model. POST /prefetch queues those
+generations here; a few background threads run them at the lowest
+upstream priority, so the response cache already holds the result when
+the tab asks for it. Prefetching:
+
+- waits while the worker's upstream slots are busy with real traffic
+  (more than PREFETCH_MAX_SHARE of them in flight), giving up on a task
+  PREFETCH_MAX_WAIT seconds after it was queued;
+- stops at PREFETCH_BUDGET_TOKENS estimated tokens per
+  PREFETCH_BUDGET_WINDOW seconds in each worker;
+- drops queued work for a project once a newer version of it is
+  submitted (``current`` is checked before each generation).
+
+Each prefetched cache key is remembered; a later cache hit on it counts as
+``used``, so ``used / generated`` is the share of prefetches that paid off.
+"""
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+
+PREFETCH = os.environ.get("PREFETCH", "true").lower() == "true"
+PREFETCH_TYPES = tuple(
+    name.strip() for name in
+    os.environ.get("PREFETCH_TYPES", "advisor:smart_guidance,advisor:financial_model,pitch:tagline,pitch:30sec").split(",")
+    if name.strip()
+)
+PREFETCH_WORKERS = int(os.environ.get("PREFETCH_WORKERS", 2))
+PREFETCH_QUEUE_MAX = int(os.environ.get("PREFETCH_QUEUE_MAX", 64))
+PREFETCH_MAX_SHARE = float(os.environ.get("PREFETCH_MAX_SHARE", 0.5))
+PREFETCH_MAX_WAIT = float(os.environ.get("PREFETCH_MAX_WAIT", 60))
+PREFETCH_BUDGET_TOKENS = int(os.environ.get("PREFETCH_BUDGET_TOKENS", 200_000))
+PREFETCH_BUDGET_WINDOW = float(os.environ.get("PREFETCH_BUDGET_WINDOW", 3600))
+# Prefetched cache keys remembered for hit accounting.
+LEDGER_MAX = 4096
+BUSY_POLL = 0.25
+
+EVENTS = ("queued", "generated", "uncached", "cached", "used", "cancelled", "over_budget", "expired", "dropped",
+          "failed")
+# Outcomes a runner may return. UNCACHED: generated, but not stored (e.g. truncated or unparseable), so no tab can use it.
+GENERATED, UNCACHED, CACHED, OVER_BUDGET = "generated", "uncached", "cached", "over_budget"
+
+
+class Budget:
+    """Estimated tokens spent in a sliding window; ``take`` refuses what doesn't fit."""
+
+    def __init__(self, tokens=PREFETCH_BUDGET_TOKENS, window=PREFETCH_BUDGET_WINDOW):
+        self.tokens = tokens
+        self.window = window
+        self._spent = deque()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._spent and self._spent[0][0] <= now - self.window:
+            self._total -= self._spent.popleft()[1]
+
+    def take(self, amount):
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            if self._total + amount > self.tokens:
+                return False
+            self._spent.append((now, amount))
+            self._total += amount
+            return True
+
+    def remaining(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return max(0, self.tokens - self._total)
+
+
+class Task:
+    __slots__ = ("project_id", "version", "kind", "name", "project", "tenant", "deadline")
+
+    def __init__(self, project_id, version, kind, name, project, tenant, max_wait=PREFETCH_MAX_WAIT):
+        self.project_id = project_id
+        self.version = version
+        self.kind = kind
+        self.name = name
+        self.project = project
+        self.tenant = tenant
+        self.deadline = time.monotonic() + max_wait
+
+
+class Prefetcher:
+    """Background prefetch threads.
+
+    ``runner(task)`` generates one task into the response cache and returns
+    ``(outcome, cache key)``; ``current(task)`` says whether the task's
+    project version is still the latest; ``busy()`` whether real traffic
+    needs the upstream slots right now.
+    """
+
+    def __init__(self, runner, current, busy, workers=PREFETCH_WORKERS, queue_max=PREFETCH_QUEUE_MAX,
+                 budget=None):
+        self.runner = runner
+        self.current = current
+        self.busy = busy
+        self.workers = workers
+        self.budget = budget or Budget()
+        self._queue = queue.Queue(maxsize=queue_max)
+        self._ledger = OrderedDict()
+        self._lock = threading.Lock()
+        self._started_pid = None
+        self.counts = dict.fromkeys(EVENTS, 0)
+
+    def _count(self, event, n=1):
+        with self._lock:
+            self.counts[event] += n
+
+    def start(self):
+        """Start this process's prefetch threads (once per process; safe to call per request)."""
+        if self._started_pid == os.getpid() or self.workers <= 0:
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            for i in range(self.workers):
+                threading.Thread(target=self._work, name=f"prefetch-{i}", daemon=True).start()
+
+    def submit(self, tasks):
+        """Queue ``tasks``, returning the ``(kind, name)`` of those that fit in the queue."""
+        self.start()
+        queued = []
+        for task in tasks:
+            try:
+                self._queue.put_nowait(task)
+            except queue.Full:
+                self._count("dropped")
+                continue
+            queued.append((task.kind, task.name))
+        self._count("queued", len(queued))
+        return queued
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            try:
+                self._run(task)
+            except Exception:
+                self._count("failed")
+
+    def _run(self, task):
+        while True:
+            if time.monotonic() > task.deadline:
+                self._count("expired")
+                return
+            if not self.busy():
+                break
+            time.sleep(BUSY_POLL)
+        if not self.current(task):
+            self._count("cancelled")
+            return
+        outcome, key = self.runner(task)
+        self._count(outcome)
+        if outcome == GENERATED:
+            with self._lock:
+                self._ledger[key] = None
+                while len(self._ledger) > LEDGER_MAX:
+                    self._ledger.popitem(last=False)
+
+    def mark_used(self, key):
+        """Count a cache hit on a prefetched key (once per prefetch)."""
+        with self._lock:
+            if key in self._ledger:
+                del self._ledger[key]
+                self.counts["used"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counts)
+        stats["hit_rate"] = round(stats["used"] / stats["generated"], 4) if stats["generated"] else 0.0
+        stats["queue"] = self._queue.qsize()
+        stats["budget_remaining"] = self.budget.remaining()
+        return stats
@@ -0,0 +1,160 @@
+"""Prompt and completion budgets.
+
+Before rendering, project fields that are empty or only hold a placeholder
+are left out of the prompt and oversized free-text fields are cut to the
+template's per-field budget. After each upstream call the completion
+length is recorded so ``max_tokens`` can follow what each template
+actually produces instead of a fixed 900/1500.
+"""
+import os
+import re
+import threading
+from collections import deque
+
+COMPACTION = os.environ.get("PROMPT_COMPACTION", "true").lower() == "true"
+FIELD_TOKENS = int(os.environ.get("PROMPT_FIELD_TOKENS", 160))
+ADAPTIVE_MAX_TOKENS = os.environ.get("ADAPTIVE_MAX_TOKENS", "true").lower() == "true"
+MAX_TOKENS_WINDOW = int(os.environ.get("MAX_TOKENS_WINDOW", 200))
+MAX_TOKENS_MIN_SAMPLES = int(os.environ.get("MAX_TOKENS_MIN_SAMPLES", 20))
+MAX_TOKENS_HEADROOM = float(os.environ.get("MAX_TOKENS_HEADROOM", 1.3))
+MAX_TOKENS_CEILING = int(os.environ.get("MAX_TOKENS_CEILING", 4096))
+
+# Values founders (or the frontend) send for "nothing to say".
+PLACEHOLDERS = frozenset({"", "n/a", "na", "none", "null", "not specified", "tbd", "unknown", "-", "?"})
+
+# Budgets snap to these steps so a drifting percentile doesn't change the
+# requested max_tokens on every call.
+_STEPS = (64, 96, 128, 192, 256, 384, 512, 768, 1024, 1536, 2048, 3072, 4096, 6144, 8192)
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text):
+    """Approximate BPE token count: short words and punctuation are one token,
+    longer words one per ~5 characters."""
+    return sum(1 + (len(piece) - 1) // 5 for piece in _TOKEN_RE.findall(text))
+
+
+def truncate(text, budget):
+    """Keep whole leading sentences of ``text`` within ``budget`` tokens."""
+    if len(text) <= budget or estimate_tokens(text) <= budget:
+        return text
+    kept, used = [], 0
+    for sentence in _SENTENCE_END_RE.split(text.strip()):
+        cost = estimate_tokens(sentence)
+        if used + cost > budget:
+            if not kept:
+                # One very long sentence: cut it at a word boundary instead.
+                words = []
+                for word in sentence.split():
+                    used += estimate_tokens(word)
+                    if used > budget:
+                        break
+                    words.append(word)
+                kept.append(" ".join(words))
+            break
+        kept.append(sentence)
+        used += cost
+    return " ".join(kept) + " ..."
+
+
+def is_placeholder(value, default=None):
+    """True for missing values, placeholders like "N/A" and the template's own default."""
+    if value is None:
+        return True
+    text = str(value).strip()
+    return text.lower() in PLACEHOLDERS or (default is not None and text == default)
+
+
+def compact(template, project):
+    """Return ``(project, omit)`` for ``template.render(project, omit=omit)``.
+
+    ``omit`` holds the optional fields with nothing to say; oversized string
+    fields in the returned copy are truncated to the template's budget.
+    """
+    budget = template.field_tokens or FIELD_TOKENS
+    compacted = dict(project)
+    omit = set()
+    for field in template.fields:
+        value = project.get(field)
+        if field not in template.required and is_placeholder(value, template.defaults.get(field)):
+            omit.add(field)
+        elif isinstance(value, str) and len(value) > budget:
+            compacted[field] = truncate(value, budget)
+    return compacted, omit
+
+
+def _step(tokens):
+    for step in _STEPS:
+        if step >= tokens:
+            return step
+    return _STEPS[-1]
+
+
+def step_up(tokens, ceiling=MAX_TOKENS_CEILING):
+    """The next budget step above ``tokens``, at most ``ceiling`` (for retrying a truncated completion)."""
+    for step in _STEPS:
+        if step > tokens:
+            return min(step, ceiling)
+    return min(tokens, ceiling)
+
+
+class OutputBudget:
+    """Per-template ``max_tokens`` from the recent completion lengths.
+
+    Until ``min_samples`` completions have been seen the template's static
+    ``max_tokens`` is used. After that the budget is the p95 length times
+    ``headroom``, snapped to a fixed step. A completion cut off by the limit
+    counts as needing half as much again, so the budget grows back.
+    """
+
+    def __init__(self, window=MAX_TOKENS_WINDOW, min_samples=MAX_TOKENS_MIN_SAMPLES,
+                 headroom=MAX_TOKENS_HEADROOM, ceiling=MAX_TOKENS_CEILING):
+        self.window = window
+        self.min_samples = min_samples
+        self.headroom = headroom
+        self.ceiling = ceiling
+        self._samples = {}
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def observe(self, template, tokens, limit=None, truncated=False):
+        """Record one completion of ``template`` (``tokens`` long, ``limit`` requested)."""
+        if truncated and limit:
+            tokens = max(tokens, limit * 3 // 2)
+        with self._lock:
+            samples = self._samples.get(template)
+            if samples is None:
+                samples = self._samples[template] = deque(maxlen=self.window)
+            samples.append(tokens)
+            self._budgets.pop(template, None)
+
+    def max_tokens(self, template, default):
+        """Budget for the next call of ``template``."""
+        budget = self._budgets.get(template)
+        if budget is not None:
+            return budget
+        with self._lock:
+            samples = self._samples.get(template)
+            if not samples or len(samples) < self.min_samples:
+                return default
+            ordered = sorted(samples)
+            p95 = ordered[int(0.95 * (len(ordered) - 1))]
+            budget = self._budgets[template] = min(_step(p95 * self.headroom), self.ceiling)
+        return budget
+
+    def stats(self):
+        with self._lock:
+            items = [(template, list(samples)) for template, samples in self._samples.items()]
+        stats = []
+        for template, samples in items:
+            stats.append({
+                "template": template.name,
+                "version": template.version,
+                "samples": len(samples),
+                "p50": sorted(samples)[len(samples) // 2],
+                "max_tokens": self.max_tokens(template, template.max_tokens),
+                "default": template.max_tokens,
+            })
+        return stats
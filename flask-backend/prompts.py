@@ -0,0 +1,700 @@
+"""Prompt templates, compiled once at import time.
+
+Templates use ``str.format`` syntax: ``{field}`` is filled from the project
+dict (or an extra render argument) and ``{{``/``}}`` are literal braces.
+Each template declares its defaults for missing fields, the fields a
+project must provide for a useful result, and its static budgets:
+``max_tokens`` for the completion and ``field_tokens`` for any single
+project field (see prompt_budget).
+"""
+import string
+
+DEFAULT_REQUIRED = ("startup_name", "one_liner")
+
+
+class PromptTemplate:
+    MAX_COMPACTED = 256
+
+    def __init__(self, name, text, defaults=None, required=None, extra=(), schema=None, max_tokens=None,
+                 field_tokens=None, version=1):
+        self.name = name
+        self.text = text
+        self.version = version
+        self.max_tokens = max_tokens
+        self.field_tokens = field_tokens
+        # Required top-level keys of a JSON response, see json_extract.conform.
+        self.schema = schema
+        self.defaults = dict(defaults or {})
+        self.extra = tuple(extra)
+        fields = [f for _, f, _, _ in string.Formatter().parse(text) if f]
+        self.fields = tuple(f for f in dict.fromkeys(fields) if f not in self.extra)
+        if required is None:
+            required = [f for f in DEFAULT_REQUIRED if f in self.fields]
+        self.required = tuple(required)
+        unknown = (set(self.required) | set(self.defaults)) - set(self.fields)
+        if unknown:
+            raise ValueError(f"{name} v{version}: unknown fields {sorted(unknown)}")
+        self._defaults = [(f, self.defaults.get(f, "")) for f in self.fields]
+        # Lines whose project fields can all be omitted are dropped by render().
+        self._compacted = {}
+        self._lines = []
+        for line in text.split("\n"):
+            line_fields = {f for _, f, _, _ in string.Formatter().parse(line) if f}
+            self._lines.append((line, frozenset(line_fields) if line_fields.isdisjoint(self.extra) else None))
+
+    def missing_fields(self, project):
+        """Required fields the project leaves empty."""
+        return [f for f in self.required if not str(project.get(f) or "").strip()]
+
+    def render(self, project, omit=(), **extra):
+        """Fill the template; only this template's fields are looked up.
+
+        Lines whose fields are all in ``omit`` are left out.
+        """
+        values = {f: project.get(f, default) for f, default in self._defaults}
+        values.update(extra)
+        text = self.text
+        if omit:
+            omit = frozenset(omit)
+            text = self._compacted.get(omit)
+            if text is None:
+                text = "\n".join(line for line, fields in self._lines if not fields or not fields <= omit)
+                if len(self._compacted) < self.MAX_COMPACTED:
+                    self._compacted[omit] = text
+        return text.format_map(values)
+
+
+class PromptRegistry:
+    """Templates by name and version; ``get`` returns the latest version by default."""
+
+    def __init__(self):
+        self._templates = {}
+
+    def register(self, template):
+        self._templates.setdefault(template.name, {})[template.version] = template
+        return template
+
+    def get(self, name, version=None):
+        versions = self._templates[name]
+        if version is None:
+            return versions[max(versions)]
+        return versions[int(version)]
+
+    def names(self):
+        return tuple(self._templates)
+
+    def __contains__(self, name):
+        return name in self._templates
+
+    def describe(self):
+        described = {}
+        for name, versions in self._templates.items():
+            latest = versions[max(versions)]
+            described[name] = {
+                "versions": sorted(versions),
+                "fields": list(latest.fields),
+                "required": list(latest.required),
+                "defaults": latest.defaults,
+            }
+        return described
+
+
+PITCH_TEMPLATES = PromptRegistry()
+ADVISOR_TEMPLATES = PromptRegistry()
+FEEDBACK_TEMPLATES = PromptRegistry()
+# Later stages of /ai-advisor/report, fed a summary of the earlier stages.
+REPORT_TEMPLATES = PromptRegistry()
+
+PITCH_TEMPLATES.register(PromptTemplate(
+    "tagline",
+    """Rewrite the following startup description into a crisp, investor-ready one-liner (under 15 words):
+
+Startup: {startup_name}
+One-liner: {one_liner}
+Problem: {problem_statement}
+Solution: {solution_description}
+Category: {category}
+
+Return ONLY the tagline, nothing else.""",
+    max_tokens=300,
+    field_tokens=60,
+))
+
+PITCH_TEMPLATES.register(PromptTemplate(
+    "30sec",
+    """Generate a 30-second spoken pitch suitable for a first investor meeting (about 80-100 words):
+
+Startup: {startup_name}
+One-liner: {one_liner}
+Problem: {problem_statement}
+Solution: {solution_description}
+Target Users: {target_users}
+Traction: {traction_users} users, {traction_revenue}
+Ask: {ask_amount}
+
+The pitch should hook attention, state the problem, present the solution, mention traction, and end with the ask. Return ONLY the pitch text.""",
+    defaults={
+        "traction_users": "Early stage",
+        "traction_revenue": "Pre-revenue",
+    },
+    max_tokens=500,
+    field_tokens=120,
+))
+
+PITCH_TEMPLATES.register(PromptTemplate(
+    "2min",
+    """Generate a structured 2-minute pitch with problem, solution, market, traction, and ask (about 300-350 words):
+
+Startup: {startup_name}
+One-liner: {one_liner}
+Problem: {problem_statement}
+Solution: {solution_description}
+Target Users: {target_users}
+Why Now: {why_now}
+Differentiation: {differentiation}
+Traction: Users: {traction_users}, Revenue: {traction_revenue}, Growth: {traction_growth}
+Business Model: {business_model}
+Ask: {ask_amount}
+Use of Funds: {use_of_funds}
+
+Structure: Opening hook, problem deep-dive, solution explanation, market opportunity, traction proof, business model, team credibility (brief), and clear ask. Return ONLY the pitch text.""",
+    defaults={
+        "why_now": "Market timing is right",
+        "differentiation": "Unique approach",
+        "traction_users": "Early stage",
+        "traction_revenue": "Pre-revenue",
+        "traction_growth": "Growing",
+    },
+    max_tokens=900,
+    field_tokens=200,
+))
+
+PITCH_TEMPLATES.register(PromptTemplate(
+    "deck_outline",
+    """Generate a 6-slide pitch deck outline. Return JSON:
+[
+  {{ "slide": 1, "title": "string", "bullets": ["string"] }}
+]
+
+Startup: {startup_name}
+One-liner: {one_liner}
+Problem: {problem_statement}
+Solution: {solution_description}
+Target Users: {target_users}
+Traction: {traction_users} users, {traction_revenue} revenue
+Business Model: {business_model}
+Ask: {ask_amount}
+Use of Funds: {use_of_funds}
+
+Cover: Title/Hook, Problem, Solution, Traction/Market, Business Model, Ask. Return ONLY valid JSON.""",
+    defaults={
+        "traction_users": "N/A",
+        "traction_revenue": "N/A",
+    },
+    max_tokens=900,
+))
+
+PITCH_TEMPLATES.register(PromptTemplate(
+    "cold_email",
+    """Write a concise investor cold email (≤120 words). No hype. Professional tone.
+
+Startup: {startup_name}
+One-liner: {one_liner}
+Problem: {problem_statement}
+Solution: {solution_description}
+Traction: {traction_users} users, {traction_revenue}
+Ask: {ask_amount}
+Category: {category}
+Stage: {stage}
+
+Include subject line. Format as:
+
+Subject: [subject]
+
+[email body]""",
+    defaults={
+        "traction_users": "Early",
+        "traction_revenue": "Pre-revenue",
+    },
+    max_tokens=500,
+    field_tokens=120,
+))
+
+PITCH_TEMPLATES.register(PromptTemplate(
+    "linkedin_intro",
+    """Write a short, polite LinkedIn intro request. Non-salesy. Keep under 280 characters (LinkedIn limit).
+
+Startup: {startup_name}
+One-liner: {one_liner}
+Category: {category}
+Traction: {traction_users}
+Ask: {ask_amount}
+
+Be personal, mention why you're reaching out, and hint at your traction.""",
+    defaults={
+        "traction_users": "Early stage",
+    },
+    max_tokens=300,
+    field_tokens=60,
+))
+
+ADVISOR_TEMPLATES.register(PromptTemplate(
+    "smart_guidance",
+    """Based on stage and market, suggest fundraising guidance for this startup:
+
+Startup: {startup_name}
+Category: {category}
+Stage: {stage}
+One-liner: {one_liner}
+Problem: {problem_statement}
+Solution: {solution_description}
+Current Ask: {ask_amount}
+Business Model: {business_model}
+Traction: Users: {traction_users}, Revenue: {traction_revenue}
+
+Suggest:
+- reasonable funding ask range
+- equity dilution range
+- valuation logic
+- runway estimate
+
+Return ONLY valid JSON in this format:
+{{
+  "recommended_ask": {{
+    "amount": "specific dollar range",
+    "reasoning": "why this range makes sense"
+  }},
+  "equity_guidance": {{
+    "range": "percentage range to give up",
+    "reasoning": "based on stage and traction"
+  }},
+  "use_of_funds_breakdown": [
+    {{"category": "Engineering", "percentage": 40, "reasoning": "build core product"}},
+    {{"category": "Sales & Marketing", "percentage": 30, "reasoning": "customer acquisition"}},
+    {{"category": "Operations", "percentage": 20, "reasoning": "infrastructure"}},
+    {{"category": "Buffer", "percentage": 10, "reasoning": "contingency"}}
+  ],
+  "valuation_estimate": {{
+    "range": "valuation range",
+    "method": "how calculated"
+  }},
+  "runway_recommendation": {{
+    "months": 18,
+    "reasoning": "why this timeline"
+  }}
+}}""",
+    defaults={
+        "ask_amount": "Not specified",
+        "traction_users": "N/A",
+        "traction_revenue": "N/A",
+    },
+    schema={
+        "recommended_ask": dict,
+        "equity_guidance": dict,
+        "use_of_funds_breakdown": list,
+        "valuation_estimate": dict,
+        "runway_recommendation": dict,
+    },
+    max_tokens=1500,
+))
+
+ADVISOR_TEMPLATES.register(PromptTemplate(
+    "competitor_analysis",
+    """List direct and indirect competitors and explain differentiation for this startup:
+
+Startup: {startup_name}
+Category: {category}
+One-liner: {one_liner}
+Problem: {problem_statement}
+Solution: {solution_description}
+Target Users: {target_users}
+Differentiation: {differentiation}
+
+Return a comparison table as valid JSON:
+{{
+  "direct_competitors": [
+    {{
+      "name": "Competitor Name",
+      "description": "What they do",
+      "funding": "Funding stage/amount if known",
+      "strengths": ["strength 1", "strength 2"],
+      "weaknesses": ["weakness 1", "weakness 2"],
+      "your_advantage": "How you differentiate"
+    }}
+  ],
+  "indirect_competitors": [
+    {{
+      "name": "Indirect Competitor",
+      "description": "How they compete indirectly",
+      "threat_level": "low/medium/high"
+    }}
+  ],
+  "market_positioning": {{
+    "your_niche": "Where you fit",
+    "blue_ocean_opportunities": ["opportunity 1", "opportunity 2"],
+    "key_differentiators": ["differentiator 1", "differentiator 2"]
+  }},
+  "competitive_moat": {{
+    "current_moat": "What protects you now",
+    "moat_to_build": "What to develop"
+  }}
+}}""",
+    defaults={
+        "differentiation": "Not specified",
+    },
+    schema={
+        "direct_competitors": list,
+        "indirect_competitors": list,
+        "market_positioning": dict,
+        "competitive_moat": dict,
+    },
+    max_tokens=1500,
+))
+
+ADVISOR_TEMPLATES.register(PromptTemplate(
+    "investor_matching",
+    """Suggest relevant investor types, sample firms, and accelerators based on this startup profile:
+
+Startup: {startup_name}
+Category: {category}
+Stage: {stage}
+Ask Amount: {ask_amount}
+One-liner: {one_liner}
+Business Model: {business_model}
+Traction: Users: {traction_users}, Revenue: {traction_revenue}
+
+Explain why each is a fit. Return ONLY valid JSON:
+{{
+  "tier1_investors": [
+    {{
+      "name": "VC/Angel Name",
+      "firm": "Firm name if applicable",
+      "type": "VC/Angel/Accelerator",
+      "check_size": "$X - $Y",
+      "thesis_match": "Why they'd be interested",
+      "portfolio_examples": ["Similar company 1", "Similar company 2"],
+      "approach_tip": "How to reach out"
+    }}
+  ],
+  "tier2_investors": [
+    {{
+      "name": "Investor Name",
+      "firm": "Firm",
+      "type": "VC/Angel",
+      "check_size": "$X - $Y",
+      "thesis_match": "Why relevant"
+    }}
+  ],
+  "accelerators": [
+    {{
+      "name": "Accelerator Name",
+      "investment": "Terms if known",
+      "why_apply": "Why good fit",
+      "deadline_hint": "Application timing"
+    }}
+  ],
+  "outreach_strategy": {{
+    "warm_intro_sources": ["Source 1", "Source 2"],
+    "cold_outreach_tips": ["Tip 1", "Tip 2"],
+    "timing_advice": "When to reach out"
+  }}
+}}""",
+    defaults={
+        "traction_users": "Early",
+        "traction_revenue": "Pre-revenue",
+    },
+    schema={
+        "tier1_investors": list,
+        "tier2_investors": list,
+        "accelerators": list,
+        "outreach_strategy": dict,
+    },
+    max_tokens=1500,
+))
+
+ADVISOR_TEMPLATES.register(PromptTemplate(
+    "financial_model",
+    """Create financial projections for this startup:
+
+Startup: {startup_name}
+Category: {category}
+Stage: {stage}
+Ask Amount: {ask_amount}
+Business Model: {business_model}
+Current Traction: Users: {traction_users}, Revenue: {traction_revenue}, Growth: {traction_growth}
+
+If information is missing, say so explicitly. Return ONLY valid JSON:
+{{
+  "funding_summary": {{
+    "recommended_raise": "$X",
+    "pre_money_valuation": "$X - $Y range",
+    "dilution": "X% - Y%",
+    "runway_months": 18
+  }},
+  "monthly_burn_projection": {{
+    "current": "$X",
+    "month_6": "$X",
+    "month_12": "$X",
+    "month_18": "$X"
+  }},
+  "revenue_projections": {{
+    "year_1": {{ "revenue": "$X", "users": "X", "assumptions": "key assumption" }},
+    "year_2": {{ "revenue": "$X", "users": "X", "assumptions": "key assumption" }},
+    "year_3": {{ "revenue": "$X", "users": "X", "assumptions": "key assumption" }}
+  }},
+  "unit_economics": {{
+    "cac_estimate": "$X",
+    "ltv_estimate": "$X",
+    "ltv_cac_ratio": "X:1",
+    "payback_period": "X months"
+  }},
+  "use_of_funds": [
+    {{ "category": "Product/Engineering", "amount": "$X", "percentage": 40 }},
+    {{ "category": "Sales/Marketing", "amount": "$X", "percentage": 30 }},
+    {{ "category": "Operations", "amount": "$X", "percentage": 20 }},
+    {{ "category": "Buffer", "amount": "$X", "percentage": 10 }}
+  ],
+  "key_milestones": [
+    {{ "month": 6, "milestone": "Milestone description", "metric": "Target metric" }},
+    {{ "month": 12, "milestone": "Milestone description", "metric": "Target metric" }},
+    {{ "month": 18, "milestone": "Milestone description", "metric": "Target metric" }}
+  ],
+  "risk_factors": ["Risk 1", "Risk 2", "Risk 3"]
+}}""",
+    defaults={
+        "traction_users": "0",
+        "traction_revenue": "$0",
+        "traction_growth": "N/A",
+    },
+    schema={
+        "funding_summary": dict,
+        "monthly_burn_projection": dict,
+        "revenue_projections": dict,
+        "unit_economics": dict,
+        "use_of_funds": list,
+        "key_milestones": list,
+        "risk_factors": list,
+    },
+    max_tokens=1500,
+))
+
+ADVISOR_TEMPLATES.register(PromptTemplate(
+    "marketing_strategy",
+    """Create a marketing strategy for this startup:
+
+Startup: {startup_name}
+Category: {category}
+Target Users: {target_users}
+One-liner: {one_liner}
+Solution: {solution_description}
+Go-to-Market Notes: {go_to_market}
+Business Model: {business_model}
+
+Return ONLY valid JSON:
+{{
+  "target_segments": [
+    {{
+      "segment": "Segment name",
+      "description": "Who they are",
+      "pain_points": ["pain 1", "pain 2"],
+      "channels": ["channel 1", "channel 2"],
+      "messaging": "Key message for this segment"
+    }}
+  ],
+  "acquisition_channels": [
+    {{
+      "channel": "Channel name",
+      "priority": "high/medium/low",
+      "estimated_cac": "$X - $Y",
+      "tactics": ["tactic 1", "tactic 2"],
+      "timeline": "When to start"
+    }}
+  ],
+  "content_strategy": {{
+    "themes": ["theme 1", "theme 2"],
+    "formats": ["format 1", "format 2"],
+    "distribution": ["platform 1", "platform 2"]
+  }},
+  "launch_playbook": {{
+    "pre_launch": ["action 1", "action 2"],
+    "launch_week": ["action 1", "action 2"],
+    "post_launch": ["action 1", "action 2"]
+  }},
+  "metrics_to_track": ["metric 1", "metric 2", "metric 3"],
+  "budget_allocation": {{
+    "paid": 30,
+    "organic": 40,
+    "partnerships": 20,
+    "events": 10
+  }}
+}}""",
+    defaults={
+        "go_to_market": "Not specified",
+    },
+    schema={
+        "target_segments": list,
+        "acquisition_channels": list,
+        "content_strategy": dict,
+        "launch_playbook": dict,
+        "metrics_to_track": list,
+        "budget_allocation": dict,
+    },
+    max_tokens=1500,
+))
+
+FEEDBACK_TEMPLATES.register(PromptTemplate(
+    "pitch_feedback",
+    """Score this pitch on clarity, credibility, and conciseness (1–10).
+
+Company context:
+- Name: {startup_name}
+- One-liner: {one_liner}
+- Problem: {problem_statement}
+- Solution: {solution_description}
+- Target users: {target_users}
+- Traction: {traction_users} users, {traction_revenue} revenue
+- Ask: {ask_amount}
+
+Pitch type: {prompt_type}
+
+User's pitch attempt:
+\"\"\"
+{user_pitch}
+\"\"\"
+
+Return ONLY valid JSON in this exact format:
+{{
+  "score": number,
+  "strengths": ["strength 1", "strength 2"],
+  "weaknesses": ["weakness 1", "weakness 2"],
+  "rewrite_suggestion": "improved version of the pitch",
+  "feedback": [
+    {{"category": "Clarity", "score": "good", "feedback": "1-2 sentences of specific advice"}},
+    {{"category": "Hook", "score": "needs_work", "feedback": "1-2 sentences"}},
+    {{"category": "Specificity", "score": "good", "feedback": "1-2 sentences"}},
+    {{"category": "Traction", "score": "needs_work", "feedback": "1-2 sentences"}},
+    {{"category": "Ask", "score": "missing", "feedback": "1-2 sentences"}}
+  ]
+}}""",
+    defaults={
+        "traction_users": "Not specified",
+        "traction_revenue": "Not specified",
+    },
+    extra=("prompt_type", "user_pitch"),
+    max_tokens=1000,
+))
+
+REPORT_TEMPLATES.register(PromptTemplate(
+    "financial_model",
+    """Create financial projections for this startup. The funding plan below is already decided; build on it and do not restate it.
+
+Startup: {startup_name}
+Category: {category}
+Stage: {stage}
+Business Model: {business_model}
+Current Traction: Users: {traction_users}, Revenue: {traction_revenue}, Growth: {traction_growth}
+
+{context_summary}
+
+If information is missing, say so explicitly. Return ONLY valid JSON:
+{{
+  "monthly_burn_projection": {{
+    "current": "$X",
+    "month_6": "$X",
+    "month_12": "$X",
+    "month_18": "$X"
+  }},
+  "revenue_projections": {{
+    "year_1": {{ "revenue": "$X", "users": "X", "assumptions": "key assumption" }},
+    "year_2": {{ "revenue": "$X", "users": "X", "assumptions": "key assumption" }},
+    "year_3": {{ "revenue": "$X", "users": "X", "assumptions": "key assumption" }}
+  }},
+  "unit_economics": {{
+    "cac_estimate": "$X",
+    "ltv_estimate": "$X",
+    "ltv_cac_ratio": "X:1",
+    "payback_period": "X months"
+  }},
+  "key_milestones": [
+    {{ "month": 6, "milestone": "Milestone description", "metric": "Target metric" }},
+    {{ "month": 12, "milestone": "Milestone description", "metric": "Target metric" }},
+    {{ "month": 18, "milestone": "Milestone description", "metric": "Target metric" }}
+  ],
+  "risk_factors": ["Risk 1", "Risk 2", "Risk 3"]
+}}""",
+    defaults={
+        "traction_users": "0",
+        "traction_revenue": "$0",
+        "traction_growth": "N/A",
+    },
+    extra=("context_summary",),
+    schema={
+        "monthly_burn_projection": dict,
+        "revenue_projections": dict,
+        "unit_economics": dict,
+        "key_milestones": list,
+        "risk_factors": list,
+    },
+    max_tokens=1000,
+))
+
+REPORT_TEMPLATES.register(PromptTemplate(
+    "investor_matching",
+    """Suggest relevant investor types, sample firms, and accelerators for this startup. Use the funding plan and positioning below as given.
+
+Startup: {startup_name}
+Category: {category}
+Stage: {stage}
+Traction: Users: {traction_users}, Revenue: {traction_revenue}
+
+{context_summary}
+
+Explain why each is a fit. Return ONLY valid JSON:
+{{
+  "tier1_investors": [
+    {{
+      "name": "VC/Angel Name",
+      "firm": "Firm name if applicable",
+      "type": "VC/Angel/Accelerator",
+      "check_size": "$X - $Y",
+      "thesis_match": "Why they'd be interested",
+      "portfolio_examples": ["Similar company 1", "Similar company 2"],
+      "approach_tip": "How to reach out"
+    }}
+  ],
+  "tier2_investors": [
+    {{
+      "name": "Investor Name",
+      "firm": "Firm",
+      "type": "VC/Angel",
+      "check_size": "$X - $Y",
+      "thesis_match": "Why relevant"
+    }}
+  ],
+  "accelerators": [
+    {{
+      "name": "Accelerator Name",
+      "investment": "Terms if known",
+      "why_apply": "Why good fit",
+      "deadline_hint": "Application timing"
+    }}
+  ],
+  "outreach_strategy": {{
+    "warm_intro_sources": ["Source 1", "Source 2"],
+    "cold_outreach_tips": ["Tip 1", "Tip 2"],
+    "timing_advice": "When to reach out"
+  }}
+}}""",
+    defaults={
+        "traction_users": "Early",
+        "traction_revenue": "Pre-revenue",
+    },
+    extra=("context_summary",),
+    schema={
+        "tier1_investors": list,
+        "tier2_investors": list,
+        "accelerators": list,
+        "outreach_strategy": dict,
+    },
+    max_tokens=1500,
+))
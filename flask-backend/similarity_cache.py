@@ -0,0 +1,187 @@
+"""Near-duplicate result cache for /pitch-feedback and /ai-advisor.
+
+The exact response cache misses when a founder fixes a typo and resubmits.
+Here each request is reduced to a bottom-k MinHash sketch of the word
+shingles of its long free-text fields (and pitch); a new request whose
+estimated Jaccard similarity to a stored one, under the same template,
+exact arguments and exact short fields (ask, stage, traction, ...),
+reaches SIMILARITY_THRESHOLD gets the stored result.
+
+Sketches are ``array("Q")`` of SIMILARITY_SKETCH_SIZE hashes, found through
+an inverted index from hash value to entries, so a lookup touches only
+entries that share part of the sketch. Entries expire after
+SIMILARITY_CACHE_TTL and the least recently used are evicted past
+SIMILARITY_CACHE_MAX_ENTRIES.
+"""
+import heapq
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from itertools import islice
+
+SIMILARITY_CACHE = os.environ.get("SIMILARITY_CACHE", "false").lower() == "true"
+SIMILARITY_THRESHOLD = float(os.environ.get("SIMILARITY_THRESHOLD", 0.9))
+SIMILARITY_CACHE_MAX_ENTRIES = int(os.environ.get("SIMILARITY_CACHE_MAX_ENTRIES", 2048))
+SIMILARITY_CACHE_TTL = float(os.environ.get("SIMILARITY_CACHE_TTL", 24 * 3600))
+SIMILARITY_SKETCH_SIZE = int(os.environ.get("SIMILARITY_SKETCH_SIZE", 64))
+SIMILARITY_SHINGLE = int(os.environ.get("SIMILARITY_SHINGLE", 2))
+
+# Extra render arguments compared fuzzily; the others (e.g. prompt_type) must match exactly.
+FUZZY_EXTRAS = frozenset({"user_pitch"})
+# Project fields that must match exactly: one changed word or number
+# ("$2M" -> "$20M") changes the answer but barely moves the similarity of
+# the whole request.
+EXACT_FIELDS = frozenset({"ask_amount", "stage", "category", "traction_users", "traction_revenue", "traction_growth"})
+# Other fields of at most this many words are matched exactly too.
+EXACT_MAX_WORDS = 4
+# Sketch entries compared in full per lookup, best shared-hash count first.
+MAX_CANDIDATES = 4
+# Hashes held by more entries than this (such as the same project fields
+# under every pitch) only pick candidates when no rarer hash does, and then
+# only their most recent entries.
+MAX_POSTING = 32
+
+_MASK = (1 << 64) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def request_key(template, project, **extra):
+    """``(scope, text)`` for a request: scope must match exactly, text is compared by similarity.
+
+    The scope holds the exact extras and the short fields (case and spacing
+    ignored); the text holds the long free-text fields and fuzzy extras.
+    """
+    exact = tuple(sorted((k, str(v)) for k, v in extra.items() if k not in FUZZY_EXTRAS))
+    exact_fields, fields = [], []
+    for field in template.fields:
+        words = str(project.get(field) or "").split()
+        if field in EXACT_FIELDS or len(words) <= EXACT_MAX_WORDS:
+            exact_fields.append((field, " ".join(words).lower()))
+        else:
+            fields.append(f"{field}: {' '.join(words)}")
+    fields += [f"{k}: {v}" for k, v in sorted(extra.items()) if k in FUZZY_EXTRAS]
+    return (template.name, template.version, exact, tuple(exact_fields)), "\n".join(fields)
+
+
+def sketch(text, size=SIMILARITY_SKETCH_SIZE, shingle=SIMILARITY_SHINGLE):
+    """The ``size`` smallest 64-bit hashes of the text's ``shingle``-word runs
+    (case, spacing and punctuation ignored)."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < shingle:
+        shingles = {tuple(words)}
+    else:
+        shingles = set(zip(*(words[i:] for i in range(shingle))))
+    return array("Q", heapq.nsmallest(size, {hash(s) & _MASK for s in shingles}))
+
+
+def similarity(a, b, size=SIMILARITY_SKETCH_SIZE):
+    """Estimated Jaccard similarity of two sketches."""
+    a, b = set(a), set(b)
+    union = sorted(a | b)
+    if not union:
+        return 1.0
+    # Shared hashes among the ``size`` smallest of the union.
+    k = min(size, len(union))
+    return bisect_right(sorted(a & b), union[k - 1]) / k
+
+
+class SimilarityCache:
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, max_entries=SIMILARITY_CACHE_MAX_ENTRIES,
+                 ttl=SIMILARITY_CACHE_TTL, size=SIMILARITY_SKETCH_SIZE):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.size = size
+        # id -> (scope, sketch, value, expires)
+        self._entries = OrderedDict()
+        # (scope, hash) -> ids of entries whose sketch holds that hash, oldest first
+        self._postings = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+
+    def get(self, scope, text):
+        """Return ``(value, similarity)`` of the closest stored entry at or above the threshold, else None."""
+        query = sketch(text, self.size)
+        with self._lock:
+            best, best_score = self._closest(scope, query)
+            if best is not None and best_score >= self.threshold:
+                self._entries.move_to_end(best)
+                self.hits += 1
+                return self._entries[best][2], best_score
+            self.misses += 1
+        return None
+
+    def set(self, scope, text, value):
+        """Store ``value``; it replaces an entry with an identical sketch (e.g. after bypassCache)."""
+        entry = (scope, sketch(text, self.size), value, time.time() + self.ttl)
+        with self._lock:
+            same, score = self._closest(scope, entry[1])
+            if same is not None and score == 1.0:
+                self._remove(same)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            for h in entry[1]:
+                self._postings.setdefault((scope, h), {})[entry_id] = None
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self.sets += 1
+
+    def _closest(self, scope, query):
+        """Best ``(entry id, similarity)`` among the entries sharing the most hashes with ``query``."""
+        shared = Counter()
+        common = []
+        for h in query:
+            ids = self._postings.get((scope, h))
+            if ids is None:
+                continue
+            if len(ids) <= MAX_POSTING:
+                shared.update(ids.keys())
+            else:
+                common.append(ids)
+        if not shared:
+            for ids in common:
+                shared.update(islice(reversed(ids), MAX_POSTING))
+        now = time.time()
+        best, best_score = None, 0.0
+        for entry_id, _ in shared.most_common(MAX_CANDIDATES):
+            _, stored, _, expires = self._entries[entry_id]
+            if expires < now:
+                self._remove(entry_id)
+                continue
+            score = similarity(query, stored, self.size)
+            if score > best_score:
+                best, best_score = entry_id, score
+        return best, best_score
+
+    def _remove(self, entry_id):
+        scope, stored, _, _ = self._entries.pop(entry_id)
+        for h in stored:
+            ids = self._postings.get((scope, h))
+            if ids is not None:
+                ids.pop(entry_id, None)
+                if not ids:
+                    del self._postings[(scope, h)]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": SIMILARITY_CACHE,
+                "threshold": self.threshold,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "sets": self.sets,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,132 @@
+"""Coalesce concurrent identical upstream calls into one.
+
+Within a worker, callers with the same key wait on the first caller's
+result. With a shared lease file, callers in other workers on the same host
+wait for the leader to publish its result to the shared response cache.
+"""
+import os
+import threading
+import time
+
+import sqlite_store
+
+SHARED = os.environ.get("SINGLEFLIGHT_SHARED", "false").lower() == "true"
+LEASE_PATH = os.environ.get("SINGLEFLIGHT_PATH", "/tmp/fundingnemo-singleflight.sqlite3")
+LEASE_TTL = float(os.environ.get("SINGLEFLIGHT_LEASE_TTL", 180))
+POLL_INTERVAL = float(os.environ.get("SINGLEFLIGHT_POLL_INTERVAL", 0.1))
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SqliteLeases:
+    """Host-wide leases so only one worker generates a given key at a time."""
+
+    def __init__(self, path=LEASE_PATH, ttl=LEASE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, expires REAL NOT NULL)"
+        )
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._local)
+
+    def acquire(self, key):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("DELETE FROM leases WHERE key = ? AND expires <= ?", (key, now))
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO leases (key, expires) VALUES (?, ?)", (key, now + self.ttl)
+        )
+        return cur.rowcount == 1
+
+    def held(self, key):
+        row = self._connect().execute(
+            "SELECT 1 FROM leases WHERE key = ? AND expires > ?", (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def release(self, key):
+        self._connect().execute("DELETE FROM leases WHERE key = ?", (key,))
+
+
+class SingleFlight:
+    def __init__(self, leases=None, poll_interval=POLL_INTERVAL):
+        self.leases = leases
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.coalesced_shared = 0
+
+    def do(self, key, fn, lookup=None):
+        """Return ``fn()``, sharing one execution among concurrent callers of ``key``.
+
+        ``lookup(key)`` reads a result another worker has published; it is
+        needed for cross-worker coalescing and ignored without leases.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.leases is not None and lookup is not None:
+                call.result = self._do_shared(key, fn, lookup)
+            else:
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _do_shared(self, key, fn, lookup):
+        while True:
+            if self.leases.acquire(key):
+                try:
+                    return fn()
+                finally:
+                    self.leases.release(key)
+            with self._lock:
+                self.coalesced_shared += 1
+            while self.leases.held(key):
+                time.sleep(self.poll_interval)
+                value = lookup(key)
+                if value is not None:
+                    return value
+            value = lookup(key)
+            if value is not None:
+                return value
+            # The other worker gave up without a result; try ourselves.
+
+    def stats(self):
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_shared": self.coalesced_shared,
+                "in_flight": len(self._calls),
+            }
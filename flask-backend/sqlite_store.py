@@ -0,0 +1,27 @@
+"""Per-thread connections to the SQLite files shared by every worker on the host.
+
+The response cache, coalescing leases, jobs, fingerprints and tenant usage
+each keep their data in such a file. They all open it the same way: one
+connection per thread, in autocommit mode (transactions are explicit
+``BEGIN IMMEDIATE``), in WAL mode so readers don't block the writer.
+"""
+import os
+import sqlite3
+
+BUSY_TIMEOUT = 5
+
+
+def connect(path, local):
+    """This thread's connection to ``path``, kept on the ``threading.local`` ``local``.
+
+    A connection inherited across a fork is never reused: a worker opens
+    its own the first time it needs one.
+    """
+    conn = getattr(local, "conn", None)
+    if conn is None or getattr(local, "pid", None) != os.getpid():
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        local.conn = conn
+        local.pid = os.getpid()
+    return conn
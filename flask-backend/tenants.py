@@ -0,0 +1,217 @@
+"""Per-tenant usage accounting.
+
+A tenant is whoever a request is made for: the ``X-Tenant-Id`` header
+when TRUST_TENANT_HEADER says a proxy in front of the app sets it, else
+the body's ``projectId``, else "anonymous". Ids are cut to a safe
+character set and length, and each worker admits at most
+TENANT_MAX_DAILY distinct ids a day; later new ids share one "other"
+tenant, so rotating ids neither grows the usage table without bound nor
+buys unlimited scheduler turns. Requests, upstream calls and upstream tokens are counted
+in memory and added to a per-day SQLite table shared by every worker on
+the host in one batched write every TENANT_FLUSH_INTERVAL seconds (or
+TENANT_FLUSH_BATCH tenants), so accounting costs no I/O on most requests.
+The current tenant is also what the upstream scheduler shares capacity by.
+"""
+import contextlib
+import contextvars
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import sqlite_store
+
+TENANT_USAGE_PATH = os.environ.get("TENANT_USAGE_PATH", "/tmp/fundingnemo-tenants.sqlite3")
+TENANT_FLUSH_INTERVAL = float(os.environ.get("TENANT_FLUSH_INTERVAL", 5))
+TENANT_FLUSH_BATCH = int(os.environ.get("TENANT_FLUSH_BATCH", 256))
+TENANT_RETENTION_DAYS = int(os.environ.get("TENANT_RETENTION_DAYS", 90))
+# Only a proxy that overwrites X-Tenant-Id makes the header trustworthy; clients can send any value.
+TRUST_TENANT_HEADER = os.environ.get("TRUST_TENANT_HEADER", "false").lower() == "true"
+TENANT_MAX_DAILY = int(os.environ.get("TENANT_MAX_DAILY", 10000))
+
+ANONYMOUS = "anonymous"
+OVERFLOW = "other"
+MAX_TENANT_LENGTH = 64
+_UNSAFE = re.compile(r"[^A-Za-z0-9._:@-]")
+COUNTERS = ("requests", "upstream_calls", "prompt_tokens", "completion_tokens")
+
+_current = contextvars.ContextVar("tenant", default=ANONYMOUS)
+
+
+def normalize(value):
+    """``value`` reduced to letters, digits and ``._:@-``, at most MAX_TENANT_LENGTH long ("" if none left)."""
+    return _UNSAFE.sub("", str(value))[:MAX_TENANT_LENGTH] if value else ""
+
+
+class DailyIds:
+    """The distinct tenant ids admitted today, at most ``limit`` of them."""
+
+    def __init__(self, limit=TENANT_MAX_DAILY):
+        self.limit = limit
+        self._day = None
+        self._ids = set()
+        self._lock = threading.Lock()
+        self.overflowed = 0
+
+    def admit(self, tenant):
+        """``tenant`` if it was seen today or there is room for it, else OVERFLOW."""
+        day = _day(time.time())
+        with self._lock:
+            if day != self._day:
+                self._day, self._ids = day, set()
+            if tenant in self._ids:
+                return tenant
+            if len(self._ids) >= self.limit:
+                self.overflowed += 1
+                return OVERFLOW
+            self._ids.add(tenant)
+            return tenant
+
+
+_daily = DailyIds()
+
+
+def daily_overflowed():
+    """Requests counted as OVERFLOW because TENANT_MAX_DAILY new ids were already admitted."""
+    return _daily.overflowed
+
+
+def resolve(header, data):
+    """Tenant id from the X-Tenant-Id header (if trusted) or the request body's projectId."""
+    project_id = data.get("projectId") if isinstance(data, dict) else None
+    tenant = (TRUST_TENANT_HEADER and normalize(header)) or normalize(project_id)
+    return _daily.admit(tenant) if tenant else ANONYMOUS
+
+
+def begin_request(tenant):
+    """Set the tenant for a new request (worker threads are reused across requests)."""
+    _current.set(tenant)
+    return tenant
+
+
+def current():
+    return _current.get()
+
+
+@contextlib.contextmanager
+def scope(tenant):
+    """Run as ``tenant``, e.g. inside a batch or pipeline worker thread."""
+    token = _current.set(tenant)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def _day(now):
+    return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+
+class TenantUsage:
+    def __init__(self, path=TENANT_USAGE_PATH, flush_interval=TENANT_FLUSH_INTERVAL,
+                 flush_batch=TENANT_FLUSH_BATCH, retention_days=TENANT_RETENTION_DAYS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.retention_days = retention_days
+        self._local = threading.local()
+        # (tenant, day) -> [requests, upstream_calls, prompt_tokens, completion_tokens] not yet written
+        self._pending = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.flushes = 0
+        self.flush_errors = 0
+        self.rows_written = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tenant_usage ("
+                "tenant TEXT NOT NULL, day TEXT NOT NULL, requests INTEGER NOT NULL, "
+                "upstream_calls INTEGER NOT NULL, prompt_tokens INTEGER NOT NULL, "
+                "completion_tokens INTEGER NOT NULL, PRIMARY KEY (tenant, day))"
+            )
+
+    def _connect(self):
+        return sqlite_store.connect(self.path, self._local)
+
+    def record(self, tenant, requests=0, upstream_calls=0, prompt_tokens=0, completion_tokens=0):
+        """Add to ``tenant``'s counters for today; flushes when a batch is due."""
+        key = (tenant, _day(time.time()))
+        with self._lock:
+            counts = self._pending.get(key)
+            if counts is None:
+                counts = self._pending[key] = [0, 0, 0, 0]
+            counts[0] += requests
+            counts[1] += upstream_calls
+            counts[2] += prompt_tokens
+            counts[3] += completion_tokens
+            due = (len(self._pending) >= self.flush_batch
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write pending counters in one transaction; returns the number of rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO tenant_usage (tenant, day, requests, upstream_calls, prompt_tokens, completion_tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (tenant, day) DO UPDATE SET "
+                "requests = requests + excluded.requests, upstream_calls = upstream_calls + excluded.upstream_calls, "
+                "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                "completion_tokens = completion_tokens + excluded.completion_tokens",
+                [(tenant, day, *counts) for (tenant, day), counts in pending.items()],
+            )
+            conn.execute("DELETE FROM tenant_usage WHERE day < ?",
+                         (_day(time.time() - self.retention_days * 86400),))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            # Keep the counts for the next flush; accounting never fails a request.
+            with self._lock:
+                self.flush_errors += 1
+                for key, counts in pending.items():
+                    merged = self._pending.setdefault(key, [0, 0, 0, 0])
+                    for i, value in enumerate(counts):
+                        merged[i] += value
+            return 0
+        with self._lock:
+            self.flushes += 1
+            self.rows_written += len(pending)
+        return len(pending)
+
+    def usage(self, tenant=None, days=1, limit=50):
+        """Counters per tenant over the last ``days`` days, heaviest token users first.
+
+        Includes this worker's unflushed counts; other workers' unflushed
+        counts show up after their next flush.
+        """
+        since = _day(time.time() - (days - 1) * 86400)
+        query = ("SELECT tenant, SUM(requests), SUM(upstream_calls), SUM(prompt_tokens), SUM(completion_tokens) "
+                 "FROM tenant_usage WHERE day >= ?")
+        params = [since]
+        if tenant is not None:
+            query += " AND tenant = ?"
+            params.append(tenant)
+        totals = {row[0]: list(row[1:]) for row in
+                  self._connect().execute(query + " GROUP BY tenant", params).fetchall()}
+        with self._lock:
+            for (name, day), counts in self._pending.items():
+                if day >= since and (tenant is None or name == tenant):
+                    merged = totals.setdefault(name, [0, 0, 0, 0])
+                    for i, value in enumerate(counts):
+                        merged[i] += value
+        ranked = sorted(totals.items(), key=lambda item: item[1][2] + item[1][3], reverse=True)[:limit]
+        return {name: dict(zip(COUNTERS, counts)) for name, counts in ranked}
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._pending), "flushes": self.flushes, "flush_errors": self.flush_errors,
+                    "rows_written": self.rows_written}
@@ -0,0 +1,332 @@
+"""Admission control for upstream model calls.
+
+Every call passes through one process-wide scheduler that enforces a
+concurrency cap (granted in priority order, and round-robin across
+tenants within a priority), token-bucket limits on
+requests and estimated tokens, and retries 429/5xx responses with
+jittered exponential backoff that honours Retry-After up to
+UPSTREAM_BACKOFF_MAX (a longer one fails the call at once).
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+
+import requests
+
+# Lower value = served first.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BULK = 2
+PRIORITY_BACKGROUND = 3
+
+ENDPOINT_PRIORITY = {
+    "pitch-feedback": PRIORITY_INTERACTIVE,
+    "generate-pitch": PRIORITY_DEFAULT,
+    "ai-advisor": PRIORITY_BULK,
+    "prefetch": PRIORITY_BACKGROUND,
+}
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Rate limits are for the whole host; each gunicorn worker takes an equal share.
+_WORKERS = max(1, int(os.environ.get("WEB_CONCURRENCY", 1)))
+MAX_CONCURRENCY = int(os.environ.get("UPSTREAM_MAX_CONCURRENCY", 16))
+REQUESTS_PER_SECOND = float(os.environ.get("UPSTREAM_RPS", 0)) / _WORKERS
+TOKENS_PER_MINUTE = float(os.environ.get("UPSTREAM_TPM", 0)) / _WORKERS
+MAX_RETRIES = int(os.environ.get("UPSTREAM_MAX_RETRIES", 3))
+BACKOFF_BASE = float(os.environ.get("UPSTREAM_BACKOFF_BASE", 0.5))
+BACKOFF_MAX = float(os.environ.get("UPSTREAM_BACKOFF_MAX", 20))
+QUEUE_TIMEOUT = float(os.environ.get("UPSTREAM_QUEUE_TIMEOUT", 30))
+# Queued calls take turns by tenant (see tenants.py); weights as {"tenant": n}, default 1.
+FAIR_SHARE = os.environ.get("UPSTREAM_FAIR_SHARE", "true").lower() == "true"
+TENANT_WEIGHTS = json.loads(os.environ.get("UPSTREAM_TENANT_WEIGHTS") or "{}")
+
+
+class UpstreamError(Exception):
+    """Error response from the upstream API.
+
+    ``str(e)`` keeps the messages the endpoints already map to statuses
+    ("RATE_LIMIT", "AUTH_ERROR", "Gradient AI error: <status>").
+    """
+
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds form only)."""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking.
+
+    ``reserve`` always succeeds and returns how long the caller must wait
+    before its reservation is covered, so waiters are served in arrival
+    order. A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return max(0.0, -self._tokens / self.rate)
+
+    def try_take(self, amount=1):
+        """Take ``amount`` only if it is available now; never leaves the bucket in debt."""
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < amount:
+                return False
+            self._tokens -= amount
+            return True
+
+    def give_back(self, amount=1):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class PrioritySlots:
+    """Counting semaphore whose waiters are woken lowest-priority-value first.
+
+    Within a priority, tenants take turns (weighted round-robin): each
+    tenant with waiters gets up to its weight in grants before the next
+    tenant's turn, so one tenant's backlog delays another tenant's call by
+    at most one turn per queued tenant instead of the whole backlog.
+    Waiters of the same tenant are served in arrival order.
+    """
+
+    def __init__(self, limit, weights=None):
+        self.limit = limit
+        self.weights = weights or {}
+        self._free = limit
+        self._queued = 0
+        # priority -> {tenant: [waiters, grants left in its turn]}, in turn order
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def _weight(self, tenant):
+        return max(1, int(self.weights.get(tenant, 1)))
+
+    def acquire(self, priority=PRIORITY_DEFAULT, timeout=None, tenant=None):
+        with self._lock:
+            if self._free > 0 and not self._queued:
+                self._free -= 1
+                return True
+            entry = [threading.Event(), False]
+            ring = self._rings.setdefault(priority, OrderedDict())
+            if tenant not in ring:
+                ring[tenant] = [deque(), self._weight(tenant)]
+            ring[tenant][0].append(entry)
+            self._queued += 1
+        if entry[0].wait(timeout):
+            return True
+        with self._lock:
+            if entry[0].is_set():
+                return True
+            entry[1] = True
+            self._queued -= 1
+            return False
+
+    def _next_waiter(self):
+        for priority in sorted(self._rings):
+            ring = self._rings[priority]
+            while ring:
+                tenant, turn = next(iter(ring.items()))
+                waiters = turn[0]
+                while waiters and waiters[0][1]:
+                    waiters.popleft()
+                if not waiters:
+                    del ring[tenant]
+                    continue
+                entry = waiters.popleft()
+                turn[1] -= 1
+                if not waiters:
+                    del ring[tenant]
+                elif turn[1] <= 0:
+                    turn[1] = self._weight(tenant)
+                    ring.move_to_end(tenant)
+                return entry
+            del self._rings[priority]
+        return None
+
+    def try_acquire(self):
+        """Take a slot only if one is free and nobody is waiting for it."""
+        with self._lock:
+            if self._free > 0 and not self._queued:
+                self._free -= 1
+                return True
+            return False
+
+    def release(self):
+        with self._lock:
+            entry = self._next_waiter()
+            if entry is None:
+                self._free += 1
+            else:
+                self._queued -= 1
+                entry[0].set()
+
+    def in_use(self):
+        with self._lock:
+            return self.limit - self._free
+
+    def waiting(self):
+        with self._lock:
+            return self._queued
+
+    def waiting_tenants(self):
+        with self._lock:
+            return len({tenant for ring in self._rings.values() for tenant in ring})
+
+
+class UpstreamScheduler:
+    def __init__(
+        self,
+        max_concurrency=MAX_CONCURRENCY,
+        requests_per_second=REQUESTS_PER_SECOND,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        max_retries=MAX_RETRIES,
+        backoff_base=BACKOFF_BASE,
+        backoff_max=BACKOFF_MAX,
+        queue_timeout=QUEUE_TIMEOUT,
+        fair_share=FAIR_SHARE,
+        tenant_weights=TENANT_WEIGHTS,
+    ):
+        self.slots = PrioritySlots(max_concurrency, tenant_weights)
+        self.fair_share = fair_share
+        self.request_bucket = TokenBucket(requests_per_second)
+        self.token_bucket = TokenBucket(tokens_per_minute / 60.0, capacity=tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self._cooldown_until = 0.0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.rejected = 0
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _backoff(self, attempt, retry_after=None):
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = random.uniform(delay / 2, delay)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _throttle(self, estimated_tokens):
+        delay = max(
+            self.request_bucket.reserve(1),
+            self.token_bucket.reserve(estimated_tokens) if estimated_tokens else 0.0,
+            self._cooldown_until - time.monotonic(),
+        )
+        if delay > 0:
+            time.sleep(delay)
+
+    def run(self, fn, priority=PRIORITY_DEFAULT, estimated_tokens=0, tenant=None):
+        """Call ``fn()`` once admitted, retrying retryable failures.
+
+        The concurrency slot is held only while ``fn`` runs, so for a
+        streaming call it covers the request up to the response headers.
+        With fair sharing, ``tenant`` decides whose queued call goes next
+        within a priority.
+        """
+        tenant = tenant if self.fair_share else None
+        attempt = 0
+        while True:
+            # Slots are granted in priority order before the rate limit is
+            # applied, so interactive calls overtake queued bulk work.
+            if not self.slots.acquire(priority, self.queue_timeout, tenant):
+                self._count("rejected")
+                raise UpstreamError("RATE_LIMIT", 429)
+            try:
+                self._throttle(estimated_tokens)
+                self._count("calls")
+                return fn()
+            except UpstreamError as e:
+                if e.status == 429:
+                    self._count("rate_limited")
+                if e.status not in RETRYABLE_STATUSES or attempt >= self.max_retries:
+                    raise
+                if e.retry_after is not None and e.retry_after > self.backoff_max:
+                    # Waiting that out would hold this caller, and through the
+                    # cooldown every caller in the worker, for as long as the
+                    # upstream asks.
+                    raise
+                delay = self._backoff(attempt, e.retry_after)
+                if e.status == 429:
+                    # Hold back every caller in this worker, not just this one.
+                    with self._lock:
+                        self._cooldown_until = max(self._cooldown_until, time.monotonic() + delay)
+            except requests.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            finally:
+                self.slots.release()
+            self._count("retries")
+            attempt += 1
+            time.sleep(delay)
+
+    def try_admit(self, estimated_tokens=0):
+        """Admit an extra call, such as a hedge, only if that needs no waiting.
+
+        Takes a slot and the rate-limit budget of one request and
+        ``estimated_tokens``, and returns the function that gives the slot
+        back when the call is done; returns None (taking nothing) when the
+        slots are full, callers are queued, the worker is cooling down
+        after a 429 or a bucket would have to wait.
+        """
+        if time.monotonic() < self._cooldown_until or not self.slots.try_acquire():
+            return None
+        if not self.request_bucket.try_take(1):
+            self.slots.release()
+            return None
+        if estimated_tokens and not self.token_bucket.try_take(estimated_tokens):
+            self.request_bucket.give_back(1)
+            self.slots.release()
+            return None
+        self._count("calls")
+        return self.slots.release
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "calls": self.calls,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "rejected": self.rejected,
+            }
+        stats.update(in_flight=self.slots.in_use(), queued=self.slots.waiting(),
+                     queued_tenants=self.slots.waiting_tenants())
+        return stats